@@ -0,0 +1,696 @@
+import os
+import sys
+import marshal
+from . import Nil
+from . import ErrorHandler as e
+from .ControlFlow import ControlFlowGraph
+from .ProgramCache import ProgramCache
+from .TacInterpret import (InterpretData, InstructionUtils, CustomException, UNDEFINED,
+                           RedefiningVariable, BadOperandTypes, NotExistingVariable,
+                           NotExistingFrame, MissingOperandValue, BadOperandValue, StringError)
+from .ClosureInterpret import ExitProgram
+
+# Class that translates code into python source
+# Code is split into basic blocks and every block is translated into one python function
+# Function takes number of instructions executed before the block and returns program counter of next block
+# Source defines list BLOCKS where on index of first instruction of block is tuple (function, number of instructions)
+# Names used in generated source are provided by AotInterpret when the source is executed
+class PythonTranslator:
+
+    __slots__ = ("code", "labels", "_lines", "_pc")
+
+    # Python expressions of types checked in instructions
+    TYPE_NAMES = {int: "int", bool: "bool", str: "str", Nil.nil: "NIL_TYPE"}
+    # Types of constants
+    CONSTANT_TYPES = {"int": int, "bool": bool, "string": str, "nil": Nil.nil}
+
+    def __init__(self, code: list, labels: dict):
+        self.code = code
+        self.labels = labels
+        self._lines = []
+        self._pc = 0
+
+    # Method that returns python source of whole program
+    def translate(self):
+        cfg = ControlFlowGraph(self.code, self.labels)
+        source = []
+        table = ["None"] * len(self.code)
+        for block in cfg.blocks:
+            source.append(f"def block_{block.start}(count):")
+            for pc in range(block.start, block.end):
+                source.append(f"    # {pc}: {self.code[pc][0]}")
+                source.extend("    " + line for line in self.translate_instruction(pc, pc - block.start))
+            last = self.code[block.end - 1][0]
+            if last not in ("JUMP", "CALL", "RETURN", "EXIT"):
+                source.append(f"    return {block.end}")
+            table[block.start] = f"(block_{block.start}, {len(block)})"
+        source.append("BLOCKS = [" + ", ".join(table) + "]")
+        return "\n".join(source) + "\n"
+
+    # Method that returns lines of python code that implements one instruction
+    # offset is position of instruction in its block (used for instruction count of BREAK)
+    # Instruction that cannot be translated raises the same python exception when it is executed
+    def translate_instruction(self, pc, offset=0):
+        self._lines = []
+        self._pc = pc
+        try:
+            self.TRANSLATORS[self.code[pc][0]](self, offset)
+        except Exception as error:
+            self._lines = [f"raise {type(error).__name__}(*{error.args!r})"]
+        return self._lines
+
+    # Helper methods for generating code
+
+    def _emit(self, line):
+        self._lines.append(line)
+
+    def _opcode(self):
+        return self.code[self._pc][0]
+
+    def _target(self, label):
+        return self.labels[label] + 1
+
+    # Method that returns python expression of message
+    # parts are strings or tuples with python expression which value is inserted to message
+    @staticmethod
+    def _message(*parts):
+        return " + ".join(repr(part) if isinstance(part, str) else f"str({part[0]})" for part in parts)
+
+    # Method that emits raising of exception, indent is number of nested levels of the line
+    def _raise(self, exception, *parts, indent=0):
+        self._emit("    " * indent + f"raise {exception}(this, {PythonTranslator._message(*parts)})")
+
+    # Method that emits code that stores frame of variable into local name and returns the name
+    # Raises exception if local frames stack is empty or temporary frame is not defined
+    # Frame that is proven to exist (checked is False) is not checked
+    def _frame(self, frame_name, checked=True):
+        if frame_name == "GF":
+            return "gf"
+        if not checked:
+            return "lf[-1]" if frame_name == "LF" else "frames['TF']"
+        if frame_name == "LF":
+            self._emit("if not lf:")
+            self._emit(f"    raise NotExistingFrame(this, {f'No local frame when calling instruction {self._opcode()} in program counter: {self._pc}.'!r})")
+            return "lf[-1]"
+        self._emit("_tf = frames['TF']")
+        self._emit("if _tf is None:")
+        self._emit(f"    raise NotExistingFrame(this, {f'No temporary frame when calling instruction {self._opcode()} in program counter: {self._pc}.'!r})")
+        return "_tf"
+
+    # Method that emits code that reads value of symbol into local name
+    # Returns python expression with value and python type of the value if it is known
+    # Constant is returned as literal, it is stored into the local name only if bind is set (literal
+    # that is subscripted would make compile() print SyntaxWarning if it is int or bool)
+    def _read(self, operand, name, none_check=True, bind=False):
+        if operand.frame is None:
+            if operand.type == "nil":
+                return "NIL", Nil.nil
+            if bind:
+                self._emit(f"{name} = {operand.value!r}")
+                return name, self.CONSTANT_TYPES[operand.type]
+            return repr(operand.value), self.CONSTANT_TYPES[operand.type]
+
+        # Variable annotated by TypeInference surely exists and can have only its types
+        types = getattr(operand, "types", None)
+        if types is not None:
+            self._emit(f"{name} = {self._frame(operand.frame, False)}[{operand.slot}]")
+            if none_check and None in types:
+                self._emit(f"if {name} is None:")
+                self._emit(f"    raise MissingOperandValue(this, {f'Variable {operand.frame}@{operand.name} not initialized. Instruction {self._opcode()} on program counter: {self._pc}'!r})")
+            return name, InstructionUtils._known_type(operand)
+
+        frame = self._frame(operand.frame)
+        raw = f"{operand.frame}@{operand.name}"
+        self._emit(f"{name} = {frame}[{operand.slot}]")
+        self._emit(f"if {name} is UNDEFINED:")
+        self._emit(f"    raise NotExistingVariable(this, {f'No variable {raw} in frame when calling instruction {self._opcode()} in program counter: {self._pc}.'!r})")
+        if none_check:
+            self._emit(f"if {name} is None:")
+            self._emit(f"    raise MissingOperandValue(this, {f'Variable {raw} not initialized. Instruction {self._opcode()} on program counter: {self._pc}'!r})")
+        return name, None
+
+    # Method that emits code that stores python expression into variable
+    # Raises exception if variable is not defined in frame
+    def _write(self, variable, expression):
+        if getattr(variable, "types", None) is not None:
+            self._emit(f"{self._frame(variable.frame, False)}[{variable.slot}] = {expression}")
+            return
+        frame = self._frame(variable.frame)
+        self._emit(f"if {frame}[{variable.slot}] is UNDEFINED:")
+        self._emit(f"    raise NotExistingVariable(this, {f'No variable {variable.frame}@{variable.name} in frame when calling instruction {self._opcode()} in program counter: {self._pc}.'!r})")
+        self._emit(f"{frame}[{variable.slot}] = {expression}")
+
+    # Method that emits check that value has one of valid types
+    # known_type is type of constant or annotated variable, check is not emitted if it is valid
+    def _check_type(self, value, known_type, valid_types, *message):
+        if known_type is not None:
+            if known_type not in valid_types:
+                self._raise("BadOperandTypes", *message)
+            return
+        condition = " and ".join(f"type({value}) != {self.TYPE_NAMES[type_]}" for type_ in valid_types)
+        self._emit(f"if {condition}:")
+        self._emit(f"    raise BadOperandTypes(this, {PythonTranslator._message(*message)})")
+
+    # Method that emits check of divisor of IDIV and IDIVS, it is emitted after check of types
+    def _check_divisor(self, value):
+        self._emit(f"if {value} == 0:")
+        self._raise("BadOperandValue", f"Division by zero in program counter: {self._pc}", indent=1)
+
+    # Methods that translate instructions
+
+    def _move(self, offset):
+        value, _ = self._read(self.code[self._pc][2], "_a")
+        self._write(self.code[self._pc][1], value)
+
+    def _create_frame(self, offset):
+        self._emit("free_frame(frames['TF'])")
+        self._emit("frames['TF'] = new_frame()")
+
+    def _push_frame(self, offset):
+        self._emit("if frames['TF'] is None:")
+        self._raise("NotExistingFrame", f"Missing frame in program counter: {self._pc} in instruction {self._opcode()}", indent=1)
+        self._emit("lf.append(frames['TF'])")
+        self._emit("frames['TF'] = None")
+
+    def _pop_frame(self, offset):
+        self._emit("if not lf:")
+        self._raise("NotExistingFrame", f"Missing frame in program counter: {self._pc} in instruction {self._opcode()}", indent=1)
+        self._emit("free_frame(frames['TF'])")
+        self._emit("frames['TF'] = lf.pop()")
+
+    def _def_var(self, offset):
+        variable = self.code[self._pc][1]
+        frame = self._frame(variable.frame)
+        self._emit(f"if {frame}[{variable.slot}] is not UNDEFINED:")
+        self._raise("RedefiningVariable", f"Variable {variable.frame}@{variable.name} redefining on program counter {self._pc}.", indent=1)
+        self._emit(f"{frame}[{variable.slot}] = None")
+
+    def _call(self, offset):
+        target = self._target(self.code[self._pc][1])
+        self._emit(f"call_stack.append({self._pc})")
+        self._emit(f"return {target}")
+
+    def _return(self, offset):
+        self._emit("if not call_stack:")
+        self._raise("MissingOperandValue", f"Missing return value in program counter: {self._pc}", indent=1)
+        self._emit("return call_stack.pop() + 1")
+
+    def _pushs(self, offset):
+        value, _ = self._read(self.code[self._pc][1], "_a")
+        self._emit(f"data_stack.append({value})")
+
+    def _pops(self, offset):
+        self._emit("if not data_stack:")
+        self._raise("MissingOperandValue", f"Missing data when POPS  in program counter: {self._pc}", indent=1)
+        self._write(self.code[self._pc][1], "data_stack.pop()")
+
+    def _clears(self, offset):
+        self._emit("data_stack.clear()")
+
+    # Method that emits code that pops operands of stack instruction into local names
+    # The last name gets value from top of data stack
+    def _pop_operands(self, *names):
+        self._emit(f"if len(data_stack) < {len(names)}:")
+        self._raise("MissingOperandValue", f"Missing data when {self._opcode()} in program counter: {self._pc}", indent=1)
+        for name in reversed(names):
+            self._emit(f"{name} = data_stack.pop()")
+
+    # Method that translates stack variants of arithmetic, relational and logical instructions with two operands
+    # Arguments are same as in _calculation, operands are popped from data stack and result is pushed
+    def _stack_calculation(self, operator, valid_types, mode=""):
+        self._pop_operands("_a", "_b")
+        message = (f"Invalid operand types in program counter: {self._pc} on instruction {self._opcode()}",)
+        if len(valid_types) == 1:
+            self._check_type("_a", None, valid_types, *message)
+            self._check_type("_b", None, valid_types, *message)
+            if mode == "div":
+                self._check_divisor("_b")
+            self._emit(f"data_stack.append(_a {operator} _b)")
+            return
+        type_names = "(" + ", ".join(self.TYPE_NAMES[type_] for type_ in valid_types) + ")"
+        self._emit("_t = type(_a)")
+        if mode == "eq":
+            self._emit("if _t == NIL_TYPE or type(_b) == NIL_TYPE:")
+            self._emit("    data_stack.append(_a == _b)")
+            self._emit(f"elif _t == type(_b) and _t in {type_names}:")
+        else:
+            self._emit(f"if _t == type(_b) and _t in {type_names}:")
+        self._emit(f"    data_stack.append(_a {operator} _b)")
+        self._emit("else:")
+        self._raise("BadOperandTypes", *message, indent=1)
+
+    # Method that translates arithmetic, relational and logical instructions with two operands
+    def _calculation(self, operator, valid_types, mode=""):
+        instruction = self.code[self._pc]
+        first, first_type = self._read(instruction[2], "_a")
+        second, second_type = self._read(instruction[3], "_b")
+        message = (f"Invalid operand types in program counter: {self._pc} on instruction {self._opcode()}",)
+        result = f"{first} {operator} {second}"
+
+        if first_type is not None and second_type is not None:
+            # Types of both operands are known
+            if mode == "eq" and Nil.nil in (first_type, second_type):
+                self._write(instruction[1], f"{first} == {second}")
+            elif first_type == second_type and first_type in valid_types:
+                if mode == "div":
+                    self._check_divisor(second)
+                self._write(instruction[1], result)
+            else:
+                self._raise("BadOperandTypes", *message)
+            return
+
+        if len(valid_types) == 1:
+            self._check_type(first, first_type, valid_types, *message)
+            self._check_type(second, second_type, valid_types, *message)
+            if mode == "div":
+                self._check_divisor(second)
+            self._write(instruction[1], result)
+            return
+
+        type_names = "(" + ", ".join(self.TYPE_NAMES[type_] for type_ in valid_types) + ")"
+        self._emit(f"_t = type({first})")
+        if mode == "eq":
+            self._emit(f"if _t == NIL_TYPE or type({second}) == NIL_TYPE:")
+            self._emit(f"    _r = {first} == {second}")
+            self._emit(f"elif _t == type({second}) and _t in {type_names}:")
+        else:
+            self._emit(f"if _t == type({second}) and _t in {type_names}:")
+        self._emit(f"    _r = {result}")
+        self._emit("else:")
+        self._raise("BadOperandTypes", *message, indent=1)
+        self._write(instruction[1], "_r")
+
+    def _add(self, offset):
+        self._calculation("+", (int,))
+
+    def _sub(self, offset):
+        self._calculation("-", (int,))
+
+    def _mul(self, offset):
+        self._calculation("*", (int,))
+
+    def _idiv(self, offset):
+        self._calculation("//", (int,), "div")
+
+    def _lt(self, offset):
+        self._calculation("<", (int, bool, str))
+
+    def _gt(self, offset):
+        self._calculation(">", (int, bool, str))
+
+    def _eq(self, offset):
+        self._calculation("==", (int, bool, str, Nil.nil), "eq")
+
+    def _and(self, offset):
+        self._calculation("and", (bool,))
+
+    def _or(self, offset):
+        self._calculation("or", (bool,))
+
+    def _not(self, offset):
+        instruction = self.code[self._pc]
+        value, value_type = self._read(instruction[2], "_a")
+        self._check_type(value, value_type, (bool,),
+                         f"Invalid operand type in program counter: {self._pc} on instruction {self._opcode()}")
+        self._write(instruction[1], f"not {value}")
+
+    def _adds(self, offset):
+        self._stack_calculation("+", (int,))
+
+    def _subs(self, offset):
+        self._stack_calculation("-", (int,))
+
+    def _muls(self, offset):
+        self._stack_calculation("*", (int,))
+
+    def _idivs(self, offset):
+        self._stack_calculation("//", (int,), "div")
+
+    def _lts(self, offset):
+        self._stack_calculation("<", (int, bool, str))
+
+    def _gts(self, offset):
+        self._stack_calculation(">", (int, bool, str))
+
+    def _eqs(self, offset):
+        self._stack_calculation("==", (int, bool, str, Nil.nil), "eq")
+
+    def _ands(self, offset):
+        self._stack_calculation("and", (bool,))
+
+    def _ors(self, offset):
+        self._stack_calculation("or", (bool,))
+
+    def _nots(self, offset):
+        self._pop_operands("_a")
+        self._check_type("_a", None, (bool,),
+                         f"Invalid operand type in program counter: {self._pc} on instruction {self._opcode()}")
+        self._emit("data_stack.append(not _a)")
+
+    def _int2char(self, offset):
+        instruction = self.code[self._pc]
+        value, value_type = self._read(instruction[2], "_a")
+        self._check_type(value, value_type, (int,), "Invalid operand type for int2char: ", (f"type({value})",),
+                         f" on program counter {self._pc}.\nOnly int is allowed.")
+        self._emit(f"if {value} < 0 or {value} > 0x10FFFF:")
+        self._raise("StringError", "Invalid value for int2char: ", (value,),
+                    f" on program counter {self._pc}.\nOnly values from range 0-0x10FFFF are allowed.", indent=1)
+        self._write(instruction[1], f"chr({value})")
+
+    def _stri2int(self, offset):
+        instruction = self.code[self._pc]
+        value, value_type = self._read(instruction[2], "_a", bind=True)
+        index, index_type = self._read(instruction[3], "_b")
+        self._check_type(value, value_type, (str,), "Invalid second operand type for str2int: ", (f"type({value})",),
+                         f" on program counter {self._pc}.")
+        self._check_type(index, index_type, (int,), "Invalid third operand type for str2int: ", (f"type({index})",),
+                         f" on program counter {self._pc}.")
+        self._emit(f"if not (0 <= {index} < len({value})):")
+        self._raise("StringError", "Invalid index for str2int: ", (index,), f" on program counter {self._pc}.", indent=1)
+        self._write(instruction[1], f"ord({value}[{index}])")
+
+    def _int2chars(self, offset):
+        self._pop_operands("_a")
+        self._check_type("_a", None, (int,), "Invalid operand type for int2char: ", ("type(_a)",),
+                         f" on program counter {self._pc}.\nOnly int is allowed.")
+        self._emit("if _a < 0 or _a > 0x10FFFF:")
+        self._raise("StringError", "Invalid value for int2char: ", ("_a",),
+                    f" on program counter {self._pc}.\nOnly values from range 0-0x10FFFF are allowed.", indent=1)
+        self._emit("data_stack.append(chr(_a))")
+
+    def _stri2ints(self, offset):
+        self._pop_operands("_a", "_b")
+        self._check_type("_a", None, (str,), "Invalid second operand type for str2int: ", ("type(_a)",),
+                         f" on program counter {self._pc}.")
+        self._check_type("_b", None, (int,), "Invalid third operand type for str2int: ", ("type(_b)",),
+                         f" on program counter {self._pc}.")
+        self._emit("if not (0 <= _b < len(_a)):")
+        self._raise("StringError", "Invalid index for str2int: ", ("_b",), f" on program counter {self._pc}.", indent=1)
+        self._emit("data_stack.append(ord(_a[_b]))")
+
+    def _read_instruction(self, offset):
+        instruction = self.code[self._pc]
+        self._emit("if flush_before_read:")
+        self._emit("    flush()")
+        self._emit(f"_r = read_value({instruction[2]!r}, types)")
+        self._write(instruction[1], "_r")
+
+    def _write_instruction(self, offset):
+        operand = self.code[self._pc][1]
+        # Text of constant is known at translation time
+        if operand.frame is None:
+            value = operand.value
+            self._emit(f"write({(InstructionUtils._from_bool(value) if type(value) == bool else str(value))!r})")
+            return
+        value, value_type = self._read(operand, "_a")
+        if value_type == bool:
+            self._emit(f"write(from_bool({value}))")
+        elif value_type == str:
+            self._emit(f"write({value})")
+        elif value_type is not None:
+            self._emit(f"write(str({value}))")
+        else:
+            self._emit(f"write(from_bool({value}) if type({value}) == bool else str({value}))")
+
+    def _concat(self, offset):
+        instruction = self.code[self._pc]
+        first, first_type = self._read(instruction[2], "_a")
+        second, second_type = self._read(instruction[3], "_b")
+        if (first_type is not None and first_type != str) or (second_type is not None and second_type != str):
+            self._raise("BadOperandTypes", "Invalid operand types for concat: ", (f"type({first})",), " and ",
+                        (f"type({second})",), f" on program counter {self._pc}.")
+            return
+        if first_type is None or second_type is None:
+            self._emit(f"if type({first}) != str or type({second}) != str:")
+            self._raise("BadOperandTypes", "Invalid operand types for concat: ", (f"type({first})",), " and ",
+                        (f"type({second})",), f" on program counter {self._pc}.", indent=1)
+        self._write(instruction[1], f"{first} + {second}")
+
+    def _strlen(self, offset):
+        instruction = self.code[self._pc]
+        value, value_type = self._read(instruction[2], "_a")
+        self._check_type(value, value_type, (str,), "Invalid operand type for strlen: ", (f"type({value})",),
+                         f" on program counter {self._pc}.")
+        self._write(instruction[1], f"len({value})")
+
+    def _get_char(self, offset):
+        instruction = self.code[self._pc]
+        string, string_type = self._read(instruction[2], "_a", bind=True)
+        index, index_type = self._read(instruction[3], "_b")
+        if (string_type, index_type) != (str, int):
+            self._emit(f"if type({string}) != str or type({index}) != int:")
+            self._raise("BadOperandTypes", "Invalid operand type for get_char: ", (f"type({string})",), " and ",
+                        (f"type({index})",), f" on program counter {self._pc}.", indent=1)
+        self._emit(f"if {index} >= len({string}) or {index} < 0:")
+        self._raise("StringError", "Invalid index for get_char: ", (index,), f" on program counter {self._pc}.", indent=1)
+        self._write(instruction[1], f"{string}[{index}]")
+
+    def _set_char(self, offset):
+        instruction = self.code[self._pc]
+        string, string_type = self._read(instruction[1], "_a")
+        index, index_type = self._read(instruction[2], "_b")
+        value, value_type = self._read(instruction[3], "_c", bind=True)
+        if (string_type, index_type, value_type) != (str, int, str):
+            self._emit(f"if type({string}) != str or type({index}) != int or type({value}) != str:")
+            self._raise("BadOperandTypes", "Invalid operand type for set_char: ", (f"type({string})",), ", ",
+                        (f"type({index})",), " and ", (f"type({value})",),
+                        f" on program counter {self._pc}.\nShould be string, int and string.", indent=1)
+        self._emit(f"if {index} >= len({string}) or {index} < 0:")
+        self._raise("StringError", "Invalid index for set_char: ", (index,), f" on program counter {self._pc}.", indent=1)
+        self._emit(f"if {value} == '':")
+        self._raise("StringError", f"Invalid epmty string third argument in instruction {self._opcode()} on program counter {self._pc}.", indent=1)
+        self._write(instruction[1], f"{string}[:{index}] + {value}[0] + {string}[{index} + 1:]")
+
+    def _type(self, offset):
+        instruction = self.code[self._pc]
+        # Type of constant is known at translation time
+        if instruction[2].frame is None:
+            self._write(instruction[1], repr(instruction[2].type))
+            return
+        value, _ = self._read(instruction[2], "_a", False)
+        self._emit(f"_r = '' if {value} is None else ('string' if isinstance({value}, str) else type({value}).__name__)")
+        self._write(instruction[1], "_r")
+
+    def _label(self, offset):
+        self._emit("pass")
+
+    def _jump(self, offset):
+        self._emit(f"return {self._target(self.code[self._pc][1])}")
+
+    # Method that translates JUMPIFEQ and JUMPIFNEQ
+    def _conditional_jump(self, operator, name):
+        instruction = self.code[self._pc]
+        target = self._target(instruction[1])
+        first, first_type = self._read(instruction[2], "_a")
+        second, second_type = self._read(instruction[3], "_b")
+        # Check is not emitted if types of both operands are known and valid
+        if first_type is None or second_type is None or not (
+                (first_type == second_type and first_type in (int, str, bool)) or Nil.nil in (first_type, second_type)):
+            self._emit(f"_t = type({first})")
+            self._emit(f"_u = type({second})")
+            self._emit("if not ((_t == _u and _t in (int, str, bool)) or _t == NIL_TYPE or _u == NIL_TYPE):")
+            self._raise("BadOperandTypes", f"Invalid operand types for {name}: ", ("_t",), " and ", ("_u",),
+                        f" on program counter {self._pc}.", indent=1)
+        self._emit(f"if {first} {operator} {second}:")
+        self._emit(f"    return {target}")
+
+    # Method that translates JUMPIFEQS and JUMPIFNEQS
+    def _stack_conditional_jump(self, operator, name):
+        target = self._target(self.code[self._pc][1])
+        self._pop_operands("_a", "_b")
+        self._emit("_t = type(_a)")
+        self._emit("_u = type(_b)")
+        self._emit("if not ((_t == _u and _t in (int, str, bool)) or _t == NIL_TYPE or _u == NIL_TYPE):")
+        self._raise("BadOperandTypes", f"Invalid operand types for {name}: ", ("_t",), " and ", ("_u",),
+                    f" on program counter {self._pc}.", indent=1)
+        self._emit(f"if _a {operator} _b:")
+        self._emit(f"    return {target}")
+
+    def _jump_if_eqs(self, offset):
+        self._stack_conditional_jump("==", "jump_if_eqs")
+
+    def _jump_if_n_eqs(self, offset):
+        self._stack_conditional_jump("!=", "jump_if_n_eqs")
+
+    def _jump_if_eq(self, offset):
+        self._conditional_jump("==", "jump_if_eq")
+
+    def _jump_if_n_eq(self, offset):
+        self._conditional_jump("!=", "jump_if_n_eq")
+
+    def _exit(self, offset):
+        value, value_type = self._read(self.code[self._pc][1], "_a")
+        self._check_type(value, value_type, (int,), "Invalid operand type for exit: ", (f"type({value})",),
+                         f" on program counter {self._pc}.")
+        self._emit(f"if {value} < 0 or {value} > 49:")
+        self._raise("BadOperandValue", "Invalid exit code: ", (value,), f" on program counter {self._pc}.", indent=1)
+        self._emit(f"raise ExitProgram({value})")
+
+    def _d_print(self, offset):
+        value, _ = self._read(self.code[self._pc][1], "_a")
+        self._emit(f"print({value}, file=sys.stderr)")
+
+    def _break(self, offset):
+        self._emit(f"this._pc = {self._pc}")
+        self._emit(f"this._instruction_count = count + {offset}")
+        self._emit("this._print_state()")
+
+    # Dictionary that maps instruction names to methods that translate them
+    TRANSLATORS = {"MOVE": _move, "CREATEFRAME": _create_frame,
+                   "PUSHFRAME": _push_frame, "POPFRAME": _pop_frame,
+                   "DEFVAR": _def_var, "CALL": _call, "RETURN": _return,
+                   "PUSHS": _pushs, "POPS": _pops, "CLEARS": _clears,
+                   "ADD": _add, "SUB": _sub, "MUL": _mul, "IDIV": _idiv,
+                   "LT": _lt, "GT": _gt, "EQ": _eq,
+                   "AND": _and, "OR": _or, "NOT": _not,
+                   "INT2CHAR": _int2char, "STRI2INT": _stri2int,
+                   "READ": _read_instruction, "WRITE": _write_instruction,
+                   "CONCAT": _concat, "STRLEN": _strlen,
+                   "GETCHAR": _get_char, "SETCHAR": _set_char, "TYPE": _type,
+                   "LABEL": _label, "JUMP": _jump,
+                   "JUMPIFEQ": _jump_if_eq, "JUMPIFNEQ": _jump_if_n_eq,
+                   "EXIT": _exit, "DPRINT": _d_print, "BREAK": _break,
+                   "ADDS": _adds, "SUBS": _subs, "MULS": _muls, "IDIVS": _idivs,
+                   "LTS": _lts, "GTS": _gts, "EQS": _eqs,
+                   "ANDS": _ands, "ORS": _ors, "NOTS": _nots,
+                   "INT2CHARS": _int2chars, "STRI2INTS": _stri2ints,
+                   "JUMPIFEQS": _jump_if_eqs, "JUMPIFNEQS": _jump_if_n_eqs}
+
+
+# Class that stores compiled translations on disk
+# Translation is stored as marshaled code object in file named by key
+# Key is made from hash of source XML, version of translator and version of python bytecode
+# All errors with cache directory are ignored, program is then only translated again
+class TranslationCache:
+
+    __slots__ = ("directory",)
+
+    # Version of generated code. It must be changed when PythonTranslator changes
+    VERSION = 9
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.path.join(ProgramCache.default_directory(), "aot")
+        self.directory = directory
+
+    def _path(self, source_digest):
+        return os.path.join(self.directory,
+                            f"{source_digest}-{TranslationCache.VERSION}-{sys.implementation.cache_tag}.pyc")
+
+    # Method that returns cached code object or None if it is not cached
+    def load(self, source_digest):
+        try:
+            with open(self._path(source_digest), "rb") as f:
+                return marshal.loads(f.read())
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+
+    # Method that stores code object to cache
+    def store(self, source_digest, code_object):
+        # tempfile is needed only when code is not cached yet
+        import tempfile
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(marshal.dumps(code_object))
+            os.replace(temporary, self._path(source_digest))
+        except OSError:
+            pass
+
+
+# Class that interprets the code by translating it ahead of time into python code object
+# Every basic block is one python function, the main loop only calls functions of blocks
+# If source_digest is set, translated code object is cached on disk under this key
+# Output and exit codes are the same as in TACInterpret
+class AotInterpret(InterpretData):
+
+    def __init__(self, code: list = None, labels: dict = None, input_stream=sys.stdin, force_exit=False):
+        InterpretData.__init__(self, code, labels, input_stream, force_exit)
+        # Hash of source XML used as key to cache of translations
+        self.source_digest = None
+        self.cache = TranslationCache()
+        # Code object of current code and code it was made from
+        self._code_object = None
+        self._translated_code = None
+
+    # Method that returns code object of current code
+    # It is taken from memory, from cache on disk or translated
+    def _translation(self):
+        if self._code_object is not None and self._translated_code is self.code:
+            return self._code_object
+        code_object = None
+        if self.source_digest is not None:
+            code_object = self.cache.load(self.source_digest)
+        if code_object is None:
+            source = PythonTranslator(self.code, self._labels).translate()
+            code_object = compile(source, "<IPPcode23>", "exec")
+            if self.source_digest is not None:
+                self.cache.store(self.source_digest, code_object)
+        self._code_object = code_object
+        self._translated_code = self.code
+        return code_object
+
+    # Method that returns names used by generated code
+    # They are bound to frames and stacks created by reset
+    def _namespace(self):
+        return {"this": self, "gf": self.FRAMES["GF"], "lf": self.FRAMES["LF"], "frames": self.FRAMES,
+                "call_stack": self._call_stack, "data_stack": self._data_stack,
+                "new_frame": self._new_frame, "free_frame": self._free_frame,
+                "read_value": self._input_stream.read_value, "types": self.TYPES,
+                "write": self.output.write, "flush": self.output.flush,
+                "flush_before_read": self._flush_before_read,
+                "from_bool": InstructionUtils._from_bool, "sys": sys,
+                "NIL": Nil.nil(None), "NIL_TYPE": Nil.nil, "UNDEFINED": UNDEFINED, "ExitProgram": ExitProgram,
+                "RedefiningVariable": RedefiningVariable, "BadOperandTypes": BadOperandTypes,
+                "NotExistingVariable": NotExistingVariable, "NotExistingFrame": NotExistingFrame,
+                "MissingOperandValue": MissingOperandValue, "BadOperandValue": BadOperandValue,
+                "StringError": StringError}
+
+    # Method that interprets the code
+    # Arguments are same as in TACInterpret.interpret
+    # Errors are handled by decorator
+    @e.ErrorHandable.handle_error
+    def interpret(self, force_exit_after_interpret=False, code=None, labels=None, input_stream=None):
+        # Set up the initial state of the program if called multiple times
+        if code != None:
+            if labels == None:
+                self.error_message = "Labels must be provided if code is provided."
+                return 99
+            self.update_code(code, labels)
+        if input_stream != None:
+            self.update_input_stream(input_stream)
+        # Reset interpreter before interpreting
+        self._reset(force_exit_after_interpret)
+
+        # if there is no code, return 0
+        if not self.code:
+            return 0
+
+        namespace = self._namespace()
+        exec(self._translation(), namespace)
+        blocks = namespace["BLOCKS"]
+
+        # Output is written even if program ends with EXIT or error
+        try:
+            return self._run(blocks)
+        finally:
+            self.output.finish()
+
+    # Main loop of interpret
+    def _run(self, blocks):
+        lenght = len(self.code)
+        pc = 0
+        count = 0
+        # Single handler for errors and EXIT of all blocks
+        try:
+            while pc < lenght:
+                function, size = blocks[pc]
+                pc = function(count)
+                count += size
+        except ExitProgram as signal:
+            return signal.code
+        except CustomException as error:
+            return error.code
+        # If the program ended normally, return 0
+        return 0
@@ -1,67 +1,275 @@
-import argparse
 import sys
 import os
+import types
 from . import ErrorHandler as e
 
 # Modified argparse library
-class MyArgumentParser(argparse.ArgumentParser):
+# Class is created when it is needed for the first time, so argparse is not imported by fast path of parsing
+def _my_argument_parser_class():
+    import argparse
 
-    # Overriding the method to write custom error when combining -h/--help with other arguments
-    def _parse_known_args(self, arg_strings, *args, **kwargs):
-        # Check if '-h' or '--help' is present with other arguments
-        if ('-h' in arg_strings or '--help' in arg_strings) and len(arg_strings) > 1:
-            self.error("'-h'/'--help' cannot be used with other arguments.")
-        return super()._parse_known_args(arg_strings, *args, **kwargs)
+    class MyArgumentParser(argparse.ArgumentParser):
 
-    # Overriding to return error code 10 instead of 2
-    def error(self, message):
-        self.print_usage(sys.stderr)
-        args = {'prog': self.prog, 'message': message}
-        self.exit(10, ('%(prog)s: error: %(message)s\n') % args)
+        # Overriding the method to write custom error when combining -h/--help with other arguments
+        def _parse_known_args(self, arg_strings, *args, **kwargs):
+            # Check if '-h' or '--help' is present with other arguments
+            if ('-h' in arg_strings or '--help' in arg_strings) and len(arg_strings) > 1:
+                self.error("'-h'/'--help' cannot be used with other arguments.")
+            return super()._parse_known_args(arg_strings, *args, **kwargs)
+
+        # Overriding to return error code 10 instead of 2
+        def error(self, message):
+            self.print_usage(sys.stderr)
+            args = {'prog': self.prog, 'message': message}
+            self.exit(10, ('%(prog)s: error: %(message)s\n') % args)
+
+    return MyArgumentParser
 
 # Class for parsing arguments
 # Using modified argparse library
+# Common arguments (source, input, engine, -O, output, --no-cache) are parsed by fast path without argparse,
+# anything else (help, other options, errors) is parsed by argparse
 class ArgumentParser(e.ErrorHandable):
 
-    __slots__ = ("args", "parser", "error_message", "force_exit")
+    __slots__ = ("args", "_parser", "error_message", "force_exit")
+
+    # Default values of all arguments, the same for fast path and argparse
+    DEFAULTS = {"source_file": None, "input_file": None, "engine": "tac", "optimize": False,
+                "output_file": None, "output_dir": None, "output_buffer": None, "output_thread": False,
+                "no_cache": False, "profile_file": None, "server": False, "socket": None, "batch": None,
+                "jobs": None, "timeout": None, "report_file": None, "memoize": None}
+
+    # Options of fast path: option -> (destination, option has value)
+    FAST_OPTIONS = {"-s": ("source_file", True), "--source": ("source_file", True),
+                    "-i": ("input_file", True), "--input": ("input_file", True),
+                    "-e": ("engine", True), "--engine": ("engine", True),
+                    "-O": ("optimize", False), "--optimize": ("optimize", False),
+                    "-o": ("output_file", True), "--output": ("output_file", True),
+                    "--no-cache": ("no_cache", False)}
+
+    # Names of engines (choices of --engine)
+    ENGINES = ("tac", "closure", "aot", "jit")
+
+    # Number of cached results of --memoize without size
+    MEMOIZE_SIZE = 4096
 
     def __init__(self, force_exit=False):
-        self.parser = MyArgumentParser(
+        # argparse parser is created when it is needed
+        self._parser = None
+        super().__init__(force_exit)
+
+    # Parser of argparse with all arguments
+    @property
+    def parser(self):
+        if self._parser is None:
+            self._parser = ArgumentParser._build_parser()
+        return self._parser
+
+    @staticmethod
+    def _build_parser():
+        parser = _my_argument_parser_class()(
             description="Interpreter of IPPcode23 interpreting xml IPPcode23")
-        
-        self.parser.add_argument(
+
+        parser.add_argument(
             "-s", "--source", dest="source_file", help="source file")
         
-        self.parser.add_argument(
-            "-i", "--input", dest="input_file", help="input file")
-        super().__init__(force_exit)
+        parser.add_argument(
+            "-i", "--input", dest="input_file", action="extend", nargs="+", metavar="INPUT",
+            help="input file, more files (or glob pattern) run the program once for every input")
+
+        parser.add_argument(
+            "-e", "--engine", dest="engine", choices=ArgumentParser.ENGINES, default="tac",
+            help="execution engine (default: tac)")
+
+        parser.add_argument(
+            "-O", "--optimize", dest="optimize", action="store_true",
+            help="optimize program by dataflow analysis and superinstructions")
+
+        parser.add_argument(
+            "-o", "--output", dest="output_file", help="file for output of program (default: stdout)")
+
+        parser.add_argument(
+            "--output-dir", dest="output_dir", metavar="DIR",
+            help="directory for outputs of program for multiple inputs (INPUT_NAME.out)")
+
+        parser.add_argument(
+            "--output-buffer", dest="output_buffer", type=int, default=None, metavar="SIZE",
+            help="number of characters buffered before output is written, 0 writes after every WRITE")
+
+        parser.add_argument(
+            "--output-thread", dest="output_thread", action="store_true",
+            help="write output in separate thread")
+
+        parser.add_argument(
+            "--no-cache", dest="no_cache", action="store_true",
+            help="do not read or write cache of validated and translated programs")
+
+        parser.add_argument(
+            "--profile", dest="profile_file", metavar="FILE",
+            help="write JSON profile of executed instructions to file and summary to stderr (engines tac, jit and closure)")
+
+        parser.add_argument(
+            "--memoize", dest="memoize", type=int, nargs="?", const=ArgumentParser.MEMOIZE_SIZE, metavar="SIZE",
+            help="cache results of calls of pure functions (at most SIZE results, default: "
+                 f"{ArgumentParser.MEMOIZE_SIZE}) and print hit rates to stderr (engines tac and jit)")
+
+        parser.add_argument(
+            "--server", dest="server", action="store_true",
+            help="run as server that interprets jobs sent as JSON lines on stdin (or on --socket)")
+
+        parser.add_argument(
+            "--socket", dest="socket", metavar="PATH",
+            help="unix socket the server listens on")
+
+        parser.add_argument(
+            "--batch", dest="batch", metavar="PATH",
+            help="run test cases in directory (NAME.src, .in, .out, .rc) or in JSON lines manifest")
+
+        parser.add_argument(
+            "--jobs", dest="jobs", type=int, default=None, metavar="N",
+            help="number of processes of batch (default: number of CPUs) or of multiple inputs (default: 1)")
+
+        parser.add_argument(
+            "--timeout", dest="timeout", type=float, default=None, metavar="SECONDS",
+            help="time limit of one case of batch (default: 10) or of one job of server (default: none)")
+
+        parser.add_argument(
+            "--report", dest="report_file", metavar="FILE",
+            help="write JSON report of batch or of multiple inputs to file")
+
+        parser.set_defaults(**ArgumentParser.DEFAULTS)
+        return parser
 
     def _reset(self, force_exit=False):
         self.args = None
         super().__init__(force_exit)
 
+    # Method that parses common arguments without argparse
+    # Returns namespace of arguments or None if arguments must be parsed by argparse
+    @staticmethod
+    def _parse_fast(arg_strings):
+        values = dict(ArgumentParser.DEFAULTS)
+        index = 0
+        while index < len(arg_strings):
+            option, separator, value = arg_strings[index].partition("=")
+            fast_option = ArgumentParser.FAST_OPTIONS.get(option)
+            # argparse takes "=" after short option as part of value
+            if fast_option is None or (separator and not option.startswith("--")):
+                return None
+            dest, has_value = fast_option
+            index += 1
+            if not has_value:
+                if separator:
+                    return None
+                values[dest] = True
+                continue
+            if not separator:
+                # Missing value and value that looks like option are errors of argparse
+                if index >= len(arg_strings) or arg_strings[index].startswith("-"):
+                    return None
+                value = arg_strings[index]
+                index += 1
+            # Repeated option, more input files and unknown engine are left to argparse
+            if values[dest] != ArgumentParser.DEFAULTS[dest] or (dest == "engine" and value not in ArgumentParser.ENGINES):
+                return None
+            values[dest] = [value] if dest == "input_file" else value
+        return types.SimpleNamespace(**values)
+
+    # Method that checks if input file is glob pattern
+    @staticmethod
+    def _is_pattern(path):
+        return any(character in path for character in "*?[")
+
+    # Method that expands glob patterns in input files, files are sorted for every pattern
+    # Return list of input files or None if pattern matches no file
+    @staticmethod
+    def _expand_inputs(inputs):
+        input_files = []
+        for pattern in inputs:
+            if not ArgumentParser._is_pattern(pattern):
+                input_files.append(pattern)
+                continue
+            import glob
+            matches = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+            if not matches:
+                return None
+            input_files.extend(matches)
+        return input_files
+
     # Parse arguments and return error code 0 if everything is ok
     # Return error code 10 if no mandatory arguments are found or combining -h/--help with other arguments
+    # or combining multiple inputs with output file or profile
     # Return error code 11 if input file or source file is not found or is not readable
+    # Return error code 12 if output file or profile file cannot be written
     # Errors are handled by decorator
     @e.ErrorHandable.handle_error
     def parse_args(self, force_exit=False):
         # Reset
         self._reset(force_exit)
 
-        self.args = self.parser.parse_args()
+        self.args = ArgumentParser._parse_fast(sys.argv[1:]) or self.parser.parse_args()
+
+        if self.args.socket is not None and not self.args.server:
+            self.error_message = "Argument --socket can be used only with --server"
+            return 10
+
+        if self.args.jobs is not None and self.args.jobs < 1:
+            self.error_message = f"Number of jobs must be positive not {self.args.jobs}"
+            return 10
+
+        if self.args.timeout is not None and self.args.timeout <= 0:
+            self.error_message = f"Timeout must be positive not {self.args.timeout}"
+            return 10
+
+        if self.args.batch is not None:
+            if not os.path.exists(self.args.batch):
+                self.error_message = f"Batch {self.args.batch} not found"
+                return 11
+            return self._check_writable("Report", self.args.report_file)
+
+        if self.args.server:
+            # Sources and inputs are part of jobs
+            return 0
 
         if self.args.source_file is None and self.args.input_file is None:
             self.error_message = "No mandatory arguments found at least one of them is required (-s/--source or -i/--input)"
             return 10
 
-        if self.args.input_file is not None:
-            if not os.path.exists(self.args.input_file):
-                self.error_message = f"Input file {self.args.input_file} not found"
+        # Program runs once for every input if more inputs, glob pattern or output directory are given
+        # input_files are all inputs, input_file is the only input of program (None for stdin or multiple inputs)
+        inputs = self.args.input_file or []
+        self.args.multiple_inputs = (len(inputs) > 1 or any(ArgumentParser._is_pattern(pattern) for pattern in inputs)
+                                     or self.args.output_dir is not None)
+        self.args.input_files = ArgumentParser._expand_inputs(inputs)
+        if self.args.input_files is None:
+            self.error_message = f"Input files {' '.join(inputs)} not found"
+            return 11
+        self.args.input_file = None if self.args.multiple_inputs or not inputs else self.args.input_files[0]
+
+        for input_file in self.args.input_files:
+            if not os.path.exists(input_file):
+                self.error_message = f"Input file {input_file} not found"
                 return 11
-            elif not os.access(self.args.input_file, os.R_OK):
-                self.error_message = f"Input file {self.args.input_file} is not readable. No permission"
+            elif not os.access(input_file, os.R_OK):
+                self.error_message = f"Input file {input_file} is not readable. No permission"
                 return 11
+
+        if self.args.multiple_inputs:
+            if not self.args.input_files:
+                self.error_message = "Argument --output-dir requires input files (-i/--input)"
+                return 10
+            if self.args.output_file is not None or self.args.profile_file is not None:
+                self.error_message = "Multiple inputs cannot be used with -o/--output or --profile, use --output-dir"
+                return 10
+            if self.args.output_dir is not None and not os.path.isdir(self.args.output_dir):
+                self.error_message = f"Output directory {self.args.output_dir} not found"
+                return 12
+            if self.args.output_dir is not None and not os.access(self.args.output_dir, os.W_OK):
+                self.error_message = f"Output directory {self.args.output_dir} is not writable. No permission"
+                return 12
+            error_code = self._check_writable("Report", self.args.report_file)
+            if error_code:
+                return error_code
             
         if self.args.source_file is not None:
             if not os.path.exists(self.args.source_file):
@@ -70,5 +278,47 @@ class ArgumentParser(e.ErrorHandable):
             elif not os.access(self.args.source_file, os.R_OK):
                 self.error_message = f"Source file {self.args.source_file} is not readable. No permission"
                 return 11
-            
+
+        if self.args.output_buffer is not None and self.args.output_buffer < 0:
+            self.error_message = f"Size of output buffer must not be negative not {self.args.output_buffer}"
+            return 10
+
+        if self.args.profile_file is not None and self.args.engine == "aot":
+            self.error_message = "Profiling is not supported by engine aot, use engine tac, jit or closure"
+            return 10
+
+        if self.args.memoize is not None:
+            if self.args.memoize < 1:
+                self.error_message = f"Size of cache of --memoize must be positive not {self.args.memoize}"
+                return 10
+            if self.args.engine not in ("tac", "jit"):
+                self.error_message = f"Memoization is not supported by engine {self.args.engine}, use engine tac or jit"
+                return 10
+            if self.args.profile_file is not None:
+                self.error_message = "Argument --memoize cannot be used with --profile"
+                return 10
+
+        # Return error code 12 if output file or profile file cannot be created or is not writable
+        for kind, path in (("Output", self.args.output_file), ("Profile", self.args.profile_file)):
+            error_code = self._check_writable(kind, path)
+            if error_code:
+                return error_code
+
+        return 0
+
+    # Method that checks if file can be written
+    # Return error code 12 if file is a directory or it cannot be created or written
+    def _check_writable(self, kind, path):
+        if path is None:
+            return 0
+        if os.path.isdir(path):
+            self.error_message = f"{kind} file {path} is a directory"
+            return 12
+        elif os.path.exists(path):
+            if not os.access(path, os.W_OK):
+                self.error_message = f"{kind} file {path} is not writable. No permission"
+                return 12
+        elif not os.access(os.path.dirname(os.path.abspath(path)), os.W_OK):
+            self.error_message = f"{kind} file {path} cannot be created. No permission"
+            return 12
         return 0
\ No newline at end of file
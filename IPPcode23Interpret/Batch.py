@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import time
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from . import ErrorHandler as e
+from . import Interpret
+from . import Server
+from . import Input
+
+# Stream that compares written output with file of expected output while program runs
+# Expected output is read by the same amount as program writes, so outputs are never held in memory
+# Without expected file everything matches
+class OutputComparator:
+
+    __slots__ = ("_expected", "written", "mismatch")
+
+    def __init__(self, expected_path=None):
+        self._expected = None if expected_path is None else open(expected_path, encoding="utf-8", newline="")
+        # Number of written characters
+        self.written = 0
+        # Offset of first different character, None if outputs are the same so far
+        self.mismatch = None
+
+    def write(self, text):
+        if self._expected is not None and self.mismatch is None:
+            expected = self._expected.read(len(text))
+            if expected != text:
+                index = 0
+                while index < len(expected) and expected[index] == text[index]:
+                    index += 1
+                self.mismatch = self.written + index
+        self.written += len(text)
+
+    def flush(self):
+        pass
+
+    # Method that checks end of expected output and closes it, returns True if outputs are the same
+    def finish(self):
+        if self._expected is None:
+            return True
+        if self.mismatch is None and self._expected.read(1):
+            self.mismatch = self.written
+        self._expected.close()
+        self._expected = None
+        return self.mismatch is None
+
+
+# Interpret of worker process, it is created once per process by _init_worker
+_worker = None
+
+def _init_worker(options):
+    global _worker
+    _worker = (Server.InterpretServer(Interpret.Interpret()), options)
+
+# Function that runs one test case in worker process and returns its result
+def _run_case(case):
+    server, options = _worker
+    job = {"id": case["name"], "source_file": case["source"], "engine": options["engine"],
+           "optimize": options["optimize"], "cache": options["cache"], "timeout": options["timeout"]}
+    if case.get("input") is not None:
+        job["input_file"] = case["input"]
+    else:
+        job["input"] = ""
+    # Output is compared only if program should end successfully
+    expected_output = case.get("output") if case["exit_code"] == 0 else None
+    comparator = OutputComparator(expected_output)
+    result = {"name": case["name"], "expected_exit_code": case["exit_code"]}
+    start = time.perf_counter()
+    response = server.run_job(job, comparator)
+    # Job that runs longer than time limit has no exit code
+    if response["exit_code"] is None:
+        result.update(status="timeout", exit_code=None, time=time.perf_counter() - start)
+        comparator.finish()
+        return result
+    result["time"] = time.perf_counter() - start
+    result["exit_code"] = response["exit_code"]
+    same_output = comparator.finish()
+    if response["exit_code"] != case["exit_code"]:
+        result["status"] = "fail"
+        result["stderr"] = response["stderr"][-BatchRunner.STDERR_LIMIT:]
+    elif not same_output:
+        result["status"] = "fail"
+        result["output_mismatch"] = comparator.mismatch
+    else:
+        result["status"] = "pass"
+    return result
+
+
+# Class that runs test cases in parallel in pool of processes
+# Cases are in directory (every NAME.src with optional NAME.in, NAME.out and NAME.rc, as in IPP tests)
+# or in manifest file with one JSON object per line:
+#   {"name": ..., "source": path, "input": path, "output": path, "exit_code": int}
+# Paths in manifest are relative to manifest. Missing input is empty, missing exit code is 0
+# Every worker process has its own Interpret that is reused for all of its cases
+# Summary is printed to stdout and report with result and time of every case can be written as JSON
+# Returns 0 if all cases passed, 1 otherwise, 11 if cases cannot be read
+class BatchRunner(e.ErrorHandable):
+
+    __slots__ = ("options", "results", "error_message", "force_exit")
+
+    # Default time limit of one case in seconds
+    TIMEOUT = 10.0
+    # Number of characters of stderr of failed case in report
+    STDERR_LIMIT = 1000
+
+    def __init__(self, engine="tac", optimize=False, cache=True, timeout=None, force_exit=False):
+        self.options = {"engine": engine, "optimize": optimize, "cache": cache,
+                        "timeout": BatchRunner.TIMEOUT if timeout is None else timeout}
+        self.results = []
+        super().__init__(force_exit)
+
+    def _reset(self, force_exit=False):
+        self.results = []
+        super().__init__(force_exit)
+
+    # Method that returns cases in directory
+    @staticmethod
+    def _directory_cases(directory):
+        cases = []
+        for root, _, files in os.walk(directory):
+            for file_name in sorted(files):
+                if not file_name.endswith(".src"):
+                    continue
+                base = os.path.join(root, file_name[:-4])
+                exit_code = 0
+                if os.path.exists(base + ".rc"):
+                    with open(base + ".rc") as f:
+                        exit_code = int(f.read().strip() or 0)
+                cases.append({"name": os.path.relpath(base, directory), "source": base + ".src",
+                              "input": base + ".in" if os.path.exists(base + ".in") else None,
+                              "output": base + ".out" if os.path.exists(base + ".out") else None,
+                              "exit_code": exit_code})
+        cases.sort(key=lambda case: case["name"])
+        return cases
+
+    # Method that returns cases in manifest file
+    @staticmethod
+    def _manifest_cases(manifest):
+        cases = []
+        directory = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                case = {"name": entry.get("name", entry["source"]), "exit_code": int(entry.get("exit_code", 0))}
+                for key in ("source", "input", "output"):
+                    case[key] = None if entry.get(key) is None else os.path.join(directory, entry[key])
+                cases.append(case)
+        return cases
+
+    # Method that prints summary of results
+    def _summary(self, elapsed, stream):
+        counts = {"pass": 0, "fail": 0, "timeout": 0, "error": 0}
+        for result in self.results:
+            counts[result["status"]] += 1
+            if result["status"] != "pass":
+                details = f"exit code {result.get('exit_code')} (expected {result['expected_exit_code']})"
+                if "output_mismatch" in result:
+                    details = f"output differs at character {result['output_mismatch']}"
+                print(f"{result['status'].upper():<8} {result['name']}: {details}", file=stream)
+        print(f"{len(self.results)} cases in {elapsed:.2f} s: {counts['pass']} passed, {counts['fail']} failed, "
+              f"{counts['timeout']} timed out, {counts['error']} errors", file=stream)
+        return counts
+
+    # Method that runs all cases in directory or manifest with given number of processes
+    # Errors are handled by decorator
+    @e.ErrorHandable.handle_error
+    def run(self, path, jobs=None, report_file=None, force_exit=False):
+        self._reset(force_exit)
+        try:
+            cases = BatchRunner._directory_cases(path) if os.path.isdir(path) else BatchRunner._manifest_cases(path)
+        except (OSError, ValueError, KeyError) as error:
+            self.error_message = f"Cases in {path} cannot be read: {error}"
+            return 11
+        jobs = jobs or os.cpu_count() or 1
+        start = time.perf_counter()
+        with concurrent.futures.ProcessPoolExecutor(jobs, initializer=_init_worker,
+                                                    initargs=(self.options,)) as executor:
+            # Small chunks keep all workers busy, big chunks lower the cost of sending cases
+            chunk_size = max(1, min(64, len(cases) // (jobs * 8)))
+            try:
+                for result in executor.map(_run_case, cases, chunksize=chunk_size):
+                    self.results.append(result)
+            except BrokenProcessPool as error:
+                for case in cases[len(self.results):]:
+                    self.results.append({"name": case["name"], "status": "error", "exit_code": None,
+                                         "expected_exit_code": case["exit_code"], "error": str(error)})
+        elapsed = time.perf_counter() - start
+        counts = self._summary(elapsed, sys.stdout)
+        if report_file is not None:
+            with open(report_file, "w") as f:
+                json.dump({"engine": self.options["engine"], "optimize": self.options["optimize"],
+                           "jobs": jobs, "time": elapsed, "counts": counts, "cases": self.results}, f, indent=2)
+                f.write("\n")
+        return 0 if counts["pass"] == len(self.results) else 1
+
+
+# Prepared program of InputRunner (interpret, args, code, labels)
+# Worker processes are forked after it is set, so they inherit it and never parse the program again
+_program = None
+
+def _run_input(input_file):
+    return InputRunner.run_input(*_program, input_file)
+
+
+# Class that runs one program for many input files (-i with more files or glob pattern)
+# Program is parsed, checked, decoded and optimized only once, then engine (reset by every run)
+# executes it for every input, in this process or in forked worker processes (--jobs)
+# Outputs are printed to stdout, every after header with name of input, or written to
+# --output-dir as INPUT_NAME.out, messages and exit code of every input are printed to stderr
+# Report with exit code and time of every input can be written as JSON
+# Returns 0 if program ended with 0 for all inputs, otherwise the first nonzero exit code
+class InputRunner(e.ErrorHandable):
+
+    __slots__ = ("interpret", "results", "error_message", "force_exit")
+
+    def __init__(self, interpret, force_exit=False):
+        # Instance of Interpret.Interpret that prepares and executes program
+        self.interpret = interpret
+        self.results = []
+        super().__init__(force_exit)
+
+    def _reset(self, force_exit=False):
+        self.results = []
+        super().__init__(force_exit)
+
+    # Method that executes prepared program for one input file and returns its result
+    @staticmethod
+    def run_input(interpret, args, code, labels, input_file):
+        def execute(output):
+            interpret.ippcode_interpret.output = output
+            input_stream = Input.MappedInput(input_file)
+            try:
+                return interpret.execute_program(args, True, code, labels, input_stream)
+            finally:
+                input_stream.close()
+
+        output_file = None
+        if args.output_dir is not None:
+            name = os.path.splitext(os.path.basename(input_file))[0]
+            output_file = os.path.join(args.output_dir, f"{name}.out")
+        start = time.perf_counter()
+        if output_file is None:
+            exit_code, stdout, stderr = Server.InterpretServer.run_captured(execute)
+        else:
+            with open(output_file, "w") as stream:
+                exit_code, stdout, stderr = Server.InterpretServer.run_captured(execute, stream)
+        result = {"input": input_file, "exit_code": exit_code, "time": time.perf_counter() - start,
+                  "output": output_file, "stderr": stderr}
+        if output_file is None:
+            result["stdout"] = stdout
+        return result
+
+    # Method that prints output, messages and exit code of one input
+    @staticmethod
+    def _print_result(result):
+        if "stdout" in result:
+            print(f"==> {result['input']} <==", file=sys.stdout)
+            sys.stdout.write(result["stdout"])
+            sys.stdout.flush()
+        sys.stderr.write(result["stderr"])
+        print(f"{result['input']}: exit code {result['exit_code']}", file=sys.stderr)
+
+    # Method that prepares program once and runs it for all input files of arguments
+    # Errors of program (parsing, semantic) are handled when it is prepared, same as for one input
+    # Errors are handled by decorator
+    @e.ErrorHandable.handle_error
+    def run(self, args, force_exit=False):
+        global _program
+        self._reset(force_exit)
+        code, labels = self.interpret.prepare_program(args, args.source_file)
+        jobs = args.jobs or 1
+        start = time.perf_counter()
+        if jobs == 1:
+            results = (InputRunner.run_input(self.interpret, args, code, labels, input_file)
+                       for input_file in args.input_files)
+            for result in results:
+                InputRunner._print_result(result)
+                self.results.append(result)
+        else:
+            _program = (self.interpret, args, code, labels)
+            try:
+                with concurrent.futures.ProcessPoolExecutor(
+                        jobs, mp_context=multiprocessing.get_context("fork")) as executor:
+                    for result in executor.map(_run_input, args.input_files):
+                        InputRunner._print_result(result)
+                        self.results.append(result)
+            finally:
+                _program = None
+        elapsed = time.perf_counter() - start
+
+        if args.report_file is not None:
+            with open(args.report_file, "w") as f:
+                inputs = [{key: value for key, value in result.items() if key != "stdout"} for result in self.results]
+                json.dump({"source": args.source_file, "engine": args.engine, "optimize": args.optimize,
+                           "jobs": jobs, "time": elapsed, "inputs": inputs}, f, indent=2)
+                f.write("\n")
+        for result in self.results:
+            if result["exit_code"] != 0:
+                self.error_message = f"Program ended with exit code {result['exit_code']} for input {result['input']}"
+                return result["exit_code"]
+        return 0
@@ -0,0 +1,1076 @@
+import sys
+import time
+import operator
+from . import Nil
+from . import StringBuffer as sb
+from . import ErrorHandler as e
+from .TacInterpret import (InterpretData, InstructionUtils, CustomException, UNDEFINED,
+                           RedefiningVariable, BadOperandTypes, NotExistingVariable,
+                           NotExistingFrame, MissingOperandValue, BadOperandValue, StringError)
+
+# Signal raised by compiled EXIT instruction
+# It stops the main loop with exit code
+class ExitProgram(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+# Signal raised by compiled BREAK instruction
+# Main loop knows program counter and instruction count so it prints the state
+class BreakProgram(Exception):
+    pass
+
+
+# Class that interprets the code by compiling every instruction into python closure
+# Closure is bound to decoded operands of instruction and returns program counter of next instruction
+# Errors are not caught in every instruction, they are propagated to the single handler in interpret()
+# Output and exit codes are the same as in TACInterpret
+class ClosureInterpret(InterpretData):
+
+    def __init__(self, code: list = None, labels: dict = None, input_stream=sys.stdin, force_exit=False):
+        InterpretData.__init__(self, code, labels, input_stream, force_exit)
+        # Compiled instructions. Index is program counter of instruction
+        self._ops = []
+        self._fused_count = [0]
+
+    # Method that returns closure that returns current frame of given frame name
+    # Raises exception if local frames stack is empty or temporary frame is not defined
+    # Frame that is proven to exist (checked is False) is not checked
+    def _frame_getter(self, frame_name, pc, checked=True):
+        frames = self.FRAMES
+        opcode = self.code[pc][0]
+        if frame_name == "GF":
+            global_frame = frames["GF"]
+            return lambda: global_frame
+
+        if frame_name == "LF":
+            local_frames = frames["LF"]
+            if not checked:
+                return lambda: local_frames[-1]
+
+            def get_frame():
+                if local_frames:
+                    return local_frames[-1]
+                raise NotExistingFrame(self, f"No local frame when calling instruction {opcode} in program counter: {pc}.")
+            return get_frame
+
+        if not checked:
+            return lambda: frames["TF"]
+
+        def get_frame():
+            frame = frames["TF"]
+            if frame is None:
+                raise NotExistingFrame(self, f"No temporary frame when calling instruction {opcode} in program counter: {pc}.")
+            return frame
+        return get_frame
+
+    # Method that returns closure that returns value of symbol
+    # Constant is returned directly, variable is checked if it exists and if it is initialized
+    # String buffer is returned as python str, only if text is False it is returned as it is
+    def _getter(self, operand, pc, none_check=True, text=True):
+        if operand.frame is None:
+            value = operand.value
+            return lambda: value
+
+        frame_name, name, slot = operand.frame, operand.name, operand.slot
+        opcode = self.code[pc][0]
+        # Type of values that are converted to str (type of value is never None)
+        buffer_type = sb.StringBuffer if text else None
+
+        # Variable annotated by TypeInference surely exists, it is checked only if it can be uninitialized
+        # and converted only if it can be string
+        types = getattr(operand, "types", None)
+        if types is not None:
+            get_frame = self._frame_getter(frame_name, pc, False)
+            if str not in types:
+                buffer_type = None
+            if (none_check and None in types) or buffer_type is not None:
+                def get():
+                    value = get_frame()[slot]
+                    if value is None and none_check:
+                        raise MissingOperandValue(self, f"Variable {frame_name}@{name} not initialized. Instruction {opcode} on program counter: {pc}")
+                    if type(value) is buffer_type:
+                        return value.text()
+                    return value
+                return get
+            if frame_name == "GF":
+                global_frame = self.FRAMES["GF"]
+                return lambda: global_frame[slot]
+            return lambda: get_frame()[slot]
+
+        # Called only if value is undefined or None
+        def check(value):
+            if value is UNDEFINED:
+                raise NotExistingVariable(self, f"No variable {frame_name}@{name} in frame when calling instruction {opcode} in program counter: {pc}.")
+            if none_check:
+                raise MissingOperandValue(self, f"Variable {frame_name}@{name} not initialized. Instruction {opcode} on program counter: {pc}")
+            return value
+
+        if frame_name == "GF":
+            global_frame = self.FRAMES["GF"]
+
+            def get():
+                value = global_frame[slot]
+                if value is None or value is UNDEFINED:
+                    return check(value)
+                if type(value) is buffer_type:
+                    return value.text()
+                return value
+            return get
+
+        get_frame = self._frame_getter(frame_name, pc)
+
+        def get():
+            value = get_frame()[slot]
+            if value is None or value is UNDEFINED:
+                return check(value)
+            if type(value) is buffer_type:
+                return value.text()
+            return value
+        return get
+
+    # Method that returns closure that sets value of variable
+    # Raises exception if variable is not defined in frame
+    def _setter(self, variable, pc):
+        frame_name, name, slot = variable.frame, variable.name, variable.slot
+        opcode = self.code[pc][0]
+
+        # Variable annotated by TypeInference surely exists
+        if getattr(variable, "types", None) is not None:
+            if frame_name == "GF":
+                global_frame = self.FRAMES["GF"]
+
+                def set_(value):
+                    global_frame[slot] = value
+                return set_
+            get_frame = self._frame_getter(frame_name, pc, False)
+
+            def set_(value):
+                get_frame()[slot] = value
+            return set_
+
+        def not_existing():
+            return NotExistingVariable(self, f"No variable {frame_name}@{name} in frame when calling instruction {opcode} in program counter: {pc}.")
+
+        if frame_name == "GF":
+            global_frame = self.FRAMES["GF"]
+
+            def set_(value):
+                if global_frame[slot] is UNDEFINED:
+                    raise not_existing()
+                global_frame[slot] = value
+            return set_
+
+        get_frame = self._frame_getter(frame_name, pc)
+
+        def set_(value):
+            frame = get_frame()
+            if frame[slot] is UNDEFINED:
+                raise not_existing()
+            frame[slot] = value
+        return set_
+
+    # Method that returns program counter of instruction executed after jump on program counter
+    # LABEL of jump is skipped (see InterpretData._resolve_jumps)
+    # Undefined label raises KeyError, it is raised when the jump is executed
+    def _jump_target(self, pc):
+        target = self._targets[pc]
+        if target is None:
+            raise KeyError(self.code[pc][1])
+        return self._following[target]
+
+    # Methods that compile instructions into closures
+    # Each of them takes program counter of instruction and returns closure
+    # Closure returns program counter of next instruction
+
+    def _compile_move(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get = self._getter(self.code[pc][2], pc, text=False)
+        nxt = self._following[pc]
+
+        def op():
+            set_(get())
+            return nxt
+        return op
+
+    def _compile_create_frame(self, pc):
+        frames = self.FRAMES
+        new_frame = self._new_frame
+        free_frame = self._free_frame
+        nxt = self._following[pc]
+
+        def op():
+            free_frame(frames["TF"])
+            frames["TF"] = new_frame()
+            return nxt
+        return op
+
+    def _compile_push_frame(self, pc):
+        frames = self.FRAMES
+        local_frames = frames["LF"]
+        opcode = self.code[pc][0]
+        nxt = self._following[pc]
+
+        def op():
+            if frames["TF"] is None:
+                raise NotExistingFrame(self, f"Missing frame in program counter: {pc} in instruction {opcode}")
+            local_frames.append(frames["TF"])
+            frames["TF"] = None
+            return nxt
+        return op
+
+    def _compile_pop_frame(self, pc):
+        frames = self.FRAMES
+        local_frames = frames["LF"]
+        free_frame = self._free_frame
+        opcode = self.code[pc][0]
+        nxt = self._following[pc]
+
+        def op():
+            if not local_frames:
+                raise NotExistingFrame(self, f"Missing frame in program counter: {pc} in instruction {opcode}")
+            free_frame(frames["TF"])
+            frames["TF"] = local_frames.pop()
+            return nxt
+        return op
+
+    def _compile_def_var(self, pc):
+        variable = self.code[pc][1]
+        frame_name, name, slot = variable.frame, variable.name, variable.slot
+        get_frame = self._frame_getter(frame_name, pc)
+        nxt = self._following[pc]
+
+        def op():
+            frame = get_frame()
+            if frame[slot] is not UNDEFINED:
+                raise RedefiningVariable(self, f"Variable {frame_name}@{name} redefining on program counter {pc}.")
+            frame[slot] = None
+            return nxt
+        return op
+
+    def _compile_call(self, pc):
+        call_stack = self._call_stack
+        target = self._jump_target(pc)
+
+        def op():
+            call_stack.append(pc)
+            return target
+        return op
+
+    def _compile_return(self, pc):
+        call_stack = self._call_stack
+        following = self._following
+
+        def op():
+            if not call_stack:
+                raise MissingOperandValue(self, f"Missing return value in program counter: {pc}")
+            return following[call_stack.pop()]
+        return op
+
+    def _compile_pushs(self, pc):
+        data_stack = self._data_stack
+        get = self._getter(self.code[pc][1], pc, text=False)
+        nxt = self._following[pc]
+
+        def op():
+            data_stack.append(get())
+            return nxt
+        return op
+
+    def _compile_pops(self, pc):
+        data_stack = self._data_stack
+        set_ = self._setter(self.code[pc][1], pc)
+        nxt = self._following[pc]
+
+        def op():
+            if not data_stack:
+                raise MissingOperandValue(self, f"Missing data when POPS  in program counter: {pc}")
+            set_(data_stack.pop())
+            return nxt
+        return op
+
+    def _compile_clears(self, pc):
+        data_stack = self._data_stack
+        nxt = self._following[pc]
+
+        def op():
+            data_stack.clear()
+            return nxt
+        return op
+
+    # Method that compiles stack variants of arithmetic, relational and logical instructions with two operands
+    # Operands are popped from data stack (the second one is on top) and result is pushed to it
+    # Arguments are same as in _compile_calculation, values on data stack are always initialized
+    def _compile_stack_calculation(self, pc, operation, valid_types, mode=""):
+        data_stack = self._data_stack
+        pop = data_stack.pop
+        push = data_stack.append
+        opcode = self.code[pc][0]
+        nil = Nil.nil
+        # String buffer is converted to python str only if operands can be strings
+        buffer_type = sb.StringBuffer if str in valid_types else None
+        nxt = self._following[pc]
+
+        def missing():
+            return MissingOperandValue(self, f"Missing data when {opcode} in program counter: {pc}")
+
+        def bad_types():
+            return BadOperandTypes(self, f"Invalid operand types in program counter: {pc} on instruction {opcode}")
+
+        if mode == "eq":
+            def op():
+                if len(data_stack) < 2:
+                    raise missing()
+                second_value = pop()
+                first_value = pop()
+                if type(first_value) is buffer_type:
+                    first_value = first_value.text()
+                if type(second_value) is buffer_type:
+                    second_value = second_value.text()
+                first_type = type(first_value)
+                if first_type == nil or type(second_value) == nil:
+                    push(first_value == second_value)
+                elif first_type == type(second_value) and first_type in valid_types:
+                    push(operation(first_value, second_value))
+                else:
+                    raise bad_types()
+                return nxt
+
+        elif mode == "div":
+            def op():
+                if len(data_stack) < 2:
+                    raise missing()
+                second_value = pop()
+                first_value = pop()
+                first_type = type(first_value)
+                if first_type == type(second_value) and first_type in valid_types:
+                    if second_value == 0:
+                        raise BadOperandValue(self, f"Division by zero in program counter: {pc}")
+                    push(operation(first_value, second_value))
+                else:
+                    raise bad_types()
+                return nxt
+
+        elif buffer_type is not None:
+            def op():
+                if len(data_stack) < 2:
+                    raise missing()
+                second_value = pop()
+                first_value = pop()
+                if type(first_value) is buffer_type:
+                    first_value = first_value.text()
+                if type(second_value) is buffer_type:
+                    second_value = second_value.text()
+                first_type = type(first_value)
+                if first_type == type(second_value) and first_type in valid_types:
+                    push(operation(first_value, second_value))
+                else:
+                    raise bad_types()
+                return nxt
+
+        else:
+            def op():
+                if len(data_stack) < 2:
+                    raise missing()
+                second_value = pop()
+                first_value = pop()
+                first_type = type(first_value)
+                if first_type == type(second_value) and first_type in valid_types:
+                    push(operation(first_value, second_value))
+                else:
+                    raise bad_types()
+                return nxt
+        return op
+
+    def _compile_adds(self, pc):
+        return self._compile_stack_calculation(pc, operator.add, (int,))
+
+    def _compile_subs(self, pc):
+        return self._compile_stack_calculation(pc, operator.sub, (int,))
+
+    def _compile_muls(self, pc):
+        return self._compile_stack_calculation(pc, operator.mul, (int,))
+
+    def _compile_idivs(self, pc):
+        return self._compile_stack_calculation(pc, operator.floordiv, (int,), "div")
+
+    def _compile_lts(self, pc):
+        return self._compile_stack_calculation(pc, operator.lt, (int, bool, str))
+
+    def _compile_gts(self, pc):
+        return self._compile_stack_calculation(pc, operator.gt, (int, bool, str))
+
+    def _compile_eqs(self, pc):
+        return self._compile_stack_calculation(pc, operator.eq, (int, bool, str, Nil.nil), "eq")
+
+    def _compile_ands(self, pc):
+        return self._compile_stack_calculation(pc, lambda x, y: x and y, (bool,))
+
+    def _compile_ors(self, pc):
+        return self._compile_stack_calculation(pc, lambda x, y: x or y, (bool,))
+
+    def _compile_nots(self, pc):
+        data_stack = self._data_stack
+        opcode = self.code[pc][0]
+        nxt = self._following[pc]
+
+        def op():
+            if not data_stack:
+                raise MissingOperandValue(self, f"Missing data when {opcode} in program counter: {pc}")
+            value = data_stack[-1]
+            if type(value) != bool:
+                raise BadOperandTypes(self, f"Invalid operand type in program counter: {pc} on instruction {opcode}")
+            data_stack[-1] = not value
+            return nxt
+        return op
+
+    # Method that compiles arithmetic, relational and logical instructions with two operands
+    # valid_types is tuple of types that both operands must have
+    # mode "eq" allows nil in any operand, mode "div" checks division by zero
+    def _compile_calculation(self, pc, operation, valid_types, mode=""):
+        set_ = self._setter(self.code[pc][1], pc)
+        get1 = self._getter(self.code[pc][2], pc)
+        get2 = self._getter(self.code[pc][3], pc)
+        opcode = self.code[pc][0]
+        nil = Nil.nil
+        nxt = self._following[pc]
+
+        def bad_types():
+            return BadOperandTypes(self, f"Invalid operand types in program counter: {pc} on instruction {opcode}")
+
+        # Types of operands are checked only if they are not known to be valid
+        first_type = InstructionUtils._known_type(self.code[pc][2])
+        if first_type is not None and first_type is InstructionUtils._known_type(self.code[pc][3]) \
+                and first_type in valid_types:
+            if mode == "div":
+                def op():
+                    second_value = get2()
+                    if second_value == 0:
+                        raise BadOperandValue(self, f"Division by zero in program counter: {pc}")
+                    set_(operation(get1(), second_value))
+                    return nxt
+            else:
+                def op():
+                    set_(operation(get1(), get2()))
+                    return nxt
+
+        elif mode == "eq":
+            def op():
+                first_value = get1()
+                second_value = get2()
+                first_type = type(first_value)
+                if first_type == nil or type(second_value) == nil:
+                    set_(first_value == second_value)
+                elif first_type == type(second_value) and first_type in valid_types:
+                    set_(operation(first_value, second_value))
+                else:
+                    raise bad_types()
+                return nxt
+
+        elif mode == "div":
+            def op():
+                first_value = get1()
+                second_value = get2()
+                first_type = type(first_value)
+                if first_type == type(second_value) and first_type in valid_types:
+                    if second_value == 0:
+                        raise BadOperandValue(self, f"Division by zero in program counter: {pc}")
+                    set_(operation(first_value, second_value))
+                else:
+                    raise bad_types()
+                return nxt
+
+        else:
+            def op():
+                first_value = get1()
+                second_value = get2()
+                first_type = type(first_value)
+                if first_type == type(second_value) and first_type in valid_types:
+                    set_(operation(first_value, second_value))
+                else:
+                    raise bad_types()
+                return nxt
+        return op
+
+    def _compile_add(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x + y, (int,))
+
+    def _compile_sub(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x - y, (int,))
+
+    def _compile_mul(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x * y, (int,))
+
+    def _compile_idiv(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x // y, (int,), "div")
+
+    def _compile_lt(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x < y, (int, bool, str))
+
+    def _compile_gt(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x > y, (int, bool, str))
+
+    def _compile_eq(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x == y, (int, bool, str, Nil.nil), "eq")
+
+    def _compile_and(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x and y, (bool,))
+
+    def _compile_or(self, pc):
+        return self._compile_calculation(pc, lambda x, y: x or y, (bool,))
+
+    def _compile_not(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get = self._getter(self.code[pc][2], pc)
+        opcode = self.code[pc][0]
+        nxt = self._following[pc]
+
+        def op():
+            value = get()
+            if type(value) != bool:
+                raise BadOperandTypes(self, f"Invalid operand type in program counter: {pc} on instruction {opcode}")
+            set_(not value)
+            return nxt
+        return op
+
+    def _compile_int2char(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get = self._getter(self.code[pc][2], pc)
+        nxt = self._following[pc]
+
+        def op():
+            value = get()
+            if type(value) != int:
+                raise BadOperandTypes(self, f"Invalid operand type for int2char: {type(value)} on program counter {pc}.\nOnly int is allowed.")
+            elif value < 0 or value > 0x10FFFF:
+                raise StringError(self, f"Invalid value for int2char: {value} on program counter {pc}.\nOnly values from range 0-0x10FFFF are allowed.")
+            set_(chr(value))
+            return nxt
+        return op
+
+    def _compile_stri2int(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get1 = self._getter(self.code[pc][2], pc, text=False)
+        get2 = self._getter(self.code[pc][3], pc)
+        string_types = sb.STRING_TYPES
+        nxt = self._following[pc]
+
+        def op():
+            value = get1()
+            index = get2()
+            if type(value) not in string_types:
+                raise BadOperandTypes(self, f"Invalid second operand type for str2int: {type(value)} on program counter {pc}.")
+            if type(index) != int:
+                raise BadOperandTypes(self, f"Invalid third operand type for str2int: {type(index)} on program counter {pc}.")
+            if index < len(value) and index >= 0:
+                set_(ord(sb.get_char(value, index)))
+            else:
+                raise StringError(self, f"Invalid index for str2int: {index} on program counter {pc}.")
+            return nxt
+        return op
+
+    def _compile_int2chars(self, pc):
+        data_stack = self._data_stack
+        opcode = self.code[pc][0]
+        nxt = self._following[pc]
+
+        def op():
+            if not data_stack:
+                raise MissingOperandValue(self, f"Missing data when {opcode} in program counter: {pc}")
+            value = data_stack[-1]
+            if type(value) != int:
+                raise BadOperandTypes(self, f"Invalid operand type for int2char: {type(value)} on program counter {pc}.\nOnly int is allowed.")
+            elif value < 0 or value > 0x10FFFF:
+                raise StringError(self, f"Invalid value for int2char: {value} on program counter {pc}.\nOnly values from range 0-0x10FFFF are allowed.")
+            data_stack[-1] = chr(value)
+            return nxt
+        return op
+
+    def _compile_stri2ints(self, pc):
+        data_stack = self._data_stack
+        pop = data_stack.pop
+        string_types = sb.STRING_TYPES
+        opcode = self.code[pc][0]
+        nxt = self._following[pc]
+
+        def op():
+            if len(data_stack) < 2:
+                raise MissingOperandValue(self, f"Missing data when {opcode} in program counter: {pc}")
+            index = pop()
+            value = pop()
+            if type(value) not in string_types:
+                raise BadOperandTypes(self, f"Invalid second operand type for str2int: {type(value)} on program counter {pc}.")
+            if type(index) != int:
+                raise BadOperandTypes(self, f"Invalid third operand type for str2int: {type(index)} on program counter {pc}.")
+            if index < len(value) and index >= 0:
+                data_stack.append(ord(sb.get_char(value, index)))
+            else:
+                raise StringError(self, f"Invalid index for str2int: {index} on program counter {pc}.")
+            return nxt
+        return op
+
+    def _compile_read(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        type_ = self.code[pc][2]
+        types = self.TYPES
+        read_value = self._input_stream.read_value
+        flush = self.output.flush if self._flush_before_read else None
+        nxt = self._following[pc]
+
+        def op():
+            if flush is not None:
+                flush()
+            set_(read_value(type_, types))
+            return nxt
+        return op
+
+    def _compile_write(self, pc):
+        get = self._getter(self.code[pc][1], pc)
+        from_bool = InstructionUtils._from_bool
+        write = self.output.write
+        nxt = self._following[pc]
+
+        def op():
+            value = get()
+            if type(value) == bool:
+                write(from_bool(value))
+            else:
+                write(str(value))
+            return nxt
+        return op
+
+    def _compile_concat(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get1 = self._getter(self.code[pc][2], pc, text=False)
+        get2 = self._getter(self.code[pc][3], pc, text=False)
+        string_types = sb.STRING_TYPES
+        concat = sb.concat
+        nxt = self._following[pc]
+
+        def op():
+            value1 = get1()
+            value2 = get2()
+            if type(value1) not in string_types or type(value2) not in string_types:
+                raise BadOperandTypes(self, f"Invalid operand types for concat: {type(sb.to_str(value1))} and {type(sb.to_str(value2))} on program counter {pc}.")
+            set_(concat(value1, value2))
+            return nxt
+        return op
+
+    def _compile_strlen(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get = self._getter(self.code[pc][2], pc, text=False)
+        string_types = sb.STRING_TYPES
+        nxt = self._following[pc]
+
+        def op():
+            value = get()
+            if type(value) not in string_types:
+                raise BadOperandTypes(self, f"Invalid operand type for strlen: {type(value)} on program counter {pc}.")
+            set_(len(value))
+            return nxt
+        return op
+
+    def _compile_get_char(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get1 = self._getter(self.code[pc][2], pc, text=False)
+        get2 = self._getter(self.code[pc][3], pc)
+        string_types = sb.STRING_TYPES
+        get_char = sb.get_char
+        nxt = self._following[pc]
+
+        def op():
+            string = get1()
+            index = get2()
+            if type(string) not in string_types or type(index) != int:
+                raise BadOperandTypes(self, f"Invalid operand type for get_char: {type(sb.to_str(string))} and {type(index)} on program counter {pc}.")
+            elif index >= len(string) or index < 0:
+                raise StringError(self, f"Invalid index for get_char: {index} on program counter {pc}.")
+            set_(get_char(string, index))
+            return nxt
+        return op
+
+    def _compile_set_char(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get_string = self._getter(self.code[pc][1], pc, text=False)
+        get1 = self._getter(self.code[pc][2], pc)
+        get2 = self._getter(self.code[pc][3], pc)
+        opcode = self.code[pc][0]
+        string_types = sb.STRING_TYPES
+        set_char = sb.set_char
+        nxt = self._following[pc]
+
+        def op():
+            string = get_string()
+            index = get1()
+            value = get2()
+            if type(string) not in string_types or type(index) != int or type(value) != str:
+                raise BadOperandTypes(self, f"Invalid operand type for set_char: {type(sb.to_str(string))}, {type(index)} and {type(value)} on program counter {pc}.\nShould be string, int and string.")
+            if index >= len(string) or index < 0:
+                raise StringError(self, f"Invalid index for set_char: {index} on program counter {pc}.")
+            if value == "":
+                raise StringError(self, f"Invalid epmty string third argument in instruction {opcode} on program counter {pc}.")
+            set_(set_char(string, index, value[0]))
+            return nxt
+        return op
+
+    def _compile_type(self, pc):
+        set_ = self._setter(self.code[pc][1], pc)
+        get = self._getter(self.code[pc][2], pc, False, False)
+        string_types = sb.STRING_TYPES
+        nxt = self._following[pc]
+
+        def op():
+            value = get()
+            if value is None:
+                set_("")
+            elif isinstance(value, string_types):
+                set_("string")
+            else:
+                set_(type(value).__name__)
+            return nxt
+        return op
+
+    def _compile_label(self, pc):
+        nxt = self._following[pc]
+        return lambda: nxt
+
+    def _compile_jump(self, pc):
+        target = self._jump_target(pc)
+        return lambda: target
+
+    # Method that compiles JUMPIFEQ and JUMPIFNEQ
+    # Values must have same type or one of them must be nil
+    def _compile_conditional_jump(self, pc, jump_if_equal, name):
+        target = self._jump_target(pc)
+        get1 = self._getter(self.code[pc][2], pc)
+        get2 = self._getter(self.code[pc][3], pc)
+        valid_types = (int, str, bool)
+        nil = Nil.nil
+        nxt = self._following[pc]
+
+        # Types are not checked if they are known to be valid
+        type1 = InstructionUtils._known_type(self.code[pc][2])
+        type2 = InstructionUtils._known_type(self.code[pc][3])
+        if type1 is not None and type2 is not None and \
+                ((type1 == type2 and type1 in valid_types) or type1 == nil or type2 == nil):
+            def op():
+                if (get1() == get2()) == jump_if_equal:
+                    return target
+                return nxt
+            return op
+
+        def op():
+            value1 = get1()
+            value2 = get2()
+            type1 = type(value1)
+            type2 = type(value2)
+            if (type1 == type2 and type1 in valid_types) or type1 == nil or type2 == nil:
+                if (value1 == value2) == jump_if_equal:
+                    return target
+                return nxt
+            raise BadOperandTypes(self, f"Invalid operand types for {name}: {type1} and {type2} on program counter {pc}.")
+        return op
+
+    # Method that compiles JUMPIFEQS and JUMPIFNEQS
+    # Values are popped from data stack, they must have same type or one of them must be nil
+    def _compile_stack_conditional_jump(self, pc, jump_if_equal, name):
+        target = self._jump_target(pc)
+        data_stack = self._data_stack
+        pop = data_stack.pop
+        buffer_type = sb.StringBuffer
+        valid_types = (int, str, bool)
+        nil = Nil.nil
+        opcode = self.code[pc][0]
+        nxt = self._following[pc]
+
+        def op():
+            if len(data_stack) < 2:
+                raise MissingOperandValue(self, f"Missing data when {opcode} in program counter: {pc}")
+            value2 = pop()
+            value1 = pop()
+            if type(value1) is buffer_type:
+                value1 = value1.text()
+            if type(value2) is buffer_type:
+                value2 = value2.text()
+            type1 = type(value1)
+            type2 = type(value2)
+            if (type1 == type2 and type1 in valid_types) or type1 == nil or type2 == nil:
+                if (value1 == value2) == jump_if_equal:
+                    return target
+                return nxt
+            raise BadOperandTypes(self, f"Invalid operand types for {name}: {type1} and {type2} on program counter {pc}.")
+        return op
+
+    def _compile_jump_if_eqs(self, pc):
+        return self._compile_stack_conditional_jump(pc, True, "jump_if_eqs")
+
+    def _compile_jump_if_n_eqs(self, pc):
+        return self._compile_stack_conditional_jump(pc, False, "jump_if_n_eqs")
+
+    def _compile_jump_if_eq(self, pc):
+        return self._compile_conditional_jump(pc, True, "jump_if_eq")
+
+    def _compile_jump_if_n_eq(self, pc):
+        return self._compile_conditional_jump(pc, False, "jump_if_n_eq")
+
+    def _compile_exit(self, pc):
+        get = self._getter(self.code[pc][1], pc)
+
+        def op():
+            value = get()
+            if type(value) != int:
+                raise BadOperandTypes(self, f"Invalid operand type for exit: {type(value)} on program counter {pc}.")
+            if value < 0 or value > 49:
+                raise BadOperandValue(self, f"Invalid exit code: {value} on program counter {pc}.")
+            raise ExitProgram(value)
+        return op
+
+    def _compile_d_print(self, pc):
+        get = self._getter(self.code[pc][1], pc)
+        nxt = self._following[pc]
+
+        def op():
+            print(get(), file=sys.stderr)
+            return nxt
+        return op
+
+    def _compile_break(self, pc):
+        def op():
+            raise BreakProgram()
+        return op
+
+    # Dictionary that maps instruction names to methods that compile them
+    COMPILERS = {"MOVE": _compile_move, "CREATEFRAME": _compile_create_frame,
+                 "PUSHFRAME": _compile_push_frame, "POPFRAME": _compile_pop_frame,
+                 "DEFVAR": _compile_def_var, "CALL": _compile_call, "RETURN": _compile_return,
+                 "PUSHS": _compile_pushs, "POPS": _compile_pops, "CLEARS": _compile_clears,
+                 "ADD": _compile_add, "SUB": _compile_sub, "MUL": _compile_mul, "IDIV": _compile_idiv,
+                 "LT": _compile_lt, "GT": _compile_gt, "EQ": _compile_eq,
+                 "AND": _compile_and, "OR": _compile_or, "NOT": _compile_not,
+                 "INT2CHAR": _compile_int2char, "STRI2INT": _compile_stri2int,
+                 "READ": _compile_read, "WRITE": _compile_write,
+                 "CONCAT": _compile_concat, "STRLEN": _compile_strlen,
+                 "GETCHAR": _compile_get_char, "SETCHAR": _compile_set_char, "TYPE": _compile_type,
+                 "LABEL": _compile_label, "JUMP": _compile_jump,
+                 "JUMPIFEQ": _compile_jump_if_eq, "JUMPIFNEQ": _compile_jump_if_n_eq,
+                 "EXIT": _compile_exit, "DPRINT": _compile_d_print, "BREAK": _compile_break,
+                 "ADDS": _compile_adds, "SUBS": _compile_subs, "MULS": _compile_muls, "IDIVS": _compile_idivs,
+                 "LTS": _compile_lts, "GTS": _compile_gts, "EQS": _compile_eqs,
+                 "ANDS": _compile_ands, "ORS": _compile_ors, "NOTS": _compile_nots,
+                 "INT2CHARS": _compile_int2chars, "STRI2INTS": _compile_stri2ints,
+                 "JUMPIFEQS": _compile_jump_if_eqs, "JUMPIFNEQS": _compile_jump_if_n_eqs}
+
+    # Methods that compile superinstructions made by PeepholeOptimizer
+    # Closure executes instruction on pc and pc + 1, errors are reported on their own program counters
+    # Main loop counts closure as one instruction, so closure adds the second one to _fused_count
+
+    def _compile_pushs_pops(self, pc):
+        get = self._getter(self.code[pc][1], pc, text=False)
+        set_ = self._setter(self.code[pc + 1][1], pc + 1)
+        fused_count = self._fused_count
+        nxt = self._following[pc + 1]
+
+        def op():
+            # Value is pushed and popped, data stack does not change
+            set_(get())
+            fused_count[0] += 1
+            return nxt
+        return op
+
+    def _compile_compare_jump(self, pc):
+        compare = self.COMPILERS[self.code[pc][0]](self, pc)
+        jump = self.code[pc + 1]
+        variable, constant = (jump[2], jump[3]) if jump[3].frame is None else (jump[3], jump[2])
+        get = self._getter(variable, pc + 1)
+        # Variable is bool after comparison, so operands of jump have valid types
+        expected = constant.value if jump[0] == "JUMPIFEQ" else not constant.value
+        target = self._jump_target(pc + 1)
+        fused_count = self._fused_count
+        nxt = self._following[pc + 1]
+
+        def op():
+            compare()
+            fused_count[0] += 1
+            if get() == expected:
+                return target
+            return nxt
+        return op
+
+    def _compile_increment_jump(self, pc):
+        instruction = self.code[pc]
+        jump = self.code[pc + 1]
+        get = self._getter(instruction[1], pc)
+        set_ = self._setter(instruction[1], pc)
+        step = instruction[3].value
+        get2 = self._getter(jump[3], pc + 1)
+        jump_if_equal = jump[0] == "JUMPIFEQ"
+        name = "jump_if_eq" if jump_if_equal else "jump_if_n_eq"
+        target = self._jump_target(pc + 1)
+        opcode = instruction[0]
+        nil = Nil.nil
+        fused_count = self._fused_count
+        nxt = self._following[pc + 1]
+
+        def op():
+            value = get()
+            if type(value) != int:
+                raise BadOperandTypes(self, f"Invalid operand types in program counter: {pc} on instruction {opcode}")
+            value += step
+            set_(value)
+            fused_count[0] += 1
+            value2 = get2()
+            type2 = type(value2)
+            if type2 == int or type2 == nil:
+                if (value == value2) == jump_if_equal:
+                    return target
+                return nxt
+            raise BadOperandTypes(self, f"Invalid operand types for {name}: {int} and {type2} on program counter {pc + 1}.")
+        return op
+
+    def _compile_move_move(self, pc):
+        get = self._getter(self.code[pc][2], pc, text=False)
+        set1 = self._setter(self.code[pc][1], pc)
+        set2 = self._setter(self.code[pc + 1][1], pc + 1)
+        fused_count = self._fused_count
+        nxt = self._following[pc + 1]
+
+        def op():
+            # Second MOVE copies value that was just set, it is initialized
+            value = get()
+            set1(value)
+            fused_count[0] += 1
+            set2(value)
+            return nxt
+        return op
+
+    # Dictionary that maps names of superinstructions to methods that compile them
+    SUPERINSTRUCTIONS = {"PUSHS_POPS": _compile_pushs_pops, "COMPARE_JUMP": _compile_compare_jump,
+                         "INCREMENT_JUMP": _compile_increment_jump, "MOVE_MOVE": _compile_move_move}
+
+    # Method that compiles whole code into list of closures
+    # Instruction that cannot be compiled (unknown opcode, missing argument)
+    # raises the same python exception when it is executed as in TACInterpret
+    def _compile(self):
+        self._resolve_jumps()
+        self._ops = []
+        # Number of instructions executed as second part of superinstructions
+        self._fused_count = [0]
+        for pc, instruction in enumerate(self.code):
+            # Profiled program has every instruction compiled on its own
+            fused = getattr(instruction, "fused", None) if self.profiler is None else None
+            try:
+                if fused is not None:
+                    try:
+                        op = self.SUPERINSTRUCTIONS[fused](self, pc)
+                    except Exception:
+                        # Both instructions are executed separately
+                        op = self.COMPILERS[instruction[0]](self, pc)
+                else:
+                    op = self.COMPILERS[instruction[0]](self, pc)
+            except Exception as error:
+                op = ClosureInterpret._deferred_error(error)
+            self._ops.append(op)
+
+    @staticmethod
+    def _deferred_error(error):
+        def op():
+            raise error
+        return op
+
+    # Method that interprets the code
+    # Arguments are same as in TACInterpret.interpret
+    # Errors are handled by decorator
+    @e.ErrorHandable.handle_error
+    def interpret(self, force_exit_after_interpret=False, code=None, labels=None, input_stream=None):
+        # Set up the initial state of the program if called multiple times
+        if code != None:
+            if labels == None:
+                self.error_message = "Labels must be provided if code is provided."
+                return 99
+            self.update_code(code, labels)
+        if input_stream != None:
+            self.update_input_stream(input_stream)
+        # Reset interpreter before interpreting
+        self._reset(force_exit_after_interpret)
+
+        # if there is no code, return 0
+        if not self.code:
+            return 0
+        # Closures are bound to frames and stacks created by reset
+        self._compile()
+
+        # Output is written even if program ends with EXIT or error
+        try:
+            return self._run()
+        finally:
+            self.output.finish()
+
+    # Main loop of interpret
+    def _run(self):
+        # Profiled program runs in separate loop, so this loop does not measure anything
+        if self.profiler is not None:
+            return self._run_profiled()
+        ops = self._ops
+        fused_count = self._fused_count
+        lenght = len(ops)
+        pc = 0
+        count = 0
+        # Single handler for errors and signals of all instructions
+        while True:
+            try:
+                while pc < lenght:
+                    pc = ops[pc]()
+                    count += 1
+                # If the program ended normally, return 0
+                return 0
+            except BreakProgram:
+                self._pc = pc
+                self._instruction_count = count + fused_count[0]
+                self._print_state()
+                pc = self._following[pc]
+                count += 1
+            except ExitProgram as signal:
+                self._pc = pc
+                self._instruction_count = count + fused_count[0]
+                return signal.code
+            except CustomException as error:
+                self._pc = pc
+                self._instruction_count = count + fused_count[0]
+                return error.code
+
+    # Main loop of interpret with profiler
+    # Count and time of every executed closure are added on its program counter
+    def _run_profiled(self):
+        ops = self._ops
+        counts = self.profiler.counts
+        times = self.profiler.times
+        clock = time.perf_counter
+        lenght = len(ops)
+        pc = 0
+        count = 0
+        while True:
+            try:
+                while pc < lenght:
+                    start = clock()
+                    try:
+                        next_pc = ops[pc]()
+                    finally:
+                        times[pc] += clock() - start
+                        counts[pc] += 1
+                    pc = next_pc
+                    count += 1
+                return 0
+            except BreakProgram:
+                self._pc = pc
+                self._instruction_count = count
+                self._print_state()
+                pc = self._following[pc]
+                count += 1
+            except ExitProgram as signal:
+                self._pc = pc
+                self._instruction_count = count
+                return signal.code
+            except CustomException as error:
+                self._pc = pc
+                self._instruction_count = count
+                return error.code
@@ -0,0 +1,239 @@
+import bisect
+
+# Basic block of code
+# Block contains instructions from index start to index end (end is not included)
+# successors and predecessors are indexes of blocks
+class BasicBlock:
+
+    __slots__ = ("index", "start", "end", "successors", "predecessors")
+
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.successors = []
+        self.predecessors = []
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"BasicBlock({self.index}, {self.start}, {self.end})"
+
+
+# Natural loop of control flow graph
+# header is index of block that dominates all blocks of loop, blocks is set of indexes of blocks of loop
+# (header included) and latches are indexes of blocks with back edge to header
+class Loop:
+
+    __slots__ = ("header", "blocks", "latches")
+
+    def __init__(self, header, blocks, latches):
+        self.header = header
+        self.blocks = blocks
+        self.latches = latches
+
+    def __repr__(self):
+        return f"Loop({self.header}, {sorted(self.blocks)})"
+
+
+# Class that splits code into basic blocks and builds control flow graph
+# Code is list of instructions from XmlParser or Decoder and labels are from SemanticAnalyzer
+# Jump to label continues on instruction after LABEL, so block starts there
+# LABEL itself is the last instruction of previous block (it is reached only by falling through)
+# CALL has edge to called label, RETURN has edges to all instructions after CALL
+# Graph can be queried for successors and predecessors (attributes of blocks), jump targets, dominators
+# and natural loops, dominators and loops are computed on the first query
+class ControlFlowGraph:
+
+    __slots__ = ("code", "labels", "blocks", "targets", "_block_at", "_starts", "_dominators")
+
+    # Instructions that have label in first argument
+    JUMPS = ("JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS", "CALL")
+    # Jumps that continue on the next instruction if they do not jump
+    CONDITIONAL_JUMPS = ("JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS")
+    # Instructions that end basic block
+    TERMINATORS = ("JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS", "CALL", "RETURN", "EXIT")
+
+    def __init__(self, code: list, labels: dict):
+        self.code = code
+        self.labels = labels
+        self.blocks = []
+        # Index of instruction where program continues after jump (or call) on every index, None for others
+        self.targets = [None if target is None else target + 1
+                        for target in ControlFlowGraph.jump_targets(code, labels)]
+        # Dictionary that maps first instruction of block to block
+        self._block_at = {}
+        # First instructions of blocks in order of blocks
+        self._starts = []
+        # Immediate dominators of blocks, computed by the first query
+        self._dominators = None
+        self._split()
+        self._connect()
+
+    # Method that returns index of LABEL instruction of jump on every index of code (None if it is not jump)
+    # Engines continue on instruction after the returned index, so label names are resolved only once
+    # Jump to undefined label has None too, engine reports it when the jump is executed
+    @staticmethod
+    def jump_targets(code, labels):
+        return [labels.get(instruction[1]) if instruction[0] in ControlFlowGraph.JUMPS and len(instruction) > 1
+                else None for instruction in code]
+
+    # Method that returns index of instruction executed after every instruction that does not jump
+    # LABEL is no-op, so it is skipped (chains of LABEL too), jump to label can continue after LABEL by it too
+    # If keep_labels is True (program with BREAK, which prints number of executed instructions)
+    # LABEL is not skipped and every index is followed by the next one
+    @staticmethod
+    def following(code, keep_labels=False):
+        length = len(code)
+        following = list(range(1, length + 1))
+        if keep_labels:
+            return following
+        for pc in range(length - 2, -1, -1):
+            if code[pc + 1][0] == "LABEL":
+                following[pc] = following[pc + 1]
+        return following
+
+    # Method that returns index of instruction where program continues after jump to label
+    def target(self, label):
+        return self.labels[label] + 1
+
+    # Method that returns block that starts at given program counter
+    # Returns None if there is no block starting there
+    def block_at(self, pc):
+        return self._block_at.get(pc)
+
+    # Method that returns block that contains instruction on given program counter
+    def block_of(self, pc):
+        return self.blocks[bisect.bisect_right(self._starts, pc) - 1]
+
+    # Method that returns indexes of blocks reachable from the first block in reverse postorder
+    def reverse_postorder(self):
+        if not self.blocks:
+            return []
+        order = []
+        visited = {0}
+        # Stack of blocks and indexes of their next successors (graph can be too deep for recursion)
+        stack = [(0, 0)]
+        while stack:
+            index, position = stack.pop()
+            successors = self.blocks[index].successors
+            if position < len(successors):
+                stack.append((index, position + 1))
+                successor = successors[position]
+                if successor not in visited:
+                    visited.add(successor)
+                    stack.append((successor, 0))
+            else:
+                order.append(index)
+        order.reverse()
+        return order
+
+    # Method that returns immediate dominator of every block (index of block)
+    # The first block is its own immediate dominator, unreachable block has None
+    # Algorithm of Cooper, Harvey and Kennedy (iteration in reverse postorder until nothing changes)
+    def immediate_dominators(self):
+        if self._dominators is not None:
+            return self._dominators
+        order = self.reverse_postorder()
+        position = {index: number for number, index in enumerate(order)}
+        dominators = [None] * len(self.blocks)
+        if order:
+            dominators[0] = 0
+        changed = True
+        while changed:
+            changed = False
+            for index in order[1:]:
+                new = None
+                for predecessor in self.blocks[index].predecessors:
+                    if dominators[predecessor] is None:
+                        continue
+                    if new is None:
+                        new = predecessor
+                        continue
+                    # Intersection of dominators of both blocks
+                    first, second = predecessor, new
+                    while first != second:
+                        while position[first] > position[second]:
+                            first = dominators[first]
+                        while position[second] > position[first]:
+                            second = dominators[second]
+                    new = first
+                if dominators[index] != new:
+                    dominators[index] = new
+                    changed = True
+        self._dominators = dominators
+        return dominators
+
+    # Method that returns True if block dominates other block (every path from start to it goes through block)
+    # Every block dominates itself, unreachable block is dominated by nothing
+    def dominates(self, block, other):
+        dominators = self.immediate_dominators()
+        if dominators[other] is None:
+            return False
+        while other != block:
+            if other == 0:
+                return False
+            other = dominators[other]
+        return True
+
+    # Method that returns natural loops, one for every header (loops with the same header are merged)
+    # Back edge is edge to block that dominates its source, loop is header and blocks that reach
+    # the source of back edge without going through header
+    def loops(self):
+        loops = {}
+        for block in self.blocks:
+            for successor in block.successors:
+                if not self.dominates(successor, block.index):
+                    continue
+                loop = loops.setdefault(successor, Loop(successor, {successor}, []))
+                loop.latches.append(block.index)
+                work = [block.index]
+                while work:
+                    index = work.pop()
+                    if index not in loop.blocks:
+                        loop.blocks.add(index)
+                        work.extend(self.blocks[index].predecessors)
+        return [loops[header] for header in sorted(loops)]
+
+    # Method that returns set of program counters where basic blocks start
+    def _leaders(self):
+        leaders = {0}
+        for label_pc in self.labels.values():
+            leaders.add(label_pc + 1)
+        for pc, instruction in enumerate(self.code):
+            if instruction[0] in self.TERMINATORS:
+                leaders.add(pc + 1)
+        return sorted(leader for leader in leaders if leader < len(self.code))
+
+    def _split(self):
+        leaders = self._leaders()
+        for index, start in enumerate(leaders):
+            end = leaders[index + 1] if index + 1 < len(leaders) else len(self.code)
+            block = BasicBlock(index, start, end)
+            self.blocks.append(block)
+            self._block_at[start] = block
+            self._starts.append(start)
+
+    # Method that creates edges between blocks
+    # Edge to the end of the code is not created
+    def _connect(self):
+        return_sites = [pc + 1 for pc, instruction in enumerate(self.code)
+                        if instruction[0] == "CALL"]
+        for block in self.blocks:
+            last = self.code[block.end - 1]
+            targets = []
+            if last[0] in self.JUMPS:
+                targets.append(self.targets[block.end - 1])
+            if last[0] in self.CONDITIONAL_JUMPS:
+                targets.append(block.end)
+            elif last[0] == "RETURN":
+                targets.extend(return_sites)
+            elif last[0] not in self.TERMINATORS:
+                targets.append(block.end)
+
+            for target in targets:
+                successor = self._block_at.get(target)
+                if successor is not None and successor.index not in block.successors:
+                    block.successors.append(successor.index)
+                    successor.predecessors.append(block.index)
@@ -0,0 +1,138 @@
+from . import Nil
+from . import ErrorHandler as e
+from .TacInterpret import InstructionUtils
+
+# Operand that references variable in frame
+# It is decoded from "frame@name" format only once when program is loaded
+class Variable:
+
+    __slots__ = ("frame", "name", "raw", "slot")
+
+    def __init__(self, frame, name, raw, slot=None):
+        # Name of frame (GF, LF or TF)
+        self.frame = frame
+        # Name of variable in frame
+        self.name = name
+        # Original "frame@name" string used in messages
+        self.raw = raw
+        # Index of variable in frame, it is assigned by Decoder.decode
+        self.slot = slot
+
+    # Representation is same as original string so BREAK prints code same as before
+    def __repr__(self):
+        return repr(self.raw)
+
+
+# Operand that holds constant already converted to python value
+# frame is always None so interpret can check if operand is constant by frame
+class Constant:
+
+    __slots__ = ("frame", "type", "value", "raw")
+
+    def __init__(self, type_, value, raw):
+        self.frame = None
+        # IPPcode23 type of constant (int, bool, string, nil)
+        self.type = type_
+        # Converted python value of constant
+        self.value = value
+        # Original "type@value" string used in messages
+        self.raw = raw
+
+    def __repr__(self):
+        return repr(self.raw)
+
+
+# Class that decodes code from XmlParser into instructions with pre-parsed operands
+# Instruction stays in format [instruction, arg1, arg2, arg3]
+# Variables are decoded to Variable, constants to Constant
+# Labels and types (second argument of READ) stays as strings
+# Every variable gets slot (index into frame), so frames are lists and variables are accessed by index
+# Global variables have their own slots, LF and TF share slots because TF becomes LF by PUSHFRAME
+class Decoder(e.ErrorHandable):
+
+    __slots__ = ("code", "global_slots", "local_slots", "error_message", "force_exit")
+
+    # Frames of variables
+    FRAMES = ("GF", "LF", "TF")
+    # Conversion methods of constants
+    TYPES = {"int": InstructionUtils._str_to_int, "string": str,
+             "bool": InstructionUtils._to_bool, "nil": Nil.nil}
+    # Arguments (indexed from 1) that are not symbols for given instruction
+    NOT_SYMBOLS = {"LABEL": (1,), "JUMP": (1,), "CALL": (1,),
+                   "JUMPIFEQ": (1,), "JUMPIFNEQ": (1,), "JUMPIFEQS": (1,), "JUMPIFNEQS": (1,), "READ": (2,)}
+
+    def __init__(self, force_exit=False):
+        self.code = []
+        # Dictionaries name of variable -> slot
+        self.global_slots = {}
+        self.local_slots = {}
+        super().__init__(force_exit)
+
+    def _reset(self, force_exit=False):
+        self.code = []
+        self.global_slots = {}
+        self.local_slots = {}
+        super().__init__(force_exit)
+
+    # Method that assigns slot to decoded variable
+    # Variables with the same name in the same frame kind share slot
+    def _assign_slot(self, variable):
+        slots = self.global_slots if variable.frame == "GF" else self.local_slots
+        slot = slots.get(variable.name)
+        if slot is None:
+            slot = slots[variable.name] = len(slots)
+        variable.slot = slot
+
+    # Method that decodes one argument in "type/frame@value/name" format
+    # Returns Variable, Constant or original string if it is not in this format
+    # Raises ValueError if constant cannot be converted to its type
+    @staticmethod
+    def decode_operand(argument):
+        if not isinstance(argument, str):
+            # Already decoded
+            return argument
+        prefix, separator, value = argument.partition("@")
+        if not separator:
+            return argument
+        if prefix in Decoder.FRAMES:
+            return Variable(prefix, value, argument)
+        if prefix in Decoder.TYPES:
+            return Constant(prefix, Decoder.TYPES[prefix](value), argument)
+        return argument
+
+    # Method that decodes one instruction
+    # Raises ValueError if constant cannot be converted to its type
+    @staticmethod
+    def decode_instruction(instruction):
+        not_symbols = Decoder.NOT_SYMBOLS.get(instruction[0], ())
+        decoded = [instruction[0]]
+        for index in range(1, len(instruction)):
+            if index in not_symbols:
+                decoded.append(instruction[index])
+            else:
+                decoded.append(Decoder.decode_operand(instruction[index]))
+        return decoded
+
+    # Method that decodes code from XmlParser and store it in self.code
+    # Return error code 32 if constant has invalid value for its type
+    # Errors are handled by decorator
+    @e.ErrorHandable.handle_error
+    def decode(self, code, force_exit=False):
+        self._reset(force_exit)
+        # Defined variables get slots first in order of DEFVAR (frames are printed in this order by BREAK)
+        for instruction in code:
+            if instruction[0] == "DEFVAR" and len(instruction) > 1:
+                operand = Decoder.decode_operand(instruction[1])
+                if isinstance(operand, Variable):
+                    self._assign_slot(operand)
+        for pc, instruction in enumerate(code):
+            try:
+                decoded = Decoder.decode_instruction(instruction)
+            except ValueError:
+                self.error_message = f"Invalid constant in instruction {instruction[0]} on index {pc}. Indexed from 0\nXML file have wrong structure"
+                return 32
+            for operand in decoded:
+                if isinstance(operand, Variable):
+                    self._assign_slot(operand)
+            self.code.append(decoded)
+        return 0
@@ -0,0 +1,215 @@
+import os
+import sys
+import mmap
+import stat
+from . import Nil
+
+# Readers of input of program (instruction READ)
+# Every reader returns one value converted to type by read_value()
+# If there is no line or line cannot be converted, value is nil (same as readline() on text file)
+# Line ends with \n, \r\n or \r like in text file opened with universal newlines
+
+# Base class of readers that split input into lines of bytes
+# Lines are indexed by blocks, subclasses implement _next_block() that returns
+# next part of input that ends with \n (or rest of input) or None at the end of input
+class InputReader:
+
+    __slots__ = ("encoding", "_lines", "_index")
+
+    # Size of block of input that is split into lines at once
+    BLOCK_SIZE = 1 << 20
+
+    def __init__(self, encoding=None):
+        # Same encoding as text file opened by open()
+        self.encoding = InputReader.default_encoding() if encoding is None else encoding
+        self._lines = []
+        self._index = 0
+
+    # Method that returns encoding of text file opened by open() (locale.getpreferredencoding(False))
+    # Module locale imports re, so the encoding is read from _locale if it is possible
+    @staticmethod
+    def default_encoding():
+        if sys.flags.utf8_mode:
+            return "utf-8"
+        try:
+            import _locale
+            return _locale.getencoding()
+        except (ImportError, AttributeError):
+            import locale
+            return locale.getpreferredencoding(False)
+
+    # Method that returns reader for given stream
+    # Reader is returned as it is, stdin is read in chunks, other streams by lines
+    @staticmethod
+    def wrap(stream):
+        if isinstance(stream, InputReader):
+            return stream
+        if stream is sys.stdin and hasattr(stream, "buffer"):
+            return ChunkedInput(stream.buffer, stream.encoding)
+        return TextInput(stream)
+
+    # Method that converts int in bytes with prefix 0x or 0o like InstructionUtils._str_to_int
+    @staticmethod
+    def _bytes_to_int(line):
+        base = 10
+        prefix = line[:3].lower()
+        if prefix.startswith(b"0x") or prefix.startswith(b"+0x") or prefix.startswith(b"-0x"):
+            base = 16
+        elif prefix.startswith(b"0o") or prefix.startswith(b"+0o") or prefix.startswith(b"-0o"):
+            base = 8
+        return int(line, base)
+
+    def _next_block(self):
+        raise NotImplementedError
+
+    # Method that returns next line without line ending or None at the end of input
+    def read_line(self):
+        index = self._index
+        if index >= len(self._lines):
+            block = self._next_block()
+            if block is None:
+                return None
+            # \r\n is never split between blocks because block ends with \n
+            self._lines = block.splitlines()
+            index = 0
+        self._index = index + 1
+        return self._lines[index]
+
+    # Method that reads one line and converts it by conversion method of type in types
+    # int is converted directly from bytes, other types from decoded string
+    def read_value(self, type_, types):
+        line = self.read_line()
+        if line is None:
+            return Nil.nil(None)
+        if type_ == "int":
+            # Decimal int cannot have prefix so it is same as in InstructionUtils._str_to_int
+            try:
+                return int(line)
+            except ValueError:
+                pass
+            try:
+                return InputReader._bytes_to_int(line)
+            except ValueError:
+                # Line can still be valid int with unicode digits or whitespace
+                pass
+        try:
+            return types[type_](line.decode(self.encoding))
+        except ValueError:
+            return Nil.nil(None)
+
+    def isatty(self):
+        return False
+
+    def close(self):
+        pass
+
+
+# Reader of input file that is mapped to memory
+# Lines are split only when they are needed
+# File that is not regular (pipe, /dev/null, /dev/stdin) cannot be mapped, it is read in chunks like stdin
+class MappedInput(InputReader):
+
+    __slots__ = ("_file", "_data", "_position", "_chunks")
+
+    def __init__(self, path, encoding=None):
+        super().__init__(encoding)
+        self._file = open(path, "rb")
+        self._data = b""
+        self._position = 0
+        self._chunks = None
+        if not stat.S_ISREG(os.fstat(self._file.fileno()).st_mode):
+            self._chunks = ChunkedInput(self._file, self.encoding)
+            return
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file cannot be mapped
+            pass
+        except OSError:
+            self._chunks = ChunkedInput(self._file, self.encoding)
+
+    def _next_block(self):
+        if self._chunks is not None:
+            return self._chunks._next_block()
+        data = self._data
+        start = self._position
+        if start >= len(data):
+            return None
+        end = start + InputReader.BLOCK_SIZE
+        while end < len(data):
+            newline = data.rfind(b"\n", start, end)
+            if newline != -1:
+                end = newline + 1
+                break
+            # Line is longer than block
+            end += InputReader.BLOCK_SIZE
+        self._position = min(end, len(data))
+        return data[start:self._position]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+# Reader of binary stream (stdin) that reads it in big chunks
+# read1() returns data that are available, so interactive input does not wait for the whole chunk
+class ChunkedInput(InputReader):
+
+    __slots__ = ("_stream", "_rest", "_eof")
+
+    def __init__(self, stream, encoding=None):
+        super().__init__(encoding)
+        self._stream = stream
+        # Part of input after last \n that was read
+        self._rest = b""
+        self._eof = False
+
+    def _next_block(self):
+        read = getattr(self._stream, "read1", self._stream.read)
+        while not self._eof:
+            chunk = read(InputReader.BLOCK_SIZE)
+            if not chunk:
+                self._eof = True
+                break
+            newline = chunk.rfind(b"\n")
+            if newline == -1:
+                self._rest += chunk
+                continue
+            block = self._rest + chunk[:newline + 1]
+            self._rest = chunk[newline + 1:]
+            return block
+        block = self._rest
+        self._rest = b""
+        return block if block else None
+
+    def isatty(self):
+        try:
+            return self._stream.isatty()
+        except (AttributeError, ValueError):
+            return False
+
+
+# Reader of any text stream that has readline() (for example io.StringIO)
+class TextInput(InputReader):
+
+    __slots__ = ("_stream",)
+
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+
+    def read_value(self, type_, types):
+        try:
+            input_ = self._stream.readline()
+            if input_ == "":
+                return Nil.nil(None)
+            return types[type_](input_.rstrip("\n").rstrip("\r"))
+        except ValueError:
+            return Nil.nil(None)
+
+    def isatty(self):
+        try:
+            return self._stream.isatty()
+        except (AttributeError, ValueError):
+            return False
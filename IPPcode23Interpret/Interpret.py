@@ -1,22 +1,186 @@
+import io
+import sys
+import importlib
 from . import ArgumentParser
 from . import XmlParser
 from . import SemanticAnalyzer
+from . import Decoder
 from . import TacInterpret
+from . import ProgramCache
+from . import Output
+from . import Input
 
+# Modules that are not needed by every run (other engines, optimizer, profiler, server and batch)
+# are imported when they are used, so startup of small programs does not pay for them
 class Interpret():
 
+    # Execution engines that can be selected by argument --engine (module and class of engine)
+    ENGINES = {"tac": ("TacInterpret", "TACInterpret"),
+               "closure": ("ClosureInterpret", "ClosureInterpret"),
+               "aot": ("AotInterpret", "AotInterpret"),
+               "jit": ("TracingInterpret", "TracingInterpret")}
+
     def __init__(self):
         self.argument_parser = ArgumentParser.ArgumentParser()
         self.xml_parser = XmlParser.XmlParser()
         self.semantic_analysis = SemanticAnalyzer.SemanticAnalyzer()
+        self.decoder = Decoder.Decoder()
         self.ippcode_interpret = TacInterpret.TACInterpret()
+        # Instances of engines, they are reset before every program so they are created only once
+        self._engines = {"tac": self.ippcode_interpret}
+        self.program_cache = ProgramCache.ProgramCache()
+        # Optimizer of the last program (only with argument -O), it has number of removed instructions
+        self.dataflow_optimizer = None
+        # Type inference of the last program (only with argument -O), it has number of proven checks
+        self.type_inference = None
+
+    # Method that returns class of engine by its name, module of engine is imported if it is not yet
+    @staticmethod
+    def engine_class(name):
+        module_name, class_name = Interpret.ENGINES[name]
+        return getattr(importlib.import_module(f".{module_name}", __package__), class_name)
+
+    # Method that selects instance of engine by its name
+    def _select_engine(self, name):
+        engine = self._engines.get(name)
+        if engine is None:
+            engine = self._engines[name] = Interpret.engine_class(name)()
+        self.ippcode_interpret = engine
+        return engine
+
+    # Method that loads code and labels of program from source file (or stdin)
+    # Source can also be XML as bytes (used by server)
+    # Program from source file is looked up in cache first by hash of file,
+    # if it is not cached it is parsed, checked and stored to cache
+    # Returns code in format of XmlParser, labels and hash of source file (None if not cached)
+    def _load_program(self, source_file, use_cache):
+        source_digest = None
+        if use_cache and source_file is not None:
+            if isinstance(source_file, bytes):
+                source_digest = ProgramCache.ProgramCache.digest_bytes(source_file)
+            else:
+                source_digest = ProgramCache.ProgramCache.digest_file(source_file)
+            cached = self.program_cache.load(source_digest)
+            if cached is not None:
+                return cached[0], cached[1], source_digest
+        self.xml_parser.parse_to_interpret(io.BytesIO(source_file) if isinstance(source_file, bytes) else source_file)
+        self.semantic_analysis.check_semantic(self.xml_parser.code)
+        return self.xml_parser.code, self.semantic_analysis.labels, source_digest
 
     def run_interpret(self, force_exit_after_interpret=True):
         self.argument_parser.parse_args()
-        self.xml_parser.parse_to_interpret(self.argument_parser.args.source_file)
-        self.semantic_analysis.check_semantic(self.xml_parser.code)
-        if self.argument_parser.args.input_file is None:
-            return self.ippcode_interpret.interpret(force_exit_after_interpret, self.xml_parser.code, self.semantic_analysis.labels)
+        args = self.argument_parser.args
+        if args.server:
+            from . import Server
+            # Server runs jobs until end of input (or forever on socket)
+            return Server.InterpretServer(self, args.timeout).serve(args.socket)
+        if args.batch is not None:
+            from . import Batch
+            runner = Batch.BatchRunner(args.engine, args.optimize, not args.no_cache, args.timeout)
+            return runner.run(args.batch, args.jobs, args.report_file, force_exit_after_interpret)
+        if args.multiple_inputs:
+            from . import Batch
+            # Program is parsed and checked once and runs for every input
+            runner = Batch.InputRunner(self)
+            return runner.run(args, force_exit_after_interpret)
+        output_stream = None if args.output_file is None else open(args.output_file, "w")
+        output = Output.OutputBuffer(output_stream, args.output_buffer, args.output_thread)
+        return self.run_program(args, force_exit_after_interpret, args.source_file, output)
+
+    # Method that loads, checks and interprets one program
+    # args are parsed arguments (or namespace with the same attributes), source is file, None (stdin) or bytes
+    # Input of program is input_stream if it is given, otherwise file args.input_file or stdin
+    # Errors and exit codes are handled same as in all classes (by exit())
+    def run_program(self, args, force_exit_after_interpret, source, output, input_stream=None):
+        code, labels = self.prepare_program(args, source)
+        self.ippcode_interpret.output = output
+        return self.execute_program(args, force_exit_after_interpret, code, labels, input_stream)
+
+    # Method that selects engine and loads, checks, decodes and optimizes program
+    # Returns code and labels that can be executed by execute_program (also repeatedly)
+    def prepare_program(self, args, source):
+        self._select_engine(args.engine)
+        self.dataflow_optimizer = None
+        self.type_inference = None
+        code, labels, source_digest = self._load_program(source, not args.no_cache)
+        # Decode operands only once before interpreting
+        self.decoder.decode(code)
+        # Only program that passed all checks is stored to cache
+        if source_digest is not None and code is self.xml_parser.code:
+            self.program_cache.store(source_digest, code, labels)
+        code = self.decoder.code
+        # Optional optimization of decoded code
+        # Dataflow optimizer removes instructions so it returns new labels, peephole optimizer keeps indexes of labels
+        # Type inference annotates operands of optimized code, so engines can skip checks that cannot fail
+        if args.optimize:
+            from . import Optimizer
+            from . import TypeInference
+            self.dataflow_optimizer = Optimizer.DataflowOptimizer(code, labels)
+            code, labels = self.dataflow_optimizer.optimize()
+            self.type_inference = TypeInference.TypeInference(code, labels)
+            code = self.type_inference.infer()
+            code = Optimizer.PeepholeOptimizer(code, labels).optimize()
+        # Error messages report program counters of source code
+        self.ippcode_interpret.source_pcs = None if self.dataflow_optimizer is None else self.dataflow_optimizer.sources
+        # Translated program is cached on disk by hash of source XML
+        # Optimized code is different program, so it has its own key
+        if args.engine == "aot":
+            if source_digest is not None and args.optimize:
+                source_digest = f"{source_digest}-O"
+            self.ippcode_interpret.source_digest = source_digest
+        return code, labels
+
+    # Method that executes prepared program by selected engine with its output
+    # Engine is reset by every execution, so the same code can be executed for more inputs
+    def execute_program(self, args, force_exit_after_interpret, code, labels, input_stream=None):
+        self.ippcode_interpret.call_cache = None
+        if args.memoize is not None:
+            return self._execute_memoized(args, force_exit_after_interpret, code, labels, input_stream)
+        if args.profile_file is None:
+            self.ippcode_interpret.profiler = None
+            return self._interpret(force_exit_after_interpret, code, labels, args.input_file, input_stream)
+        from . import Profiler
+        # Profile is written when program ends, also by EXIT or error (interpret exits by SystemExit)
+        self.ippcode_interpret.profiler = Profiler.Profiler(args.engine)
+        exit_code = None
+        try:
+            exit_code = self._interpret(force_exit_after_interpret, code, labels, args.input_file, input_stream)
+            return exit_code
+        except SystemExit as exit_:
+            exit_code = exit_.code
+            raise
+        finally:
+            report = self.ippcode_interpret.profiler.report(code, exit_code)
+            report["frames_allocated"] = self.ippcode_interpret.frames_allocated
+            if self.dataflow_optimizer is not None:
+                report["dataflow"] = self.dataflow_optimizer.report()
+            if self.type_inference is not None:
+                report["type_inference"] = self.type_inference.report()
+            Profiler.Profiler.write(report, args.profile_file)
+            Profiler.Profiler.summary(report)
+
+    # Method that executes program with cache of results of pure functions (engines tac and jit)
+    # Hit rates are printed when program ends, also by EXIT or error
+    def _execute_memoized(self, args, force_exit_after_interpret, code, labels, input_stream=None):
+        from . import Memoization
+        summaries = Memoization.PurityAnalyzer(code, labels).analyze()
+        self.ippcode_interpret.profiler = None
+        self.ippcode_interpret.call_cache = Memoization.CallCache(summaries, code, args.memoize)
+        try:
+            return self._interpret(force_exit_after_interpret, code, labels, args.input_file, input_stream)
+        finally:
+            Memoization.CallCache.summary(self.ippcode_interpret.call_cache.report())
+
+    # Method that interprets decoded program with input from stream, file or stdin (if both are None)
+    def _interpret(self, force_exit_after_interpret, code, labels, input_file, input_stream=None):
+        if input_stream is not None:
+            return self.ippcode_interpret.interpret(force_exit_after_interpret, code, labels, input_stream)
+        if input_file is None:
+            return self.ippcode_interpret.interpret(force_exit_after_interpret, code, labels, sys.stdin)
         else:
-            with open(self.argument_parser.args.input_file, "r") as f:
-                return self.ippcode_interpret.interpret(force_exit_after_interpret, self.xml_parser.code, self.semantic_analysis.labels, f)
\ No newline at end of file
+            # Input file is mapped to memory and read by lines when READ needs them
+            input_reader = Input.MappedInput(input_file)
+            try:
+                return self.ippcode_interpret.interpret(force_exit_after_interpret, code, labels, input_reader)
+            finally:
+                input_reader.close()
\ No newline at end of file
@@ -0,0 +1,313 @@
+import sys
+from collections import OrderedDict
+from . import Nil
+from . import StringBuffer as sb
+from .Decoder import Variable
+from .ControlFlow import ControlFlowGraph
+
+# Memoization of calls of pure functions
+# Function is code from label that is target of CALL to RETURN. It is pure if its result depends only on
+# values it pops from data stack of caller (and on temporary frame of caller if it uses it), so the same
+# call can be replaced by its result:
+#   it does not access GF or local frame of caller and does not pop it (POPFRAME)
+#   it does not execute READ, WRITE, DPRINT, BREAK or CLEARS and calls only pure functions
+#   height of data stack and pushed local frames are the same on every path to every instruction,
+#   so it pops the same number of values of caller and pushes the same number of results on every RETURN
+# Control flow of pure function depends only on its inputs, so it is deterministic
+
+# Exception of analysis of function that is not pure, message is reason
+class ImpureFunction(Exception):
+    pass
+
+
+# Summary of function found by PurityAnalyzer
+#   consumed    number of values of data stack of caller popped by function
+#   net         change of height of data stack after RETURN (None if function never returns)
+#   uses_frame  function reads or changes temporary frame of caller (it is input and output of function)
+#   replaces_frame  temporary frame after RETURN is frame created by function, not frame of caller
+#               (None if function never returns)
+# Replacement of frame is known only from analysis, frame created by CREATEFRAME can be the same list
+# as the dropped frame of caller (it is reused from pool of frames)
+class FunctionSummary:
+
+    __slots__ = ("label", "pure", "reason", "consumed", "net", "uses_frame", "replaces_frame")
+
+    def __init__(self, label):
+        self.label = label
+        self.pure = True
+        # Reason why function is not pure (message of ImpureFunction)
+        self.reason = None
+        self.consumed = 0
+        self.net = None
+        self.uses_frame = False
+        self.replaces_frame = None
+
+    # Number of values on data stack that replace consumed values after RETURN
+    @property
+    def produced(self):
+        return self.consumed + self.net
+
+    # Summary can be memoized if it is pure and it returns
+    @property
+    def memoizable(self):
+        return self.pure and self.net is not None
+
+    # Tuple that is compared between iterations of analysis
+    def signature(self):
+        return self.pure, self.consumed, self.net, self.uses_frame, self.replaces_frame
+
+
+# Class that classifies targets of CALL as pure or impure by abstract interpretation of their code
+# State on instruction is (height of data stack, temporary frame, pushed local frames) relative to CALL:
+# frame is "entry" (temporary frame of caller), "new" (created by function) or "none",
+# pushed local frames are tuple of such frames (LF of caller is not in it)
+# CALL of function uses its summary, functions call each other (also recursively), so summaries are computed
+# repeatedly until they do not change (CALL of function without summary yet does not continue)
+class PurityAnalyzer:
+
+    __slots__ = ("code", "labels", "summaries", "_targets")
+
+    # Numbers of values popped and pushed by instructions that use data stack
+    STACK_EFFECTS = {"PUSHS": (0, 1), "POPS": (1, 0), "ADDS": (2, 1), "SUBS": (2, 1), "MULS": (2, 1),
+                     "IDIVS": (2, 1), "LTS": (2, 1), "GTS": (2, 1), "EQS": (2, 1), "ANDS": (2, 1), "ORS": (2, 1),
+                     "NOTS": (1, 1), "INT2CHARS": (1, 1), "STRI2INTS": (2, 1), "JUMPIFEQS": (2, 0),
+                     "JUMPIFNEQS": (2, 0)}
+    # Instructions without effects outside of function (any other instruction makes function impure)
+    KNOWN = frozenset(("MOVE", "CREATEFRAME", "PUSHFRAME", "POPFRAME", "DEFVAR", "CALL", "RETURN", "ADD", "SUB",
+                       "MUL", "IDIV", "LT", "GT", "EQ", "AND", "OR", "NOT", "INT2CHAR", "STRI2INT", "CONCAT",
+                       "STRLEN", "GETCHAR", "SETCHAR", "TYPE", "LABEL", "JUMP", "JUMPIFEQ", "JUMPIFNEQ",
+                       "EXIT")) | frozenset(STACK_EFFECTS)
+    # Function that pops more values of caller is not memoized (key would be too long)
+    MAX_CONSUMED = 64
+
+    def __init__(self, code: list, labels: dict):
+        self.code = code
+        self.labels = labels
+        # Summaries of called labels, None for label without summary yet
+        self.summaries = {}
+        self._targets = []
+
+    # Method that returns summaries of all called labels
+    def analyze(self):
+        self._targets = ControlFlowGraph.jump_targets(self.code, self.labels)
+        called = []
+        for instruction in self.code:
+            if instruction[0] == "CALL" and instruction[1] in self.labels and instruction[1] not in called:
+                called.append(instruction[1])
+        self.summaries = {label: None for label in called}
+        changed = True
+        while changed:
+            changed = False
+            for label in called:
+                summary = self._analyze_function(label)
+                old = self.summaries[label]
+                if old is None or old.signature() != summary.signature():
+                    self.summaries[label] = summary
+                    changed = True
+        return self.summaries
+
+    # Method that returns frame that is accessed by variable operand
+    @staticmethod
+    def _accessed_frame(variable, frame, local_frames, pc):
+        if variable.frame == "GF":
+            raise ImpureFunction(f"it accesses global frame (GF@{variable.name} on {pc})")
+        if variable.frame == "TF":
+            return frame
+        if not local_frames:
+            raise ImpureFunction(f"it accesses local frame of caller (LF@{variable.name} on {pc})")
+        return local_frames[-1]
+
+    # Method that returns summary of function on label
+    def _analyze_function(self, label):
+        summary = FunctionSummary(label)
+        start = self.labels[label]
+        states = {start: (0, "entry", ())}
+        work = [start]
+        minimum = 0
+        try:
+            while work:
+                pc = work.pop()
+                height, frame, local_frames = states[pc]
+                instruction = self.code[pc]
+                opcode = instruction[0]
+                if opcode not in PurityAnalyzer.KNOWN:
+                    raise ImpureFunction(f"it executes {opcode} on {pc}")
+                for operand in instruction[1:]:
+                    if isinstance(operand, Variable):
+                        if PurityAnalyzer._accessed_frame(operand, frame, local_frames, pc) == "entry":
+                            summary.uses_frame = True
+                successors = [pc + 1]
+                popped, pushed = PurityAnalyzer.STACK_EFFECTS.get(opcode, (0, 0))
+
+                if opcode == "CALL":
+                    callee = self.summaries.get(instruction[1])
+                    if callee is not None and not callee.pure:
+                        raise ImpureFunction(f"it calls impure function {callee.label} on {pc}")
+                    if callee is None or callee.net is None:
+                        # Callee does not return (yet), undefined label is error of CALL
+                        successors = []
+                    else:
+                        popped, pushed = callee.consumed, callee.produced
+                        if callee.uses_frame and frame == "entry":
+                            summary.uses_frame = True
+                        if callee.replaces_frame:
+                            frame = "new"
+                elif opcode == "CREATEFRAME":
+                    frame = "new"
+                elif opcode == "PUSHFRAME":
+                    if frame == "none":
+                        # Error 55, program ends
+                        successors = []
+                    elif frame == "entry":
+                        summary.uses_frame = True
+                    local_frames += (frame,)
+                    frame = "none"
+                elif opcode == "POPFRAME":
+                    if not local_frames:
+                        raise ImpureFunction(f"it pops local frame of caller on {pc}")
+                    frame = local_frames[-1]
+                    local_frames = local_frames[:-1]
+                elif opcode == "RETURN":
+                    successors = []
+                    if local_frames or frame == "none":
+                        raise ImpureFunction(f"it returns with different frames than it was called on {pc}")
+                elif opcode == "EXIT":
+                    successors = []
+                elif opcode == "JUMP":
+                    successors = [self._targets[pc]]
+                elif opcode in ControlFlowGraph.CONDITIONAL_JUMPS:
+                    successors = [self._targets[pc], pc + 1]
+
+                height -= popped
+                minimum = min(minimum, height)
+                height += pushed
+                if opcode == "RETURN":
+                    if summary.net is None:
+                        summary.net = height
+                        summary.replaces_frame = frame == "new"
+                    elif summary.net != height:
+                        raise ImpureFunction(f"its RETURN on {pc} changes data stack differently")
+                    elif summary.replaces_frame != (frame == "new"):
+                        raise ImpureFunction(f"its RETURN on {pc} leaves different temporary frame")
+                state = (height, frame, local_frames)
+                for successor in successors:
+                    # Undefined label and end of program end the program
+                    if successor is None or successor >= len(self.code):
+                        continue
+                    old = states.get(successor)
+                    if old is None:
+                        states[successor] = state
+                        work.append(successor)
+                    elif old != state:
+                        raise ImpureFunction(f"data stack or frames differ between paths to {successor}")
+            if -minimum > PurityAnalyzer.MAX_CONSUMED:
+                raise ImpureFunction(f"it pops more than {PurityAnalyzer.MAX_CONSUMED} values of caller")
+        except ImpureFunction as error:
+            summary.pure = False
+            summary.reason = str(error)
+        summary.consumed = -minimum
+        return summary
+
+
+
+# Cache of results of calls of pure functions with bounded size, the least recently used result is evicted
+# Key of call is label, consumed values of data stack and values of temporary frame (if function uses it)
+# Values are compared with their types (True and 1 are different) and string buffer as its text
+# Result of call is (produced values, frame after call, number of executed instructions), engine replaces
+# consumed values by produced values, sets temporary frame and counts instructions same as the call would do
+class CallCache:
+
+    __slots__ = ("summaries", "sites", "size", "evictions", "_results", "_calls", "_hits")
+
+    def __init__(self, summaries: dict, code: list, size: int):
+        self.summaries = summaries
+        # Summary of memoized function on every CALL, None for other instructions and impure functions
+        self.sites = [None] * len(code)
+        for pc, instruction in enumerate(code):
+            if instruction[0] == "CALL":
+                summary = summaries.get(instruction[1])
+                if summary is not None and summary.memoizable:
+                    self.sites[pc] = summary
+        # Maximal number of results in cache
+        self.size = size
+        self.reset()
+
+    # Method that clears results and statistics (cache is not shared between runs of program)
+    def reset(self):
+        self.evictions = 0
+        self._results = OrderedDict()
+        # Numbers of memoized calls and hits of functions by label
+        self._calls = {}
+        self._hits = {}
+
+    @staticmethod
+    def _key_value(value):
+        type_ = type(value)
+        if type_ is sb.StringBuffer:
+            return str, value.text()
+        if type_ is Nil.nil:
+            return Nil.nil, None
+        return type_, value
+
+    # Method that returns key of call or None if call cannot be memoized
+    # (data stack has less values than function pops or it uses temporary frame that does not exist)
+    def key(self, summary, data_stack, frame):
+        base = len(data_stack) - summary.consumed
+        if base < 0:
+            return None
+        values = tuple(CallCache._key_value(value) for value in data_stack[base:])
+        if not summary.uses_frame:
+            return summary.label, values
+        if frame is None:
+            return None
+        return summary.label, values, tuple(CallCache._key_value(value) for value in frame)
+
+    # Method that returns result of call or None, every lookup is memoized call
+    def get(self, summary, key):
+        self._calls[summary.label] = self._calls.get(summary.label, 0) + 1
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            self._hits[summary.label] = self._hits.get(summary.label, 0) + 1
+        return result
+
+    # Method that stores result of call, the least recently used result is evicted if cache is full
+    def put(self, key, result):
+        self._results[key] = result
+        if len(self._results) > self.size:
+            self._results.popitem(last=False)
+            self.evictions += 1
+
+    # Method that returns report of analysis and hit rates of functions
+    def report(self):
+        functions = []
+        for label, summary in self.summaries.items():
+            row = {"label": label, "pure": summary is not None and summary.memoizable}
+            if row["pure"]:
+                calls = self._calls.get(label, 0)
+                hits = self._hits.get(label, 0)
+                row.update(consumed=summary.consumed, produced=summary.produced, uses_frame=summary.uses_frame,
+                           calls=calls, hits=hits, hit_rate=100 * hits / calls if calls else 0.0)
+            else:
+                row["reason"] = "it never returns" if summary is None or summary.pure else summary.reason
+            functions.append(row)
+        calls = sum(self._calls.values())
+        hits = sum(self._hits.values())
+        return {"size": self.size, "results": len(self._results), "evictions": self.evictions,
+                "calls": calls, "hits": hits, "hit_rate": 100 * hits / calls if calls else 0.0,
+                "functions": functions}
+
+    # Method that prints report as text (to stderr by default)
+    @staticmethod
+    def summary(report, stream=None):
+        stream = sys.stderr if stream is None else stream
+        print(f"memoization: {report['hits']} of {report['calls']} calls hit ({report['hit_rate']:.1f} %), "
+              f"{report['results']} results cached (size {report['size']}), {report['evictions']} evicted",
+              file=stream)
+        for row in report["functions"]:
+            if row["pure"]:
+                print(f"  {row['label']}: pure, pops {row['consumed']}, pushes {row['produced']}"
+                      f"{', uses TF' if row['uses_frame'] else ''}, {row['hits']} of {row['calls']} calls hit "
+                      f"({row['hit_rate']:.1f} %)", file=stream)
+            else:
+                print(f"  {row['label']}: not memoized, {row['reason']}", file=stream)
@@ -0,0 +1,434 @@
+from . import Nil
+from .Decoder import Variable, Constant
+from .ControlFlow import ControlFlowGraph
+
+# Instruction that is fused with the next instruction into superinstruction
+# It is equal to the first instruction (same opcode and operands), so error messages, BREAK
+# and everything that does not know superinstructions sees the original instruction
+# fused is name of superinstruction, second is instruction on the next program counter
+class Superinstruction(list):
+
+    __slots__ = ("fused", "second")
+
+    def __init__(self, instruction, fused, second):
+        super().__init__(instruction)
+        self.fused = fused
+        self.second = second
+
+
+# Class that rewrites pairs of decoded instructions into superinstructions
+# Superinstruction is on program counter of the first instruction and executes both of them
+# The second instruction stays in code, so length of code and indexes of labels do not change
+# Pair is fused only if the second instruction is not target of jump or return
+# Superinstructions:
+#   PUSHS_POPS      PUSHS sym; POPS var
+#   COMPARE_JUMP    LT/GT/EQ var sym sym; JUMPIFEQ/JUMPIFNEQ label var bool@value
+#   INCREMENT_JUMP  ADD var var int@value; JUMPIFEQ/JUMPIFNEQ label var sym
+#   MOVE_MOVE       MOVE var1 sym; MOVE var2 var1
+class PeepholeOptimizer:
+
+    __slots__ = ("code", "labels", "fused")
+
+    def __init__(self, code: list, labels: dict):
+        self.code = code
+        self.labels = labels
+        # Number of superinstructions in optimized code
+        self.fused = 0
+
+    @staticmethod
+    def _same_variable(first, second):
+        return (isinstance(first, Variable) and isinstance(second, Variable)
+                and first.frame == second.frame and first.name == second.name)
+
+    @staticmethod
+    def _constant_of_type(operand, type_):
+        return isinstance(operand, Constant) and operand.type == type_
+
+    # Method that returns set of program counters where program can continue by jump or return
+    def _jump_targets(self):
+        targets = {label_pc + 1 for label_pc in self.labels.values()}
+        targets.update(pc + 1 for pc, instruction in enumerate(self.code) if instruction[0] == "CALL")
+        return targets
+
+    # Method that returns name of superinstruction of two instructions or None
+    def _match(self, first, second):
+        if len(first) < 2 or len(second) < 2:
+            return None
+        if first[0] == "PUSHS" and second[0] == "POPS":
+            return "PUSHS_POPS"
+
+        if second[0] in ("JUMPIFEQ", "JUMPIFNEQ") and len(second) == 4 and len(first) == 4:
+            if first[0] in ("LT", "GT", "EQ"):
+                if ((PeepholeOptimizer._same_variable(first[1], second[2]) and PeepholeOptimizer._constant_of_type(second[3], "bool"))
+                        or (PeepholeOptimizer._same_variable(first[1], second[3]) and PeepholeOptimizer._constant_of_type(second[2], "bool"))):
+                    return "COMPARE_JUMP"
+            if first[0] == "ADD":
+                if (PeepholeOptimizer._same_variable(first[1], first[2]) and PeepholeOptimizer._constant_of_type(first[3], "int")
+                        and PeepholeOptimizer._same_variable(first[1], second[2])):
+                    return "INCREMENT_JUMP"
+
+        if first[0] == "MOVE" and second[0] == "MOVE" and len(first) == 3 and len(second) == 3:
+            if PeepholeOptimizer._same_variable(first[1], second[2]):
+                return "MOVE_MOVE"
+        return None
+
+    # Method that returns new code with superinstructions, code given to constructor is not changed
+    def optimize(self):
+        targets = self._jump_targets()
+        code = list(self.code)
+        self.fused = 0
+        pc = 0
+        while pc + 1 < len(code):
+            fused = None if pc + 1 in targets else self._match(code[pc], code[pc + 1])
+            if fused is None:
+                pc += 1
+                continue
+            code[pc] = Superinstruction(code[pc], fused, code[pc + 1])
+            self.fused += 1
+            # Second instruction is not fused again
+            pc += 2
+        return code
+
+
+# Facts about variable that DataflowOptimizer knows on some point of program
+# Variable is defined in its frame (DEFVAR was executed)
+DEFINED = 1
+# Variable is defined and has value
+INITIALIZED = 2
+# Variable can also have fact Constant (its value is known) or Variable (it has value of another variable)
+
+
+# Class that optimizes decoded code by dataflow analysis on control flow graph
+# Passes are repeated until code does not change:
+#   - constant and copy propagation, variables with known value are replaced by constants
+#     and copies (MOVE var1 var2) are replaced by the original variable
+#   - constant folding, instruction with constant operands is replaced by MOVE of its result
+#     and conditional jump with constant operands by JUMP or nothing
+#   - unreachable blocks are removed (LABEL instructions stay, so every label is still defined)
+#   - MOVE into variable that is never read again is removed
+# Operation is folded only if it cannot fail, so every error is still raised by the instruction that raised it
+# (for example IDIV by zero or GETCHAR out of string stays in code) and MOVE is removed only if its
+# variable and frame surely exist. Program counter in source code of every kept instruction is in sources,
+# engines use it in error messages
+# Program with BREAK is not optimized, because BREAK prints frames and number of executed instructions
+class DataflowOptimizer:
+
+    __slots__ = ("code", "labels", "removed", "sources")
+
+    # Instructions that write result to variable in first argument
+    DESTINATIONS = frozenset(("DEFVAR", "MOVE", "POPS", "ADD", "SUB", "MUL", "IDIV", "LT", "GT", "EQ",
+                              "AND", "OR", "NOT", "INT2CHAR", "STRI2INT", "READ", "CONCAT", "STRLEN",
+                              "GETCHAR", "SETCHAR", "TYPE"))
+    # Names of IPPcode23 types of python values
+    TYPE_NAMES = {int: "int", bool: "bool", str: "string", Nil.nil: "nil"}
+
+    def __init__(self, code: list, labels: dict):
+        self.code = code
+        self.labels = labels
+        # Number of instructions removed from code
+        self.removed = 0
+        # Program counters in code given to constructor of instructions of optimized code
+        self.sources = list(range(len(code)))
+
+    # Method that returns key of variable in facts
+    @staticmethod
+    def _key(variable):
+        return variable.frame, variable.name
+
+    # Method that returns key of variable for liveness
+    # LF and TF share key, because temporary frame becomes local frame by PUSHFRAME
+    @staticmethod
+    def _live_key(variable):
+        return ("GF" if variable.frame == "GF" else "LF"), variable.name
+
+    # Method that returns indexes of operands that are read by instruction
+    @staticmethod
+    def _read_indexes(instruction):
+        opcode = instruction[0]
+        if opcode in ("DEFVAR", "READ"):
+            return ()
+        first = 2 if opcode in DataflowOptimizer.DESTINATIONS and opcode != "SETCHAR" else 1
+        return [index for index in range(first, len(instruction)) if isinstance(instruction[index], Variable)]
+
+    # Method that returns constant operand with given python value
+    @staticmethod
+    def _constant(value):
+        type_ = DataflowOptimizer.TYPE_NAMES[type(value)]
+        if type_ == "bool":
+            text = "true" if value else "false"
+        elif type_ == "nil":
+            text = "nil"
+        else:
+            text = str(value)
+        return Constant(type_, value, f"{type_}@{text}")
+
+    # Method that returns rank of fact for meet of facts
+    @staticmethod
+    def _rank(fact):
+        return fact if isinstance(fact, int) else 3
+
+    # Method that returns fact that is true after both of facts
+    @staticmethod
+    def _meet_fact(first, second):
+        if isinstance(first, Constant) and isinstance(second, Constant):
+            if first.type == second.type and first.value == second.value:
+                return first
+        elif isinstance(first, Variable) and isinstance(second, Variable):
+            if DataflowOptimizer._key(first) == DataflowOptimizer._key(second):
+                return first
+        elif first == second:
+            return first
+        return min(DataflowOptimizer._rank(first), DataflowOptimizer._rank(second), INITIALIZED)
+
+    # Method that returns facts that are true after both of states (None is state of unreached block)
+    @staticmethod
+    def _meet(first, second):
+        if first is None:
+            return dict(second)
+        return {key: DataflowOptimizer._meet_fact(fact, second[key])
+                for key, fact in first.items() if key in second}
+
+    # Method that returns result of instruction with constant operands or None if it cannot be folded
+    # Result is tuple with python value, conditions are the same as in TacInterpret
+    @staticmethod
+    def _fold(opcode, values):
+        types = [type(value) for value in values]
+        if opcode in ("ADD", "SUB", "MUL", "IDIV"):
+            if types != [int, int] or (opcode == "IDIV" and values[1] == 0):
+                return None
+            first, second = values
+            return ({"ADD": first + second, "SUB": first - second,
+                     "MUL": first * second}[opcode] if opcode != "IDIV" else first // second,)
+        if opcode in ("LT", "GT"):
+            if types[0] != types[1] or types[0] not in (int, bool, str):
+                return None
+            return ((values[0] < values[1]) if opcode == "LT" else (values[0] > values[1]),)
+        if opcode in ("EQ", "JUMPIFEQ", "JUMPIFNEQ"):
+            if Nil.nil not in types and (types[0] != types[1] or types[0] not in (int, bool, str)):
+                return None
+            return ((values[0] == values[1]) if opcode != "JUMPIFNEQ" else (values[0] != values[1]),)
+        if opcode in ("AND", "OR"):
+            if types != [bool, bool]:
+                return None
+            return ((values[0] and values[1]) if opcode == "AND" else (values[0] or values[1]),)
+        if opcode == "NOT":
+            return (not values[0],) if types == [bool] else None
+        if opcode == "INT2CHAR":
+            return (chr(values[0]),) if types == [int] and 0 <= values[0] <= 0x10FFFF else None
+        if opcode in ("STRI2INT", "GETCHAR"):
+            if types != [str, int] or not 0 <= values[1] < len(values[0]):
+                return None
+            return (ord(values[0][values[1]]),) if opcode == "STRI2INT" else (values[0][values[1]],)
+        if opcode == "CONCAT":
+            return (values[0] + values[1],) if types == [str, str] else None
+        if opcode == "STRLEN":
+            return (len(values[0]),) if types == [str] else None
+        if opcode == "SETCHAR":
+            string, index, char = values
+            if types != [str, int, str] or not 0 <= index < len(string) or char == "":
+                return None
+            return (string[:index] + char[0] + string[index + 1:],)
+        if opcode == "TYPE":
+            return (DataflowOptimizer.TYPE_NAMES[types[0]],)
+        return None
+
+    # Method that replaces operands by known values and folds instruction
+    # Returns new instruction or None if instruction is removed
+    @staticmethod
+    def _rewrite(state, instruction):
+        opcode = instruction[0]
+        rewritten = None
+        for index in DataflowOptimizer._read_indexes(instruction):
+            fact = state.get(DataflowOptimizer._key(instruction[index]))
+            # Variable modified by SETCHAR stays, its value is used only for folding
+            if isinstance(fact, (Constant, Variable)) and not (opcode == "SETCHAR" and index == 1):
+                if rewritten is None:
+                    rewritten = list(instruction)
+                rewritten[index] = fact
+        instruction = instruction if rewritten is None else rewritten
+
+        if opcode in DataflowOptimizer.DESTINATIONS and opcode != "MOVE":
+            operands = instruction[2:]
+            if opcode == "SETCHAR":
+                operands = [state.get(DataflowOptimizer._key(instruction[1]))] + operands
+            if operands and all(isinstance(operand, Constant) for operand in operands):
+                result = DataflowOptimizer._fold(opcode, [operand.value for operand in operands])
+                if result is not None:
+                    return ["MOVE", instruction[1], DataflowOptimizer._constant(result[0])]
+        elif opcode in ("JUMPIFEQ", "JUMPIFNEQ"):
+            if isinstance(instruction[2], Constant) and isinstance(instruction[3], Constant):
+                result = DataflowOptimizer._fold(opcode, [instruction[2].value, instruction[3].value])
+                if result is not None:
+                    return ["JUMP", instruction[1]] if result[0] else None
+        return instruction
+
+    # Method that removes facts about variables in given frames and copies of them
+    @staticmethod
+    def _kill_frames(state, frames):
+        for key in [key for key, fact in state.items()
+                    if key[0] in frames or (isinstance(fact, Variable) and fact.frame in frames)]:
+            del state[key]
+
+    # Method that changes state by effect of (rewritten) instruction
+    @staticmethod
+    def _transfer(state, instruction):
+        opcode = instruction[0]
+        for index in DataflowOptimizer._read_indexes(instruction):
+            # Variable that was read without error exists and has value (TYPE accepts uninitialized variable)
+            key = DataflowOptimizer._key(instruction[index])
+            minimum = DEFINED if opcode == "TYPE" else INITIALIZED
+            if DataflowOptimizer._rank(state.get(key, 0)) < minimum:
+                state[key] = minimum
+
+        if opcode == "CREATEFRAME":
+            DataflowOptimizer._kill_frames(state, ("TF",))
+        elif opcode in ("PUSHFRAME", "POPFRAME"):
+            # Facts about frame are moved with the frame, other local frames are unknown
+            source, destination = ("TF", "LF") if opcode == "PUSHFRAME" else ("LF", "TF")
+            moved = {(destination, key[1]): fact for key, fact in state.items()
+                     if key[0] == source and not (isinstance(fact, Variable) and fact.frame != "GF")}
+            DataflowOptimizer._kill_frames(state, ("LF", "TF"))
+            state.update(moved)
+        elif opcode in DataflowOptimizer.DESTINATIONS:
+            destination = instruction[1]
+            key = DataflowOptimizer._key(destination)
+            for copy in [copy for copy, fact in state.items()
+                         if isinstance(fact, Variable) and DataflowOptimizer._key(fact) == key]:
+                state[copy] = INITIALIZED
+            if opcode == "DEFVAR":
+                state[key] = DEFINED
+            elif opcode == "MOVE" and isinstance(instruction[2], Constant):
+                state[key] = instruction[2]
+            elif opcode == "MOVE" and DataflowOptimizer._key(instruction[2]) != key:
+                state[key] = instruction[2]
+            else:
+                state[key] = INITIALIZED
+
+    # Method that returns states on starts of blocks (None for unreachable block)
+    def _analyze(self, code, graph):
+        states = [None] * len(graph.blocks)
+        if not graph.blocks:
+            return states
+        states[0] = {}
+        work = [0]
+        while work:
+            block = graph.blocks[work.pop()]
+            state = dict(states[block.index])
+            for pc in range(block.start, block.end):
+                instruction = DataflowOptimizer._rewrite(state, code[pc])
+                if instruction is not None:
+                    DataflowOptimizer._transfer(state, instruction)
+            for successor in block.successors:
+                old = states[successor]
+                new = DataflowOptimizer._meet(old, state)
+                if new != old:
+                    states[successor] = new
+                    if successor not in work:
+                        work.append(successor)
+        return states
+
+    # Method that returns new code and labels without removed (None) instructions
+    @staticmethod
+    def _compact(code, *lists):
+        kept = [pc for pc, instruction in enumerate(code) if instruction is not None]
+        new_code = [code[pc] for pc in kept]
+        labels = {instruction[1]: pc for pc, instruction in enumerate(new_code) if instruction[0] == "LABEL"}
+        return (new_code, labels) + tuple([values[pc] for pc in kept] for values in lists)
+
+    # Method that propagates values, folds instructions and removes unreachable blocks
+    # Returns new code, labels, for every instruction True if it can be removed when its result is not used
+    # and sources of kept instructions
+    def _propagate(self, code, labels, sources):
+        graph = ControlFlowGraph(code, labels)
+        states = self._analyze(code, graph)
+        new_code = [None] * len(code)
+        removable = [False] * len(code)
+        for block in graph.blocks:
+            state = states[block.index]
+            for pc in range(block.start, block.end):
+                if state is None:
+                    # Unreachable block, LABEL stays because jumps to it must stay valid
+                    if code[pc][0] == "LABEL":
+                        new_code[pc] = code[pc]
+                    continue
+                instruction = DataflowOptimizer._rewrite(state, code[pc])
+                if instruction is None:
+                    continue
+                if instruction[0] == "MOVE":
+                    # MOVE cannot fail if variable is defined and value is constant or initialized variable
+                    source = instruction[2]
+                    removable[pc] = (DataflowOptimizer._rank(state.get(DataflowOptimizer._key(instruction[1]), 0)) >= DEFINED
+                                     and (isinstance(source, Constant)
+                                          or DataflowOptimizer._rank(state.get(DataflowOptimizer._key(source), 0)) >= INITIALIZED))
+                DataflowOptimizer._transfer(state, instruction)
+                new_code[pc] = instruction
+        return DataflowOptimizer._compact(new_code, removable, sources)
+
+    # Method that removes MOVE instructions whose result is never read
+    # Liveness is computed backward on control flow graph
+    # Returns new code, labels, removable flags and sources of kept instructions
+    @staticmethod
+    def _eliminate_dead(code, labels, removable, sources):
+        graph = ControlFlowGraph(code, labels)
+        uses = []
+        for block in graph.blocks:
+            used = set()
+            killed = set()
+            for pc in range(block.start, block.end):
+                instruction = code[pc]
+                for index in DataflowOptimizer._read_indexes(instruction):
+                    key = DataflowOptimizer._live_key(instruction[index])
+                    if key not in killed:
+                        used.add(key)
+                # Write to local variable can be write to other frame than later read, so it does not kill
+                if instruction[0] in DataflowOptimizer.DESTINATIONS and instruction[1].frame == "GF":
+                    killed.add(DataflowOptimizer._live_key(instruction[1]))
+            uses.append((used, killed))
+
+        live_in = [set() for _ in graph.blocks]
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(graph.blocks):
+                live = set().union(*(live_in[successor] for successor in block.successors))
+                used, killed = uses[block.index]
+                new = used | (live - killed)
+                if new != live_in[block.index]:
+                    live_in[block.index] = new
+                    changed = True
+
+        new_code = list(code)
+        for block in graph.blocks:
+            live = set().union(*(live_in[successor] for successor in block.successors))
+            for pc in range(block.end - 1, block.start - 1, -1):
+                instruction = code[pc]
+                if removable[pc] and DataflowOptimizer._live_key(instruction[1]) not in live:
+                    new_code[pc] = None
+                    continue
+                if instruction[0] in DataflowOptimizer.DESTINATIONS and instruction[1].frame == "GF":
+                    live.discard(DataflowOptimizer._live_key(instruction[1]))
+                live.update(DataflowOptimizer._live_key(instruction[index])
+                            for index in DataflowOptimizer._read_indexes(instruction))
+        return DataflowOptimizer._compact(new_code, removable, sources)
+
+    # Method that returns optimized code and labels, code and labels given to constructor are not changed
+    def optimize(self):
+        self.removed = 0
+        self.sources = list(range(len(self.code)))
+        if any(instruction[0] == "BREAK" for instruction in self.code):
+            return self.code, self.labels
+        code, labels, sources = self.code, self.labels, self.sources
+        while True:
+            new_code, labels, removable, sources = self._propagate(code, labels, sources)
+            new_code, labels, _, sources = DataflowOptimizer._eliminate_dead(new_code, labels, removable, sources)
+            changed = len(new_code) != len(code) or any(new is not old for new, old in zip(new_code, code))
+            code = new_code
+            if not changed:
+                break
+        self.removed = len(self.code) - len(code)
+        self.sources = sources
+        return code, labels
+
+    # Method that returns report of optimization
+    def report(self):
+        return {"instructions": len(self.code), "removed": self.removed}
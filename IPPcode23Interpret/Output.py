@@ -0,0 +1,81 @@
+import sys
+
+# Class that collects output of program (WRITE) and writes it to stream in big chunks
+# Flush policy:
+#   - buffer is flushed when it has at least flush_size characters (0 means after every write)
+#   - interpret flushes it before READ if flush_on_read is set (interactive input)
+#   - interpret finishes it when program ends, also on EXIT and on error
+# If threaded, chunks are written by writer thread so slow consumer does not stop the program
+# Stream None means sys.stdout at the time of flush
+class OutputBuffer:
+
+    __slots__ = ("stream", "flush_size", "flush_on_read", "_parts", "_size",
+                 "_threaded", "_queue", "_thread")
+
+    # Default size of buffer in characters
+    FLUSH_SIZE = 1 << 16
+
+    def __init__(self, stream=None, flush_size=None, threaded=False, flush_on_read=None):
+        self.stream = stream
+        self.flush_size = OutputBuffer.FLUSH_SIZE if flush_size is None else flush_size
+        # None means flush before READ only if input is terminal, it is decided by interpret
+        self.flush_on_read = flush_on_read
+        self._parts = []
+        self._size = 0
+        self._threaded = threaded
+        self._queue = None
+        self._thread = None
+
+    def _stream(self):
+        return sys.stdout if self.stream is None else self.stream
+
+    # Method that adds text to buffer
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.flush_size:
+            self.flush()
+
+    # Method that passes content of buffer to stream (or to writer thread)
+    def flush(self):
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts = []
+        self._size = 0
+        if self._threaded:
+            self._writer_queue().put(text)
+        else:
+            stream = self._stream()
+            stream.write(text)
+            stream.flush()
+
+    # Method that flushes buffer and waits until all output is written
+    # It must be called before the program exits
+    def finish(self):
+        self.flush()
+        if self._queue is not None:
+            self._queue.join()
+
+    def _writer_queue(self):
+        if self._thread is None:
+            # Threads are imported only for threaded output
+            import queue
+            import threading
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._writer, name="ippcode23-output", daemon=True)
+            self._thread.start()
+        return self._queue
+
+    # Writer thread, it writes chunks in the same order as they were flushed
+    def _writer(self):
+        while True:
+            text = self._queue.get()
+            try:
+                stream = self._stream()
+                stream.write(text)
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,81 @@
+import sys
+import json
+
+# Class that collects execution counts and cumulative wall time of instructions
+# Interpret with profiler runs its profiled loop, which adds to counts and times on program counter
+# of every executed instruction, interpret without profiler runs the loop without any measuring
+# Report is dictionary that can be written as JSON and printed as text summary
+class Profiler:
+
+    __slots__ = ("engine", "counts", "times")
+
+    # Number of rows of text summary
+    SUMMARY_ROWS = 15
+
+    def __init__(self, engine=""):
+        # Name of engine that executed program
+        self.engine = engine
+        # Number of executions and time in seconds on program counters
+        self.counts = []
+        self.times = []
+
+    # Method that clears measured data for code of given length
+    def reset(self, length):
+        self.counts = [0] * length
+        self.times = [0.0] * length
+
+    # Method that returns report of measured data for executed code
+    # exit_code is return code of interpret (None if it is not known)
+    def report(self, code, exit_code=None):
+        opcodes = {}
+        instructions = []
+        for pc, count in enumerate(self.counts):
+            if not count:
+                continue
+            opcode = code[pc][0]
+            time = self.times[pc]
+            instructions.append({"pc": pc, "opcode": opcode, "count": count, "time": time})
+            total = opcodes.setdefault(opcode, {"opcode": opcode, "count": 0, "time": 0.0})
+            total["count"] += count
+            total["time"] += time
+        return {"engine": self.engine,
+                "exit_code": exit_code,
+                "instructions_executed": sum(self.counts),
+                "time": sum(self.times),
+                "opcodes": sorted(opcodes.values(), key=lambda row: row["time"], reverse=True),
+                "instructions": instructions}
+
+    # Method that writes report to file as JSON
+    @staticmethod
+    def write(report, path):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    # Method that prints report sorted by time as text table (to stderr by default)
+    @staticmethod
+    def summary(report, stream=None, rows=None):
+        stream = sys.stderr if stream is None else stream
+        rows = Profiler.SUMMARY_ROWS if rows is None else rows
+        total = report["time"] or 1.0
+        print(f"profile ({report['engine']}): {report['instructions_executed']} instructions executed "
+              f"in {report['time']:.6f} s, exit code {report['exit_code']}", file=stream)
+        if "frames_allocated" in report:
+            print(f"local frames allocated: {report['frames_allocated']}", file=stream)
+        dataflow = report.get("dataflow")
+        if dataflow is not None:
+            print(f"dataflow optimizer: {dataflow['removed']} of {dataflow['instructions']} instructions removed",
+                  file=stream)
+        inference = report.get("type_inference")
+        if inference is not None:
+            print(f"type inference: {inference['proven']} of {inference['checks']} checks proven "
+                  f"({inference['percentage']:.1f} %)", file=stream)
+        print(f"{'opcode':<12}{'count':>12}{'time [s]':>14}{'time %':>9}{'per call [us]':>16}", file=stream)
+        for row in report["opcodes"][:rows]:
+            print(f"{row['opcode']:<12}{row['count']:>12}{row['time']:>14.6f}{100 * row['time'] / total:>9.2f}"
+                  f"{1e6 * row['time'] / row['count']:>16.3f}", file=stream)
+        hottest = sorted(report["instructions"], key=lambda row: row["time"], reverse=True)[:rows]
+        print(f"{'pc':<12}{'count':>12}{'time [s]':>14}{'time %':>9}  opcode", file=stream)
+        for row in hottest:
+            print(f"{row['pc']:<12}{row['count']:>12}{row['time']:>14.6f}{100 * row['time'] / total:>9.2f}"
+                  f"  {row['opcode']}", file=stream)
@@ -0,0 +1,142 @@
+import os
+import marshal
+# Builtin SHA-256 is imported much faster than hashlib (that loads OpenSSL), digests are the same
+try:
+    from _sha256 import sha256
+except ImportError:
+    try:
+        from _sha2 import sha256
+    except ImportError:
+        from hashlib import sha256
+
+# Class that stores validated programs on disk so XML parsing and semantic analysis
+# can be skipped when the same source file is interpreted again
+# Entry is keyed by hash of source file and VERSION, so changed source or interpreter never hits stale entry
+# Entry is .ippc file with marshalled (MAGIC, VERSION, code, labels)
+# Total size of entries is limited, least recently used entries are removed first
+class ProgramCache:
+
+    __slots__ = ("directory", "max_size")
+
+    # Version of cached data. It must be changed when format of code or labels changes
+    VERSION = 2
+    MAGIC = "IPPC"
+    SUFFIX = ".ippc"
+    # Default limit of total size of cache in bytes
+    MAX_SIZE = 64 << 20
+
+    def __init__(self, directory=None, max_size=None):
+        if directory is None:
+            directory = os.path.join(ProgramCache.default_directory(), "programs")
+        self.directory = directory
+        self.max_size = ProgramCache.MAX_SIZE if max_size is None else max_size
+
+    # Method that returns default directory for caches of interpreter
+    @staticmethod
+    def default_directory():
+        directory = os.environ.get("IPPCODE23_CACHE_DIR")
+        if directory:
+            return directory
+        return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                            "ippcode23")
+
+    # Method that returns hash of source file
+    @staticmethod
+    def digest_file(path):
+        digest = sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # Method that returns hash of source given as bytes
+    @staticmethod
+    def digest_bytes(data):
+        return sha256(data).hexdigest()
+
+    def _path(self, source_digest):
+        return os.path.join(self.directory, f"{source_digest}-{ProgramCache.VERSION}{ProgramCache.SUFFIX}")
+
+    # Method that returns (code, labels) of cached program or None if it is not cached
+    # Entry that cannot be read is invalidated
+    def load(self, source_digest):
+        path = self._path(source_digest)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            magic, version, code, labels = marshal.loads(data)
+        except (ValueError, EOFError, TypeError):
+            self.invalidate(source_digest)
+            return None
+        if magic != ProgramCache.MAGIC or version != ProgramCache.VERSION:
+            self.invalidate(source_digest)
+            return None
+        # Modification time is time of last use for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return code, labels
+
+    # Method that stores validated program to cache and evicts old entries over size limit
+    def store(self, source_digest, code, labels):
+        # tempfile is needed only when program is not cached yet
+        import tempfile
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(marshal.dumps((ProgramCache.MAGIC, ProgramCache.VERSION, code, labels)))
+            os.replace(temporary, self._path(source_digest))
+        except OSError:
+            return
+        self.evict()
+
+    # Method that removes cached program
+    def invalidate(self, source_digest):
+        try:
+            os.remove(self._path(source_digest))
+        except OSError:
+            pass
+
+    # Method that removes all cached programs
+    def clear(self):
+        for _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Method that returns list of (stat, path) of entries sorted from least recently used
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(ProgramCache.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.stat(path), path))
+            except OSError:
+                pass
+        entries.sort(key=lambda entry: entry[0].st_mtime)
+        return entries
+
+    # Method that removes least recently used entries until total size is under limit
+    def evict(self):
+        entries = self._entries()
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                total -= stat.st_size
+            except OSError:
+                pass
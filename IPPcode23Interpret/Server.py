@@ -0,0 +1,198 @@
+import io
+import os
+import sys
+import json
+import argparse
+import signal
+import socket
+import traceback
+import contextlib
+from . import Output
+from . import Input
+
+# Exception raised by SIGALRM when job runs longer than its time limit
+# It is not Exception, so it is not caught as error of interpreted program
+class JobTimeout(BaseException):
+    pass
+
+
+# Class that runs interpreter as long-running server, so python startup, imports and tables
+# of instructions are paid only once for many small programs
+# Jobs are JSON objects, one per line, on stdin or on connections to unix socket
+# Job:
+#   {"id": any, "source": XML text or "source_file": path, "input": text or "input_file": path,
+#    "engine": "tac", "optimize": false, "cache": true, "timeout": seconds}
+# Every job gets one response line:
+#   {"id": id of job, "exit_code": int, "stdout": output of program, "stderr": messages}
+# Exit code is the same as exit code of interpret.py for the same program
+# Invalid job gets exit code 10 (same as invalid arguments), unexpected exception exit code 99
+# Job that runs longer than its time limit is stopped and gets exit code null
+class InterpretServer:
+
+    __slots__ = ("interpret", "defaults", "timeout")
+
+    def __init__(self, interpret, timeout=None):
+        # Instance of Interpret.Interpret, its parsers and engines are reused and reset by every job
+        self.interpret = interpret
+        # Default options of jobs are default values of arguments
+        self.defaults = vars(interpret.argument_parser.parser.parse_args([]))
+        # Time limit of job without timeout in seconds (None is no limit)
+        self.timeout = timeout
+
+    # Handler of SIGTERM, server stops same as on Ctrl+C (socket file is removed)
+    @staticmethod
+    def _terminate(signal_number, frame):
+        raise KeyboardInterrupt
+
+    # Handler of SIGALRM of time limit
+    @staticmethod
+    def _alarm(signal_number, frame):
+        raise JobTimeout
+
+    # Context manager that raises JobTimeout in its block after seconds (without limit if seconds is None)
+    # Timer is set by setitimer(), so it works only in main thread
+    @staticmethod
+    @contextlib.contextmanager
+    def time_limit(seconds):
+        if seconds is None:
+            yield
+            return
+        previous = signal.signal(signal.SIGALRM, InterpretServer._alarm)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    # Method that serves jobs on stdin and stdout, or on unix socket if path is given
+    # Returns 0 when input ends (or server is interrupted)
+    def serve(self, socket_path=None):
+        signal.signal(signal.SIGTERM, InterpretServer._terminate)
+        try:
+            if socket_path is None:
+                self.serve_lines(sys.stdin.buffer, sys.stdout.buffer)
+            else:
+                self.serve_socket(socket_path)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    # Method that accepts connections on unix socket, connections are served one after another
+    def serve_socket(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(path)
+            server.listen()
+            while True:
+                connection, _ = server.accept()
+                with connection, connection.makefile("rb") as reader, connection.makefile("wb") as writer:
+                    try:
+                        self.serve_lines(reader, writer)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+        finally:
+            server.close()
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Method that reads jobs from binary stream and writes responses to binary stream
+    def serve_lines(self, reader, writer):
+        for line in reader:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as error:
+                response = InterpretServer._response(None, 10, "", f"Invalid job: {error}")
+            else:
+                response = self.run_job(job)
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            writer.flush()
+
+    @staticmethod
+    def _response(job_id, exit_code, stdout, stderr):
+        return {"id": job_id, "exit_code": exit_code, "stdout": stdout, "stderr": stderr}
+
+    # Method that returns options of job (namespace like parsed arguments) or error message
+    def _options(self, job):
+        options = dict(self.defaults)
+        options["engine"] = job.get("engine", options["engine"])
+        options["optimize"] = bool(job.get("optimize", False))
+        options["no_cache"] = not job.get("cache", True)
+        if options["engine"] not in self.interpret.ENGINES:
+            return None, f"Unknown engine {options['engine']}"
+        if not isinstance(job.get("source", ""), str) or not isinstance(job.get("input", ""), str):
+            return None, "Source and input of job must be strings"
+        if ("source" in job) == ("source_file" in job):
+            return None, "Job must have exactly one of source and source_file"
+        for key in ("source_file", "input_file"):
+            if key in job and not (isinstance(job[key], str) and os.path.isfile(job[key])):
+                return None, f"File {job[key]} of {key} not found"
+        timeout = job.get("timeout")
+        if timeout is not None and (type(timeout) not in (int, float) or timeout <= 0):
+            return None, "Timeout of job must be positive number"
+        return options, None
+
+    # Method that interprets one job and returns response
+    # Messages and output are captured, exit() of error handling is caught,
+    # so the server continues with the next job in any case
+    # If stream is given, output of program is written to it instead of to response
+    def run_job(self, job, stream=None):
+        if not isinstance(job, dict):
+            return InterpretServer._response(None, 10, "", "Invalid job: job must be JSON object")
+        job_id = job.get("id")
+        options, error = self._options(job)
+        if error is not None:
+            return InterpretServer._response(job_id, 10, "", f"Invalid job: {error}")
+        args = argparse.Namespace(**options)
+        timeout = job.get("timeout", self.timeout)
+
+        if "source_file" in job:
+            source = job["source_file"]
+        else:
+            source = job["source"].encode("utf-8")
+        if "input_file" in job:
+            input_stream = Input.MappedInput(job["input_file"])
+        else:
+            input_stream = Input.ChunkedInput(io.BytesIO(job.get("input", "").encode("utf-8")), "utf-8")
+
+        try:
+            with InterpretServer.time_limit(timeout):
+                exit_code, stdout, stderr = InterpretServer.run_captured(
+                    lambda output: self.interpret.run_program(args, True, source, output, input_stream), stream)
+        except JobTimeout:
+            return InterpretServer._response(job_id, None, "", f"Job timed out after {timeout} seconds")
+        finally:
+            input_stream.close()
+        return InterpretServer._response(job_id, exit_code, stdout, stderr)
+
+    # Method that calls function with output buffer of program, captures its messages and catches exit()
+    # Returns exit code, output of program and messages
+    # If stream is given, output of program is written to it instead of to returned output
+    @staticmethod
+    def run_captured(function, stream=None):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        output = Output.OutputBuffer(stdout if stream is None else stream)
+        # exit() closes sys.stdin, so function gets its own (programs never read stdin of server)
+        server_stdin = sys.stdin
+        sys.stdin = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    exit_code = function(output)
+                except SystemExit as exit_:
+                    exit_code = exit_.code
+                except Exception:
+                    traceback.print_exc()
+                    exit_code = 99
+                finally:
+                    output.finish()
+        finally:
+            sys.stdin = server_stdin
+        if not isinstance(exit_code, int):
+            exit_code = 0 if exit_code is None else 1
+        return exit_code, stdout.getvalue(), stderr.getvalue()
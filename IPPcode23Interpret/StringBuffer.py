@@ -0,0 +1,135 @@
+# Custom representation of long strings built or modified by CONCAT and SETCHAR
+# Python str is immutable, so appending a char to a string or changing one char copies the whole string
+# and loops that build string char by char are quadratic
+#
+# StringBuffer is immutable value (same as str) implemented as persistent array of chars:
+# the newest version of buffer (root) owns list of chars and every older version is diff to a newer one
+# (one changed char, shorter length or longer length). Operation on root changes the list in place and turns
+# the root into diff, so appending and changing char of the newest version costs O(1) (amortized).
+# Operation on older version (for example value copied by MOVE before change) first reverses the diffs
+# between it and the root (rerooting), so all versions stay valid and only mixing of versions is slower
+#
+# Buffer is used only by string instructions (CONCAT, SETCHAR, GETCHAR, STRLEN, STRI2INT) and TYPE,
+# other instructions get python str by text(), which is computed once for every version
+class StringBuffer:
+
+    __slots__ = ("_chars", "_diff", "_text")
+
+    # Strings shorter than this stay python str, they are cheap to copy
+    THRESHOLD = 256
+
+    def __init__(self, chars=None, diff=None):
+        # List of chars of root, None for older version
+        self._chars = chars
+        # Older version: (kind, argument, newer version)
+        #   "set", (index, char)  this version has char on index
+        #   "truncate", length    this version is first length chars of newer version
+        #   "extend", chars       this version is newer version with chars appended
+        self._diff = diff
+        # Python str of this version, computed by text()
+        self._text = None
+
+    # Method that returns buffer with chars of python string
+    @staticmethod
+    def from_str(string):
+        return StringBuffer(list(string))
+
+    # Method that makes this version root and returns its list of chars
+    def _reroot(self):
+        if self._chars is not None:
+            return self._chars
+        path = [self]
+        while path[-1]._chars is None:
+            path.append(path[-1]._diff[2])
+        chars = path[-1]._chars
+        # Diffs are reversed from the root back to this version
+        for index in range(len(path) - 2, -1, -1):
+            version, newer = path[index], path[index + 1]
+            kind, argument, _ = version._diff
+            if kind == "set":
+                position, char = argument
+                newer._diff = ("set", (position, chars[position]), version)
+                chars[position] = char
+            elif kind == "truncate":
+                newer._diff = ("extend", chars[argument:], version)
+                del chars[argument:]
+            else:
+                newer._diff = ("truncate", len(chars), version)
+                chars.extend(argument)
+            newer._chars = None
+            version._chars = chars
+            version._diff = None
+        return chars
+
+    # Method that returns python str of this version
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self._reroot())
+        return self._text
+
+    def __len__(self):
+        if self._text is not None:
+            return len(self._text)
+        return len(self._reroot())
+
+    # Method that returns char on index (index must be valid)
+    def char(self, index):
+        if self._text is not None:
+            return self._text[index]
+        return self._reroot()[index]
+
+    # Method that returns new version with string appended
+    def concat(self, string):
+        chars = self._reroot()
+        newer = StringBuffer(chars)
+        self._chars = None
+        self._diff = ("truncate", len(chars), newer)
+        chars.extend(string)
+        return newer
+
+    # Method that returns new version with char on index (index must be valid)
+    def set_char(self, index, char):
+        chars = self._reroot()
+        newer = StringBuffer(chars)
+        self._chars = None
+        self._diff = ("set", (index, chars[index]), newer)
+        chars[index] = char
+        return newer
+
+    # Representation is same as of python str so BREAK prints frames same as before
+    def __repr__(self):
+        return repr(self.text())
+
+    def __str__(self):
+        return self.text()
+
+
+# Types of string values
+STRING_TYPES = (str, StringBuffer)
+
+# Method that returns python str of string value
+def to_str(value):
+    return value.text() if type(value) is StringBuffer else value
+
+# Method that returns concatenation of two string values
+# Long result is buffer, so appending to it again does not copy it
+def concat(first, second):
+    if type(first) is StringBuffer:
+        return first.concat(to_str(second))
+    second = to_str(second)
+    if len(first) + len(second) < StringBuffer.THRESHOLD:
+        return first + second
+    return StringBuffer.from_str(first).concat(second)
+
+# Method that returns string value with char on index changed (index must be valid)
+# Long string becomes buffer, so changing it again does not copy it
+def set_char(string, index, char):
+    if type(string) is StringBuffer:
+        return string.set_char(index, char)
+    if len(string) < StringBuffer.THRESHOLD:
+        return string[:index] + char + string[index + 1:]
+    return StringBuffer.from_str(string).set_char(index, char)
+
+# Method that returns char on index of string value (index must be valid)
+def get_char(string, index):
+    return string.char(index) if type(string) is StringBuffer else string[index]
@@ -1,17 +1,37 @@
 import sys
+import time
+import operator
 from . import Nil
+from .ControlFlow import ControlFlowGraph
+from . import StringBuffer as sb
+from . import Output
+from . import Input
 from . import ErrorHandler as e
 # Custom exceptions that are used in interpreter
 # They take instance of object and message as arguments
 # message will be stored in error_message attribute of object
 # code is used for returning error code from interpret.py
+# Program counters in message are indexes in source code if object has source_pcs (code optimized by -O)
 
 class CustomException(Exception):
     def __init__(self, this, code, message):
+        source_pcs = getattr(this, "source_pcs", None)
+        if source_pcs is not None:
+            message = CustomException._source_counters(message, source_pcs)
         super().__init__(message)
         this.error_message = message
         self.code = code
 
+    # Method that replaces program counters of optimized code in message by program counters of source code
+    # re is imported only when error of optimized program is reported
+    @staticmethod
+    def _source_counters(message, source_pcs):
+        import re
+        def source_counter(match):
+            pc = int(match.group(2))
+            return match.group(1) + str(source_pcs[pc] if pc < len(source_pcs) else pc)
+        return re.sub(r"(program counter:? )(\d+)", source_counter, message)
+
 class RedefiningVariable(CustomException):
     def __init__(self, this, message):
         super().__init__(this, 52, message)
@@ -40,6 +60,17 @@ class StringError(CustomException):
     def __init__(self, this, message):
         super().__init__(this, 58, message)
 
+# Value of slot of variable that is not defined in frame
+# Frames are lists indexed by slots of variables (assigned by Decoder)
+class Undefined:
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "undefined"
+
+UNDEFINED = Undefined()
+
 # Class that contains init method for iterpret data
 # It also contains all attributes that are used in interpret
 # It is used in all parts of interpret
@@ -49,7 +80,13 @@ class InterpretData(e.ErrorHandable):
                 "_call_stack", "_data_stack", 
                 "FRAMES", "TYPES",
                 "error_message", "_instruction_count"
-                "_input_stream", "force_exit")
+                "_input_stream", "output", "_flush_before_read",
+                "_global_names", "_local_names", "profiler", "call_cache", "_memo_calls", "_dispatch", "_handlers",
+                "_free_frames", "_empty_frame", "frames_allocated", "_targets", "_following", "source_pcs",
+                "force_exit")
+
+    # Maximal number of free local frames kept for reuse by CREATEFRAME
+    FRAME_POOL_SIZE = 1024
 
     def __init__(self, code: list, labels: dict, input_stream=sys.stdin, force_exit=False):
         #                                                               0       1      2     3
@@ -58,6 +95,7 @@ class InterpretData(e.ErrorHandable):
         # argument 1: self.code[self._pc][1]
         # argument 2: self.code[self._pc][2]
         # argument 3: self.code[self._pc][3]
+        # arguments are already decoded by Decoder (variables and constants are operand objects)
         self.code = code
         # labels are stored in dictionary 
         self._labels = labels
@@ -69,37 +107,146 @@ class InterpretData(e.ErrorHandable):
         self._data_stack = []
         # Number of executed instructions
         self._instruction_count = 0
+        # Names of variables on slots of global and local (LF and TF) frames
+        self._global_names, self._local_names = InterpretData.frame_names(code)
+        # Program counters of instructions in source code if code is optimized (see DataflowOptimizer.sources)
+        self.source_pcs = None
         # Dictionary that contains all frame names and their attributes
-        self.FRAMES = {"GF": {},
+        # GF and TF are lists of values on slots of variables, LF is stack of them
+        self.FRAMES = {"GF": [UNDEFINED] * len(self._global_names),
                        "LF": [], "TF": None}
         # Dictionary that contains all types and their conversion methods
         self.TYPES = {"int": InstructionUtils._str_to_int, "string": str,
                       "bool": InstructionUtils._to_bool, "nil": Nil.nil}
         # Input stream is used for reading from file or stdin
-        self._input_stream = sys.stdin if input_stream is None else input_stream
+        # It is InputReader that converts read lines to values
+        self._input_stream = Input.InputReader.wrap(sys.stdin if input_stream is None else input_stream)
+        # Output of WRITE is buffered, it is written to stdout or to file
+        self.output = Output.OutputBuffer()
+        # True if output is flushed before READ (prompt is visible before program waits for input)
+        self._flush_before_read = False
+        # Profiler that measures executed instructions, None if program is not profiled
+        self.profiler = None
+        # Cache of results of pure functions (Memoization.CallCache), None if calls are not memoized
+        self.call_cache = None
+        # Memoized calls that did not hit cache and did not return yet (see Instruction._memo_call)
+        self._memo_calls = []
+        # Methods executed on program counters by main loop and methods of single instructions on them
+        # They differ only for superinstructions, quickening replaces methods in both (see Instruction)
+        self._dispatch = []
+        self._handlers = []
+        # Local frames dropped by CREATEFRAME and POPFRAME, they are reset and reused by CREATEFRAME
+        self._free_frames = []
+        self._empty_frame = [UNDEFINED] * len(self._local_names)
+        # Number of local frames that were allocated (not taken from pool) since reset
+        self.frames_allocated = 0
+        # Program counters of LABEL of jumps and calls and program counters executed after every
+        # instruction (LABEL is skipped), they are resolved by ControlFlowGraph before run
+        self._targets = []
+        self._following = []
         super().__init__(force_exit)
 
     # Method that resets the interpreter to initial state 
     # Only with the code and labels that were provided in the constructor
     def _reset(self, force_exit=False):
         self._pc = 0
-        self.FRAMES = {"GF": {},
+        self.FRAMES = {"GF": [UNDEFINED] * len(self._global_names),
                        "LF": [], "TF": None}
         self._call_stack = []
         self._data_stack = []
         self._instruction_count = 0
+        # Size of frames can change with code, so frames of previous run are not reused
+        self._free_frames.clear()
+        self._empty_frame = [UNDEFINED] * len(self._local_names)
+        self.frames_allocated = 0
+        self._flush_before_read = self._is_interactive_input() if self.output.flush_on_read is None else self.output.flush_on_read
+        if self.profiler is not None:
+            self.profiler.reset(len(self.code) if self.code else 0)
+        self._memo_calls = []
+        if self.call_cache is not None:
+            self.call_cache.reset()
         super().__init__(force_exit)
 
+    # Method that returns names of variables on slots of global and local frames
+    # Slots are assigned to variables by Decoder, optimized code can have gaps in slots (variables whose
+    # instructions were removed), frames are as long as the highest slot and gaps have name None
+    @staticmethod
+    def frame_names(code):
+        global_names = {}
+        local_names = {}
+        for instruction in code or ():
+            for operand in instruction[1:]:
+                slot = getattr(operand, "slot", None)
+                if slot is not None:
+                    (global_names if operand.frame == "GF" else local_names)[slot] = operand.name
+        return ([global_names.get(slot) for slot in range(max(global_names, default=-1) + 1)],
+                [local_names.get(slot) for slot in range(max(local_names, default=-1) + 1)])
+
+    # Method that returns new empty local frame (for CREATEFRAME)
+    # Frame is taken from pool of free frames, it is allocated only if pool is empty
+    def _new_frame(self):
+        if self._free_frames:
+            return self._free_frames.pop()
+        self.frames_allocated += 1
+        return self._empty_frame.copy()
+
+    # Method that returns dropped local frame to pool (temporary frame replaced by CREATEFRAME or POPFRAME)
+    # Frame is not referenced by anything else, so it is reset to empty frame and reused
+    def _free_frame(self, frame):
+        if frame is not None and len(self._free_frames) < self.FRAME_POOL_SIZE:
+            frame[:] = self._empty_frame
+            self._free_frames.append(frame)
+
+    # Method that returns frame as dictionary of defined variables (for BREAK)
+    @staticmethod
+    def _frame_view(frame, names):
+        if frame is None:
+            return None
+        return {names[slot]: value for slot, value in enumerate(frame) if value is not UNDEFINED}
+
+    # Method that returns True if input is read from terminal
+    def _is_interactive_input(self):
+        try:
+            return self._input_stream.isatty()
+        except (AttributeError, ValueError):
+            return False
+
+    # Method that prints all important information about current state of program to stderr
+    # It is used by instruction BREAK
+    def _print_state(self):
+        print(
+            f"previous instruction: {self.code[self._pc-1] if len(self.code) > 1  else self.code[self._pc]}", file=sys.stderr)
+        print(f"current code: {self.code[self._pc]}", file=sys.stderr)
+        print(
+            f"current program counter (indexed from 0): {self._pc}", file=sys.stderr)
+        print(
+            f"instructions executed: {self._instruction_count}", file=sys.stderr)
+        print(f"global frame: {InterpretData._frame_view(self.FRAMES['GF'], self._global_names)}", file=sys.stderr)
+        print(f"temporary frame: {InterpretData._frame_view(self.FRAMES['TF'], self._local_names)}", file=sys.stderr)
+        print("(top of stack is at the bottom of the list)", file=sys.stderr)
+        print(f"local frames: {[InterpretData._frame_view(frame, self._local_names) for frame in self.FRAMES['LF']]}", file=sys.stderr)
+        print(f"call stack: {self._call_stack}", file=sys.stderr)
+        print(f"data stack: {self._data_stack}", file=sys.stderr)
+
+    # Method that resolves jump targets and order of instructions before run
+    # Jumps set program counter to their LABEL and main loop continues on instruction following it,
+    # so LABEL is never executed, BREAK prints number of executed instructions, so LABEL is kept in it
+    def _resolve_jumps(self):
+        self._targets = ControlFlowGraph.jump_targets(self.code, self._labels)
+        keep_labels = any(instruction[0] == "BREAK" for instruction in self.code)
+        self._following = ControlFlowGraph.following(self.code, keep_labels)
+
     # Method that updates the code and labels
     def update_code(self, code, labels):
         if code != self.code:
             self.code = code
             self._labels = labels
+            self._global_names, self._local_names = InterpretData.frame_names(code)
 
     # Method that updates the input stream
     def update_input_stream(self, input_stream):
         if input_stream != self._input_stream:
-            self._input_stream = input_stream
+            self._input_stream = Input.InputReader.wrap(input_stream)
 
 
 # Class containing all helper methods for Instruction class
@@ -184,82 +331,114 @@ class InstructionUtils(InterpretData):
     def _from_bool(boolean: bool):
         return "true" if boolean else "false"
 
-    # Methods that return splited arguments of "type/frame@value/name" format
+    # Methods that return pre-decoded operands of active instruction
+    # Operands are decoded by Decoder when program is loaded so there is no parsing of strings
+    # Variable operand has attributes frame and name, constant operand has frame None and value
     def _parse_sym(self):
-        frame, var_name = self.code[self._pc][1].split("@", 1)
-        return frame, var_name
+        return self.code[self._pc][1]
 
     def _parse_2sym(self):
-        first, second = self.code[self._pc][1].split("@", 1)
-        third, fourth = self.code[self._pc][2].split("@", 1)
-        return first, second, third, fourth
+        instruction = self.code[self._pc]
+        return instruction[1], instruction[2]
 
     def _parse_3sym(self):
-        first, second = self.code[self._pc][1].split("@", 1)
-        third, fourth = self.code[self._pc][2].split("@", 1)
-        fifth, sixth = self.code[self._pc][3].split("@", 1)
-        return first, second, third, fourth, fifth, sixth
+        instruction = self.code[self._pc]
+        return instruction[1], instruction[2], instruction[3]
 
     def _parse_lab_2sym(self):
-        first, second = self.code[self._pc][2].split("@", 1)
-        third, fourth = self.code[self._pc][3].split("@", 1)
-        return first, second, third, fourth
-
-    # Method that returns top frame of local frames
-    # Or only return frame if it is not list
-    # Raises exception if local frames is empty
-    def _top_frame(self, lst):
-        if type(lst) == list:
+        instruction = self.code[self._pc]
+        return instruction[2], instruction[3]
+
+    # Method that returns frame of given frame name
+    # Raises exception if local frames stack is empty or temporary frame is not defined
+    def _frame(self, frame_name):
+        if frame_name == "GF":
+            return self.FRAMES["GF"]
+
+        if frame_name == "LF":
             try:
-                lst = lst[-1]
+                return self.FRAMES["LF"][-1]
 
             except IndexError:
                 raise NotExistingFrame(self, f"No local frame when calling instruction {self.code[self._pc][0]} in program counter: {self._pc}.")
-            
-        if lst is None:
+
+        frame = self.FRAMES["TF"]
+        if frame is None:
             raise NotExistingFrame(self, f"No temporary frame when calling instruction {self.code[self._pc][0]} in program counter: {self._pc}.")
-        
-        return lst
+
+        return frame
 
     # Method that returns value of symbol
+    # String buffer is returned as python str, only if text is False it is returned as it is
     # Raises exception if variable is not defined
     # Raises exception if variable is not defined in frame
     # Because of decorator it raises exception if some of the methods
     # that are called in this method raises exception
     @_raise_again_err_decorator
-    def _get_sym_value(self, frame_or_sym, type_key, value_key, none_check=True):
-        if frame_or_sym:
-            try:
-                # Frame
-                value = InstructionUtils._top_frame(
-                    self, self.FRAMES[type_key])[value_key]
-                # Check if variable is initialized
-                if none_check and value is None:
-                    raise MissingOperandValue(
-                        self, f"Variable {type_key}@{value_key} not initialized. Instruction {self.code[self._pc][0]} on program counter: {self._pc}")
-                
-                return value
-            
-            except KeyError:
+    def _get_sym_value(self, operand, none_check=True, text=True):
+        if operand.frame is not None:
+            # Frame
+            value = InstructionUtils._frame(self, operand.frame)[operand.slot]
+            if value is UNDEFINED:
                 raise NotExistingVariable(
-                    self, f"No variable {type_key}@{value_key} in frame when calling instruction {self.code[self._pc][0]} in program counter: {self._pc}.")
+                    self, f"No variable {operand.frame}@{operand.name} in frame when calling instruction {self.code[self._pc][0]} in program counter: {self._pc}.")
+            # Check if variable is initialized
+            if none_check and value is None:
+                raise MissingOperandValue(
+                    self, f"Variable {operand.frame}@{operand.name} not initialized. Instruction {self.code[self._pc][0]} on program counter: {self._pc}")
+
+            if text and type(value) is sb.StringBuffer:
+                return value.text()
+            return value
         else:
-            # Sym
-            return self.TYPES[type_key](value_key)
+            # Sym (constant is already converted when program is loaded)
+            return operand.value
     
     # Method that sets value of variable
     # Raises exception if variable is not defined in frame
     # Because of decorator it raises exception if some of the methods
     # that are called in this method raises exception
     @_raise_again_err_decorator
-    def _set_var_value(self, frame_type_key, value_key, value_to_set):
-            frame = InstructionUtils._top_frame(self, self.FRAMES[frame_type_key])
+    def _set_var_value(self, variable, value_to_set):
+            frame = InstructionUtils._frame(self, variable.frame)
 
-            if value_key not in frame and value_to_set is not None:
+            if frame[variable.slot] is UNDEFINED and value_to_set is not None:
                 raise NotExistingVariable(
-                    self, f"No variable {frame_type_key}@{value_key} in frame when calling instruction {self.code[self._pc][0]} in program counter: {self._pc}.")
+                    self, f"No variable {variable.frame}@{variable.name} in frame when calling instruction {self.code[self._pc][0]} in program counter: {self._pc}.")
             
-            frame[value_key] = value_to_set
+            frame[variable.slot] = value_to_set
+
+    # Methods for quickened instructions, they never raise exception
+    # Method that returns frame of given frame name or None if frame does not exist
+    def _quick_frame(self, frame_name):
+        if frame_name == "GF":
+            return self.FRAMES["GF"]
+        if frame_name == "LF":
+            local_frames = self.FRAMES["LF"]
+            return local_frames[-1] if local_frames else None
+        return self.FRAMES["TF"]
+
+    # Method that returns python type of value of operand if it is known before execution
+    # It is type of constant or the only type of initialized value of variable annotated by TypeInference
+    # (uninitialized variable is reported before its type is used)
+    @staticmethod
+    def _known_type(operand):
+        if operand.frame is None:
+            return type(operand.value)
+        types = getattr(operand, "types", None)
+        if types is not None:
+            types = types - {None}
+            if len(types) == 1:
+                return next(iter(types))
+        return None
+
+    # Method that returns value of symbol, UNDEFINED if frame or variable does not exist
+    # and None if variable is not initialized
+    def _quick_value(self, operand):
+        if operand.frame is None:
+            return operand.value
+        frame = InstructionUtils._quick_frame(self, operand.frame)
+        return UNDEFINED if frame is None else frame[operand.slot]
             
 
     # Method that will do _calculations for arithmetic, relational and logical instructions
@@ -272,24 +451,19 @@ class InstructionUtils(InterpretData):
     @_raise_again_err_decorator
     def _calculation(self, operation, valid_types, mode=""):
         if "not" == mode:
-            frame, var_name, frame_sym1, name_sym1 = InstructionUtils._parse_2sym(
-                self)
+            var, sym1 = InstructionUtils._parse_2sym(self)
         else:
-            frame, var_name, frame_sym1, name_sym1, frame_sym2, name_sym2 = InstructionUtils._parse_3sym(
-                self)
+            var, sym1, sym2 = InstructionUtils._parse_3sym(self)
 
-        first_value = InstructionUtils._get_sym_value(
-            self, frame_sym1 in self.FRAMES, frame_sym1, name_sym1)
+        first_value = InstructionUtils._get_sym_value(self, sym1)
         
         # Not have only one operand so we need to check if it is not
         if not "not" == mode:
-            second_value = InstructionUtils._get_sym_value(
-                self, frame_sym2 in self.FRAMES, frame_sym2, name_sym2)
+            second_value = InstructionUtils._get_sym_value(self, sym2)
         # If it is not then we need to check if operand type is bool
         else:
             if type(first_value) == bool:
-                InstructionUtils._set_var_value(
-                    self, frame, var_name, (not first_value))
+                InstructionUtils._set_var_value(self, var, (not first_value))
                 return 0
             else:
                 raise BadOperandTypes(
@@ -298,26 +472,68 @@ class InstructionUtils(InterpretData):
 
         if "eq" == mode and (type(first_value) == Nil.nil or type(second_value) == Nil.nil):
             ## Set variable to output of comparison
-            InstructionUtils._set_var_value(
-                self, frame, var_name, (first_value == second_value))
+            InstructionUtils._set_var_value(self, var, (first_value == second_value))
             
             return 0
 
-        if "div" == mode and second_value == 0:
-            BadOperandValue(
-                self, f"Division by zero in program counter: {self._pc}")
-
         for _type in valid_types:
             if type(first_value) == _type and type(second_value) == _type:
+                # Divisor is checked after types, so division of wrong types by zero is type error
+                if "div" == mode and second_value == 0:
+                    raise BadOperandValue(
+                        self, f"Division by zero in program counter: {self._pc}")
                 # Set variable to output of operation given as argument to this method
                 InstructionUtils._set_var_value(
-                    self, frame, var_name, operation(first_value, second_value))
+                    self, var, operation(first_value, second_value))
                 
                 return 0
 
         raise BadOperandTypes(
             self, f"Invalid operand types in program counter: {self._pc} on instruction {self.code[self._pc][0]}")
 
+    # Method that pops operands of stack instruction from data stack
+    # Returns list of values in order they were pushed (the last operand was on top), string buffers as python str
+    # Raises exception if data stack has less values than count
+    def _pop_operands(self, count):
+        data_stack = self._data_stack
+        if len(data_stack) < count:
+            raise MissingOperandValue(
+                self, f"Missing data when {self.code[self._pc][0]} in program counter: {self._pc}")
+        values = data_stack[-count:]
+        del data_stack[-count:]
+        return [value.text() if type(value) is sb.StringBuffer else value for value in values]
+
+    # Method that will do _calculations for stack variants of arithmetic, relational and logical instructions
+    # Arguments are same as in _calculation, operands are popped from data stack and result is pushed to it
+    # Values on data stack are always initialized, so only their count, types and values are checked
+    @_raise_again_err_decorator
+    def _stack_calculation(self, operation, valid_types, mode=""):
+        if "not" == mode:
+            first_value, = InstructionUtils._pop_operands(self, 1)
+            if type(first_value) != bool:
+                raise BadOperandTypes(
+                    self, f"Invalid operand type in program counter: {self._pc} on instruction {self.code[self._pc][0]}")
+            self._data_stack.append(not first_value)
+            return 0
+
+        first_value, second_value = InstructionUtils._pop_operands(self, 2)
+
+        if "eq" == mode and (type(first_value) == Nil.nil or type(second_value) == Nil.nil):
+            self._data_stack.append(first_value == second_value)
+            return 0
+
+        for _type in valid_types:
+            if type(first_value) == _type and type(second_value) == _type:
+                # Divisor is checked after types, so division of wrong types by zero is type error
+                if "div" == mode and second_value == 0:
+                    raise BadOperandValue(
+                        self, f"Division by zero in program counter: {self._pc}")
+                self._data_stack.append(operation(first_value, second_value))
+                return 0
+
+        raise BadOperandTypes(
+            self, f"Invalid operand types in program counter: {self._pc} on instruction {self.code[self._pc][0]}")
+
 # Class that have methods that implements three address code instructions
 class Instruction(InstructionUtils, InterpretData):
 
@@ -331,21 +547,20 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._return_err_code_decorator
     def _move(self):
         # Parse variable or constant
-        dest_frame, dest_var_name, src_frame, src_var_name = Instruction._parse_2sym(
-            self)
-        # Get value from second argument of MOVE
-        src_value = Instruction._get_sym_value(
-            self, src_frame in self.FRAMES, src_frame, src_var_name)
+        dest, src = Instruction._parse_2sym(self)
+        # Get value from second argument of MOVE (string buffer is copied as it is)
+        src_value = Instruction._get_sym_value(self, src, text=False)
         # Store value in variable in first argument of MOVE
-        Instruction._set_var_value(self, dest_frame, dest_var_name, src_value)
+        Instruction._set_var_value(self, dest, src_value)
         return 0
 
     # Method that implements instruction CREATEFRAME (create new temporary frame)
-    # Overwrites temporary frame if it already exists
+    # Overwrites temporary frame if it already exists (overwritten frame is reused)
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _create_frame(self):
-        self.FRAMES["TF"] = {}
+        self._free_frame(self.FRAMES["TF"])
+        self.FRAMES["TF"] = self._new_frame()
         return 0
 
     # Method that implements instruction PUSHFRAME (push temporary frame to local frames)
@@ -375,6 +590,8 @@ class Instruction(InstructionUtils, InterpretData):
             raise NotExistingFrame(
                 self, f"Missing frame in program counter: {self._pc} in instruction {self.code[self._pc][0]}")
         else:
+            # Overwritten temporary frame is reused
+            self._free_frame(self.FRAMES["TF"])
             self.FRAMES["TF"] = self.FRAMES["LF"].pop()
             return 0
 
@@ -384,23 +601,23 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _def_var(self):
-        frame, var_name = Instruction._parse_sym(self)
+        var = Instruction._parse_sym(self)
         # If variable is in given frame raise exception
-        if var_name in Instruction._top_frame(self, self.FRAMES[frame]):
+        if Instruction._frame(self, var.frame)[var.slot] is not UNDEFINED:
             raise RedefiningVariable(
-                self, f"Variable {frame}@{var_name} redefining on program counter {self._pc}.")
+                self, f"Variable {var.frame}@{var.name} redefining on program counter {self._pc}.")
         
-        Instruction._set_var_value(self, frame, var_name, None)
+        Instruction._set_var_value(self, var, None)
         return 0
 
     # Method that implements instruction CALL (call function)
     # Add to call stack current program counter and set program counter to pc of label in argument
-    # It is done by dict of labels
+    # It is done by list of jump targets resolved before run
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _call(self):
         self._call_stack.append(self._pc)
-        self._pc = self._labels[self.code[self._pc][1]]
+        self._pc = self._targets[self._pc]
         return 0
 
     # Method that implements instruction RETURN (return from function)
@@ -422,10 +639,9 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _pushs(self):
-        frame, var_name = Instruction._parse_sym(self)
-        # Get value from symbol
-        value = Instruction._get_sym_value(
-                    self, frame in self.FRAMES, frame, var_name)
+        sym = Instruction._parse_sym(self)
+        # Get value from symbol (string buffer is pushed as it is)
+        value = Instruction._get_sym_value(self, sym, text=False)
         # Push value to data stack
         self._data_stack.append(value)
         return 0
@@ -436,17 +652,75 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _pops(self):
-        frame, var_name = Instruction._parse_sym(self)
+        var = Instruction._parse_sym(self)
         # If data stack is empty raise exception
         if not self._data_stack:
             raise MissingOperandValue(
                     self, f"Missing data when POPS  in program counter: {self._pc}")
         
         else:
-            Instruction._set_var_value(
-                self, frame, var_name, self._data_stack.pop())
+            Instruction._set_var_value(self, var, self._data_stack.pop())
             return 0
 
+    # Method that implements instruction CLEARS (clear data stack)
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _clears(self):
+        self._data_stack.clear()
+        return 0
+
+    # Methods that implements stack variants of arithmetic, logical and relational instructions
+    # Calling method _stack_calculation with the same arguments as _calculation
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _adds(self):
+        return Instruction._stack_calculation(self, lambda x, y: x + y, [int])
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _subs(self):
+        return Instruction._stack_calculation(self, lambda x, y: x - y, [int])
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _muls(self):
+        return Instruction._stack_calculation(self, lambda x, y: x * y, [int])
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _idivs(self):
+        return Instruction._stack_calculation(self, lambda x, y: x // y, [int], "div")
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _lts(self):
+        return Instruction._stack_calculation(self, lambda x, y: x < y, [int, bool, str])
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _gts(self):
+        return Instruction._stack_calculation(self, lambda x, y: x > y, [int, bool, str])
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _eqs(self):
+        return Instruction._stack_calculation(self, lambda x, y: x == y, [int, bool, str, Nil.nil], "eq")
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _ands(self):
+        return Instruction._stack_calculation(self, lambda x, y: x and y, [bool])
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _ors(self):
+        return Instruction._stack_calculation(self, lambda x, y: x or y, [bool])
+
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _nots(self):
+        return Instruction._stack_calculation(self, lambda x, y: not x, [bool], "not")
+
     # Methods that implements arithmetic instructions, logical instructions and relational instructions
     # Calling method _calculation that implements all of them
     # It takes 3 arguments:
@@ -509,10 +783,9 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _int2char(self):
-        var_frame, var_name, sym_frame, sym_name = Instruction._parse_2sym(self)
+        var, sym = Instruction._parse_2sym(self)
         # Get value from symbol
-        value = Instruction._get_sym_value(
-            self, sym_frame in self.FRAMES, sym_frame, sym_name)
+        value = Instruction._get_sym_value(self, sym)
         
         # If value is not int raise exception
         if type(value) != int:
@@ -527,7 +800,7 @@ class Instruction(InstructionUtils, InterpretData):
         value = chr(value)
         
         # Set converted value to variable
-        Instruction._set_var_value(self, var_frame, var_name, value)
+        Instruction._set_var_value(self, var, value)
         return 0
 
     # Method that implements instruction STRI2INT (convert char to int)
@@ -538,15 +811,13 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _stri2int(self):
-        var_frame, var_name, sym1_frame, sym1_name, sym2_frame, sym2_name = Instruction._parse_3sym(self)
+        var, sym1, sym2 = Instruction._parse_3sym(self)
         # Get string from symbol
-        value = Instruction._get_sym_value(
-            self, sym1_frame in self.FRAMES, sym1_frame, sym1_name)
+        value = Instruction._get_sym_value(self, sym1, text=False)
         # Get index from symbol
-        index = Instruction._get_sym_value(
-            self, sym2_frame in self.FRAMES, sym2_frame, sym2_name)
+        index = Instruction._get_sym_value(self, sym2)
         # Type check
-        if type(value) != str:
+        if type(value) not in sb.STRING_TYPES:
             raise BadOperandTypes(
                 self, f"Invalid second operand type for str2int: {type(value)} on program counter {self._pc}.")
         
@@ -556,7 +827,7 @@ class Instruction(InstructionUtils, InterpretData):
 
         # Convert char to int
         if index < len(value) and index >= 0:
-            value = ord(value[index])
+            value = ord(sb.get_char(value, index))
         # If string is out of index raise exception
         else:
             raise StringError(
@@ -564,8 +835,49 @@ class Instruction(InstructionUtils, InterpretData):
 
 
 
-        Instruction._set_var_value(
-            self, var_frame, var_name, value)
+        Instruction._set_var_value(self, var, value)
+        return 0
+
+    # Method that implements instruction INT2CHARS (stack variant of INT2CHAR)
+    # Pops int from data stack and pushes converted char
+    # Raises exception if data stack is empty, value is not int or value is not in range of unicode table
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _int2chars(self):
+        value, = Instruction._pop_operands(self, 1)
+
+        if type(value) != int:
+            raise BadOperandTypes(
+                self, f"Invalid operand type for int2char: {type(value)} on program counter {self._pc}.\nOnly int is allowed.")
+        elif value < 0 or value > 0x10FFFF:
+            raise StringError(
+                self, f"Invalid value for int2char: {value} on program counter {self._pc}.\nOnly values from range 0-0x10FFFF are allowed.")
+
+        self._data_stack.append(chr(value))
+        return 0
+
+    # Method that implements instruction STRI2INTS (stack variant of STRI2INT)
+    # Pops index and string from data stack (index is on top) and pushes code of char on index
+    # Raises exception if data stack has less than two values, value is not string or index is not int
+    # Raises exception if string is out of index
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _stri2ints(self):
+        value, index = Instruction._pop_operands(self, 2)
+
+        if type(value) != str:
+            raise BadOperandTypes(
+                self, f"Invalid second operand type for str2int: {type(value)} on program counter {self._pc}.")
+
+        if type(index) != int:
+            raise BadOperandTypes(
+                self, f"Invalid third operand type for str2int: {type(index)} on program counter {self._pc}.")
+
+        if index >= len(value) or index < 0:
+            raise StringError(
+                self, f"Invalid index for str2int: {index} on program counter {self._pc}.")
+
+        self._data_stack.append(ord(value[index]))
         return 0
     
     # Method that implements instruction READ (read value from stdin or from file)
@@ -574,18 +886,12 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _read(self):
-        frame, var_name = Instruction._parse_sym(self)
-        try:
-            input_ = self._input_stream.readline()
-            if input_ == "":
-                value = Nil.nil(None)
-            else:
-                value = self.TYPES[self.code[self._pc][2]](input_.rstrip("\n").rstrip("\r"))
-
-        except ValueError:
-            value = Nil.nil(None)
+        var = Instruction._parse_sym(self)
+        if self._flush_before_read:
+            self.output.flush()
+        value = self._input_stream.read_value(self.code[self._pc][2], self.TYPES)
 
-        Instruction._set_var_value(self, frame, var_name, value)
+        Instruction._set_var_value(self, var, value)
         return 0
 
     # Method that implements instruction WRITE (write value to stdout or to file)
@@ -593,16 +899,15 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _write(self):
-        frame, var_name = InstructionUtils._parse_sym(self)
+        sym = InstructionUtils._parse_sym(self)
 
-        value = Instruction._get_sym_value(
-            self, frame in self.FRAMES, frame, var_name)
+        value = Instruction._get_sym_value(self, sym)
         
         if type(value) == bool:
-            print(InstructionUtils._from_bool(value), end="")
+            self.output.write(InstructionUtils._from_bool(value))
 
         else:
-            print(value, end="")
+            self.output.write(str(value))
         return 0
 
     # Method that implements instruction CONCAT (concatenate strings)
@@ -612,21 +917,19 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _concat(self):
-        var_frame, var_name, sym1_frame, sym1_name, sym2_frame, sym2_name = Instruction._parse_3sym(self)
+        var, sym1, sym2 = Instruction._parse_3sym(self)
 
-        value1 = Instruction._get_sym_value(
-            self, sym1_frame in self.FRAMES, sym1_frame, sym1_name)
+        value1 = Instruction._get_sym_value(self, sym1, text=False)
         
-        value2 = Instruction._get_sym_value(
-            self, sym2_frame in self.FRAMES, sym2_frame, sym2_name)
+        value2 = Instruction._get_sym_value(self, sym2, text=False)
         
-        if type(value1) != str or type(value2) != str:
+        if type(value1) not in sb.STRING_TYPES or type(value2) not in sb.STRING_TYPES:
             raise BadOperandTypes(
-                self, f"Invalid operand types for concat: {type(value1)} and {type(value2)} on program counter {self._pc}.")
-        # Concatenate strings
-        value = value1 + value2
+                self, f"Invalid operand types for concat: {type(sb.to_str(value1))} and {type(sb.to_str(value2))} on program counter {self._pc}.")
+        # Concatenate strings (long string is appended in place)
+        value = sb.concat(value1, value2)
 
-        Instruction._set_var_value(self, var_frame, var_name, value)
+        Instruction._set_var_value(self, var, value)
         return 0
 
     # Method that implements instruction STRLEN (get length of string)
@@ -636,18 +939,17 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _strlen(self):
-        var_frame, var_name, sym_frame, sym_name = Instruction._parse_2sym(self)
+        var, sym = Instruction._parse_2sym(self)
 
-        value = Instruction._get_sym_value(
-            self, sym_frame in self.FRAMES, sym_frame, sym_name)
+        value = Instruction._get_sym_value(self, sym, text=False)
         
-        if type(value) != str:
+        if type(value) not in sb.STRING_TYPES:
             raise BadOperandTypes(
                 self, f"Invalid operand type for strlen: {type(value)} on program counter {self._pc}.")
         
         value = len(value)
 
-        Instruction._set_var_value(self, var_frame, var_name, value)
+        Instruction._set_var_value(self, var, value)
         return 0
 
     # Method that implements instruction GETCHAR (get char from string)
@@ -658,23 +960,20 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _get_char(self):
-        var_frame, var_name, sym1_frame, sym1_name, sym2_frame, sym2_name = Instruction._parse_3sym(
-            self)
-        string = Instruction._get_sym_value(
-            self, sym1_frame in self.FRAMES, sym1_frame, sym1_name)
-        index = Instruction._get_sym_value(
-            self, sym2_frame in self.FRAMES, sym2_frame, sym2_name)
-        if type(string) != str or type(index) != int:
+        var, sym1, sym2 = Instruction._parse_3sym(self)
+        string = Instruction._get_sym_value(self, sym1, text=False)
+        index = Instruction._get_sym_value(self, sym2)
+        if type(string) not in sb.STRING_TYPES or type(index) != int:
             raise BadOperandTypes(
-                self, f"Invalid operand type for get_char: {type(string)} and {type(index)} on program counter {self._pc}.")
+                self, f"Invalid operand type for get_char: {type(sb.to_str(string))} and {type(index)} on program counter {self._pc}.")
         
         elif index >= len(string) or index < 0:
             raise StringError(
                 self, f"Invalid index for get_char: {index} on program counter {self._pc}.")
         
-        value = string[index]
+        value = sb.get_char(string, index)
 
-        Instruction._set_var_value(self, var_frame, var_name, value)
+        Instruction._set_var_value(self, var, value)
         return 0
 
     # Method that implements instruction SETCHAR (modify char in string)
@@ -686,20 +985,17 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _set_char(self):
-        var_frame, var_name, sym1_frame, sym1_name, sym2_frame, sym2_name = Instruction._parse_3sym(self)
+        var, sym1, sym2 = Instruction._parse_3sym(self)
         
-        string = Instruction._get_sym_value(
-            self, var_frame in self.FRAMES, var_frame, var_name)
+        string = Instruction._get_sym_value(self, var, text=False)
         
-        index = Instruction._get_sym_value(
-            self, sym1_frame in self.FRAMES, sym1_frame, sym1_name)
+        index = Instruction._get_sym_value(self, sym1)
         
-        value = Instruction._get_sym_value(
-            self, sym2_frame in self.FRAMES, sym2_frame, sym2_name)
+        value = Instruction._get_sym_value(self, sym2)
         
-        if type(string) != str or type(index) != int or type(value) != str:
+        if type(string) not in sb.STRING_TYPES or type(index) != int or type(value) != str:
             raise BadOperandTypes(
-                self, f"Invalid operand type for set_char: {type(string)}, {type(index)} and {type(value)} on program counter {self._pc}.\nShould be string, int and string.")
+                self, f"Invalid operand type for set_char: {type(sb.to_str(string))}, {type(index)} and {type(value)} on program counter {self._pc}.\nShould be string, int and string.")
         
         if index >= len(string) or index < 0:
             raise StringError(
@@ -708,10 +1004,10 @@ class Instruction(InstructionUtils, InterpretData):
         if value == "":
             raise StringError(
                 self, f"Invalid epmty string third argument in instruction {self.code[self._pc][0]} on program counter {self._pc}.")
-        # modify string
-        string = string[:index] + value[0] + string[index + 1:]
+        # modify string (long string is modified in place)
+        string = sb.set_char(string, index, value[0])
         # set modified string to variable
-        Instruction._set_var_value(self, var_frame, var_name, string)
+        Instruction._set_var_value(self, var, string)
         return 0
 
     # Method that implements instruction TYPE (get type of variable)
@@ -721,21 +1017,20 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _type(self):
-        var_frame, var_name, sym_frame, sym_name = Instruction._parse_2sym(self)
+        var, sym = Instruction._parse_2sym(self)
 
-        value = Instruction._get_sym_value(
-            self, sym_frame in self.FRAMES, sym_frame, sym_name, False)
+        value = Instruction._get_sym_value(self, sym, False, False)
         
         if value is None:
             type_ = ""
 
         else:
-            if isinstance(value, str):
+            if isinstance(value, sb.STRING_TYPES):
                 type_ = "string"
             else:
                 type_ = type(value).__name__
         
-        Instruction._set_var_value(self, var_frame, var_name, type_)
+        Instruction._set_var_value(self, var, type_)
         return 0
 
     # Method that implements instruction LABEL (set label)
@@ -750,7 +1045,7 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _jump(self):
-        self._pc = self._labels[self.code[self._pc][1]]
+        self._pc = self._targets[self._pc]
         return 0
 
     # Method that implements instruction JUMPIFEQ (jump to label if values equal)
@@ -760,19 +1055,17 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _jump_if_eq(self):
-        sym1_frame, sym1_name, sym2_frame, sym2_name = Instruction._parse_lab_2sym(self)
+        sym1, sym2 = Instruction._parse_lab_2sym(self)
 
-        value1 = Instruction._get_sym_value(
-            self, sym1_frame in self.FRAMES, sym1_frame, sym1_name)
+        value1 = Instruction._get_sym_value(self, sym1)
         
-        value2 = Instruction._get_sym_value(
-            self, sym2_frame in self.FRAMES, sym2_frame, sym2_name)
+        value2 = Instruction._get_sym_value(self, sym2)
         
         for type_ in [int, str, bool]:
             if (type(value1) == type_ and type(value2) == type_) or (type(value1) == Nil.nil or type(value2) == Nil.nil):
                 # if eq it set program counter to label
                 if value1 == value2:
-                    self._pc = self._labels[self.code[self._pc][1]]
+                    self._pc = self._targets[self._pc]
                 return 0
             
         raise BadOperandTypes(
@@ -784,34 +1077,59 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _jump_if_n_eq(self):
-        sym1_frame, sym1_name, sym2_frame, sym2_name = Instruction._parse_lab_2sym(self)
+        sym1, sym2 = Instruction._parse_lab_2sym(self)
 
-        value1 = Instruction._get_sym_value(
-            self, sym1_frame in self.FRAMES, sym1_frame, sym1_name)
+        value1 = Instruction._get_sym_value(self, sym1)
         
-        value2 = Instruction._get_sym_value(
-            self, sym2_frame in self.FRAMES, sym2_frame, sym2_name)
+        value2 = Instruction._get_sym_value(self, sym2)
         
         for type_ in [int, str, bool]:
             if (type(value1) == type_ and type(value2) == type_) or (type(value1) == Nil.nil or type(value2) == Nil.nil):
                 # if not eq it set program counter to label
                 if value1 != value2:
-                    self._pc = self._labels[self.code[self._pc][1]]
+                    self._pc = self._targets[self._pc]
                 return 0
             
         raise BadOperandTypes(
             self, f"Invalid operand types for jump_if_n_eq: {type(value1)} and {type(value2)} on program counter {self._pc}.")
 
+    # Method that implements stack variants of JUMPIFEQ and JUMPIFNEQ
+    # Pops two values from data stack and sets program counter to label if they are equal (not equal)
+    # Raises exception if data stack has less than two values or values are not same type (nil is ok)
+    def _stack_conditional_jump(self, jump_if_equal, name):
+        value1, value2 = Instruction._pop_operands(self, 2)
+        type1 = type(value1)
+        type2 = type(value2)
+
+        if (type1 == type2 and type1 in (int, str, bool)) or type1 == Nil.nil or type2 == Nil.nil:
+            if (value1 == value2) == jump_if_equal:
+                self._pc = self._targets[self._pc]
+            return 0
+
+        raise BadOperandTypes(
+            self, f"Invalid operand types for {name}: {type1} and {type2} on program counter {self._pc}.")
+
+    # Method that implements instruction JUMPIFEQS (jump to label if values on top of data stack equal)
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _jump_if_eqs(self):
+        return Instruction._stack_conditional_jump(self, True, "jump_if_eqs")
+
+    # Method that implements instruction JUMPIFNEQS (jump to label if values on top of data stack differ)
+    @InstructionUtils._instruction
+    @InstructionUtils._return_err_code_decorator
+    def _jump_if_n_eqs(self):
+        return Instruction._stack_conditional_jump(self, False, "jump_if_n_eqs")
+
     # Method that implements instruction EXIT (exit program)
     # Set exit code to value of symbol
     # Raises exception if value is not int or is not in range 0-49
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _exit(self):
-        sym_frame, sym_name = Instruction._parse_sym(self)
+        sym = Instruction._parse_sym(self)
 
-        value = Instruction._get_sym_value(
-            self, sym_frame in self.FRAMES, sym_frame, sym_name)
+        value = Instruction._get_sym_value(self, sym)
         
         if type(value) != int:
             raise BadOperandTypes(
@@ -828,10 +1146,9 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _d_print(self):
-        sym_frame, sym_name = Instruction._parse_sym(self)
+        sym = Instruction._parse_sym(self)
 
-        value = Instruction._get_sym_value(
-            self, sym_frame in self.FRAMES, sym_frame, sym_name)
+        value = Instruction._get_sym_value(self, sym)
         
         print(value, file=sys.stderr)
         return 0
@@ -841,19 +1158,7 @@ class Instruction(InstructionUtils, InterpretData):
     @InstructionUtils._instruction
     @InstructionUtils._return_err_code_decorator
     def _break(self):
-        print(
-            f"previous instruction: {self.code[self._pc-1] if len(self.code) > 1  else self.code[self._pc]}", file=sys.stderr)
-        print(f"current code: {self.code[self._pc]}", file=sys.stderr)
-        print(
-            f"current program counter (indexed from 0): {self._pc}", file=sys.stderr)
-        print(
-            f"instructions executed: {self._instruction_count}", file=sys.stderr)
-        print(f"global frame: {self.FRAMES['GF']}", file=sys.stderr)
-        print(f"temporary frame: {self.FRAMES['TF']}", file=sys.stderr)
-        print("(top of stack is at the bottom of the list)", file=sys.stderr)
-        print(f"local frames: {self.FRAMES['LF']}", file=sys.stderr)
-        print(f"call stack: {self._call_stack}", file=sys.stderr)
-        print(f"data stack: {self._data_stack}", file=sys.stderr)
+        self._print_state()
         return 0
 
     # Most important part. The dictionary that maps instruction names to their methods
@@ -861,6 +1166,174 @@ class Instruction(InstructionUtils, InterpretData):
                     for (method_name, method) in locals().items()
                     if InstructionUtils._is_instruction(method)}
 
+    # Method that implements superinstruction made by PeepholeOptimizer
+    # It executes instruction on program counter and the next instruction with one dispatch
+    # The next instruction is never target of jump, so it is executed only here
+    # Both instructions are counted and report errors on their own program counters
+    # Both instructions are executed by their (possibly quickened) methods
+    def _superinstruction(self):
+        err_code = self._handlers[self._pc](self)
+        if err_code != 0:
+            return err_code
+        self._instruction_count += 1
+        self._pc += 1
+        return self._handlers[self._pc](self)
+
+    # The dictionary that maps names of superinstructions to their methods
+    SUPERINSTRUCTIONS = {"PUSHS_POPS": _superinstruction, "COMPARE_JUMP": _superinstruction,
+                         "INCREMENT_JUMP": _superinstruction, "MOVE_MOVE": _superinstruction}
+
+    # Quickening of instruction sites
+    # Arithmetic, relational and conditional jump instructions start as _quicken. On the first execution
+    # it looks at types of operands, replaces itself on its program counter by method specialized for them
+    # and executes generic instruction. Specialized method checks types by one cheap test, if they differ
+    # (or operand is not defined or initialized, or divisor is zero) it replaces itself by generic instruction
+    # for good and executes it, so all errors are reported by generic instructions same as without quickening
+
+    # Method that replaces method on program counter (superinstruction stays in dispatch table)
+    def _install(self, pc, method):
+        self._handlers[pc] = method
+        if getattr(self.code[pc], "fused", None) is None:
+            self._dispatch[pc] = method
+
+    def _quicken(self):
+        instruction = self.code[self._pc]
+        first = Instruction._quick_value(self, instruction[2])
+        second = Instruction._quick_value(self, instruction[3])
+        generic = self.INSTRUCTIONS[instruction[0]]
+        quick = None
+        if type(first) is type(second):
+            quick = self.QUICKENED.get((instruction[0], type(first)))
+        Instruction._install(self, self._pc, generic if quick is None else quick)
+        return generic(self)
+
+    # Method that replaces specialized method on program counter by generic instruction and executes it
+    def _despecialize(self):
+        generic = self.INSTRUCTIONS[self.code[self._pc][0]]
+        Instruction._install(self, self._pc, generic)
+        return generic(self)
+
+    # Method that returns method of arithmetic or relational instruction specialized for operands of type_
+    # Division checks divisor, zero is reported by generic instruction
+    @staticmethod
+    def _quick_calculation(operation, type_, division=False):
+        def quick(self):
+            instruction = self.code[self._pc]
+            first = Instruction._quick_value(self, instruction[2])
+            second = Instruction._quick_value(self, instruction[3])
+            if type(first) is type_ and type(second) is type_ and not (division and second == 0):
+                variable = instruction[1]
+                frame = Instruction._quick_frame(self, variable.frame)
+                if frame is not None and frame[variable.slot] is not UNDEFINED:
+                    frame[variable.slot] = operation(first, second)
+                    return 0
+            return Instruction._despecialize(self)
+        return quick
+
+    # Method that returns method of conditional jump specialized for operands of type_
+    @staticmethod
+    def _quick_jump(type_, jump_if_equal):
+        def quick(self):
+            instruction = self.code[self._pc]
+            first = Instruction._quick_value(self, instruction[2])
+            second = Instruction._quick_value(self, instruction[3])
+            if type(first) is type_ and type(second) is type_:
+                if (first == second) == jump_if_equal:
+                    self._pc = self._targets[self._pc]
+                return 0
+            return Instruction._despecialize(self)
+        return quick
+
+    # Specialized methods of instructions by name of instruction and type of both operands
+    QUICKENED = {}
+    for _type in (int,):
+        QUICKENED["ADD", _type] = _quick_calculation(operator.add, _type)
+        QUICKENED["SUB", _type] = _quick_calculation(operator.sub, _type)
+        QUICKENED["MUL", _type] = _quick_calculation(operator.mul, _type)
+        QUICKENED["IDIV", _type] = _quick_calculation(operator.floordiv, _type, True)
+    for _type in (int, str, bool):
+        QUICKENED["LT", _type] = _quick_calculation(operator.lt, _type)
+        QUICKENED["GT", _type] = _quick_calculation(operator.gt, _type)
+        QUICKENED["EQ", _type] = _quick_calculation(operator.eq, _type)
+        QUICKENED["JUMPIFEQ", _type] = _quick_jump(_type, True)
+        QUICKENED["JUMPIFNEQ", _type] = _quick_jump(_type, False)
+    for _type in (bool,):
+        QUICKENED["AND", _type] = _quick_calculation(lambda x, y: x and y, _type)
+        QUICKENED["OR", _type] = _quick_calculation(lambda x, y: x or y, _type)
+    del _type
+
+    # Names of instructions that are quickened
+    QUICKENED_INSTRUCTIONS = frozenset(name for name, _ in QUICKENED)
+
+    # Memoization of calls of pure functions (only if call_cache is set, see Memoization)
+    # CALL of pure function looks up its key in cache, hit replaces consumed values of data stack by produced
+    # values, sets temporary frame and counts instructions of the call without jumping to function
+    # Miss is executed normally and its RETURN (on the same depth of call stack) stores result to cache
+
+    def _memo_call(self):
+        cache = self.call_cache
+        summary = cache.sites[self._pc]
+        frame = self.FRAMES["TF"]
+        key = None if summary is None else cache.key(summary, self._data_stack, frame)
+        if key is None:
+            return self.INSTRUCTIONS["CALL"](self)
+        result = cache.get(summary, key)
+        if result is None:
+            base = len(self._data_stack) - summary.consumed
+            self._memo_calls.append((len(self._call_stack) + 1, summary, key, base, self._instruction_count))
+            return self.INSTRUCTIONS["CALL"](self)
+        produced, replaced, values, count = result
+        self._data_stack[len(self._data_stack) - summary.consumed:] = produced
+        if replaced:
+            # Function created new temporary frame, frame of caller was dropped by CREATEFRAME
+            self._free_frame(frame)
+            frame = None if values is None else self._new_frame()
+            self.FRAMES["TF"] = frame
+        if values is not None:
+            frame[:] = values
+        self._instruction_count += count
+        return 0
+
+    def _memo_return(self):
+        calls = self._memo_calls
+        if calls and calls[-1][0] == len(self._call_stack):
+            _, summary, key, base, start = calls.pop()
+            frame = self.FRAMES["TF"]
+            # Replacement of frame is known from analysis, new frame can be reused list of frame of caller
+            replaced = summary.replaces_frame
+            # Frame of caller is stored only if function uses it (it is part of key then)
+            values = None if frame is None or not (replaced or summary.uses_frame) else tuple(frame)
+            self.call_cache.put(key, (tuple(self._data_stack[base:]), replaced, values,
+                                      self._instruction_count - start))
+        return self.INSTRUCTIONS["RETURN"](self)
+
+    # Method that builds dispatch table (methods on program counters executed by main loop)
+    # and table of methods of single instructions (used by superinstructions)
+    # Unknown instruction has None, it raises KeyError when it is executed
+    def _dispatch_table(self):
+        self._handlers = []
+        self._dispatch = []
+        for instruction in self.code:
+            if instruction[0] in self.QUICKENED_INSTRUCTIONS:
+                # Site with types of operands known by TypeInference is specialized before execution
+                known_type = Instruction._known_type(instruction[2])
+                method = None
+                if known_type is not None and known_type is Instruction._known_type(instruction[3]):
+                    method = self.QUICKENED.get((instruction[0], known_type))
+                if method is None:
+                    method = Instruction._quicken
+            else:
+                method = self.INSTRUCTIONS.get(instruction[0])
+            self._handlers.append(method)
+            fused = getattr(instruction, "fused", None)
+            self._dispatch.append(method if fused is None else self.SUPERINSTRUCTIONS[fused])
+        if self.call_cache is not None:
+            for pc, instruction in enumerate(self.code):
+                if instruction[0] in ("CALL", "RETURN"):
+                    Instruction._install(self, pc, Instruction._memo_call if instruction[0] == "CALL"
+                                         else Instruction._memo_return)
+        return self._dispatch
+
 # Class that interprets the code
 class TACInterpret(Instruction, InterpretData):
 
@@ -891,6 +1364,20 @@ class TACInterpret(Instruction, InterpretData):
         if not self.code:
             return 0
         lenght = len(self.code)
+        # Output is written even if program ends with EXIT or error
+        try:
+            return self._run(lenght)
+        finally:
+            self.output.finish()
+
+    # Main loop of interpret
+    def _run(self, lenght):
+        self._resolve_jumps()
+        # Profiled program runs in separate loop, so this loop does not measure anything
+        if self.profiler is not None:
+            return self._run_profiled(lenght)
+        dispatch = self._dispatch_table()
+        following = self._following
         # Run the program
         while self._pc < lenght:
             # self.INSTRUCTIONS is a dictionary that maps instruction names to their methods
@@ -900,14 +1387,38 @@ class TACInterpret(Instruction, InterpretData):
             # argument 1: self.code[self._pc][1]
             # argument 2: self.code[self._pc][2]
             # argument 3: self.code[self._pc][3]
-            # Run Method that implements the instruction by name
-            err_code = self.INSTRUCTIONS[self.code[self._pc][0]](self)
+            # Run Method that implements the instruction (looked up by name before the loop)
+            method = dispatch[self._pc]
+            if method is None:
+                method = self.INSTRUCTIONS[self.code[self._pc][0]]
+            err_code = method(self)
             # If there was an error, return the error code or if the instruction was EXIT, return the exit code
             if err_code != 0 or self.code[self._pc][0] == "EXIT":
                 return err_code
             # Increment the instruction count
             self._instruction_count += 1
-            # Increment the program counter
-            self._pc += 1
+            # Move the program counter to the next executed instruction (LABEL is skipped)
+            self._pc = following[self._pc]
         # If the program ended normally, return 0
-        return 0
\ No newline at end of file
+        return 0
+
+    # Main loop of interpret with profiler
+    # Every instruction is executed on its own (superinstruction is executed as its first instruction)
+    # and its count and time are added on its program counter
+    def _run_profiled(self, lenght):
+        counts = self.profiler.counts
+        times = self.profiler.times
+        clock = time.perf_counter
+        following = self._following
+        while self._pc < lenght:
+            pc = self._pc
+            method = self.INSTRUCTIONS[self.code[pc][0]]
+            start = clock()
+            err_code = method(self)
+            times[pc] += clock() - start
+            counts[pc] += 1
+            if err_code != 0 or self.code[self._pc][0] == "EXIT":
+                return err_code
+            self._instruction_count += 1
+            self._pc = following[self._pc]
+        return 0
@@ -0,0 +1,538 @@
+import sys
+from . import Nil
+from . import StringBuffer as sb
+from .Decoder import Variable
+from .TypeInference import TYPE_RULES
+from .TacInterpret import TACInterpret, Instruction, Undefined, UNDEFINED
+
+# Instruction of trace that cannot be compiled (for example comparison of string buffer)
+class UntraceableInstruction(Exception):
+    pass
+
+
+# Marker of known type of variable that is initialized, but its type is not known
+INITIALIZED = "initialized"
+
+
+# Class that compiles trace of one iteration of hot loop into python function
+# Trace is list of steps (program counter, python types of read operands, True if jump was taken)
+# recorded by TracingInterpret, the first step is on header of loop and the last one jumps back to it
+# Generated function trace(this) runs the iterations in python while loop and returns
+# (program counter, number of executed instructions, expected) when some guard fails, the instruction on returned
+# program counter is not executed yet, so the interpreter executes it and reports errors, BREAK and EXIT itself
+# expected is False if types or data stack differ from the recorded ones (trace should be recorded again)
+# Function returns None without executing anything if frames or types differ from the recorded ones
+# Guards:
+#   existence of frames and variables is checked once before the loop (only CALL, DEFVAR and frame
+#   instructions change it and they are not traced)
+#   types and initialization of read variables are checked before every instruction, checks of
+#   variables whose types are the same after every iteration are moved before the loop
+#   values (divisor, index, char code, empty data stack) and directions of conditional jumps
+class TraceCompiler:
+
+    __slots__ = ("code", "steps", "_lines", "_known", "_required", "_stack", "_exit", "_uses")
+
+    # Indexes of read operands of instructions that can be traced
+    READS = {"MOVE": (2,), "PUSHS": (1,), "POPS": (), "WRITE": (1,), "LABEL": (), "JUMP": (),
+             "ADD": (2, 3), "SUB": (2, 3), "MUL": (2, 3), "IDIV": (2, 3), "LT": (2, 3), "GT": (2, 3),
+             "EQ": (2, 3), "AND": (2, 3), "OR": (2, 3), "NOT": (2,), "INT2CHAR": (2,), "STRI2INT": (2, 3),
+             "CONCAT": (2, 3), "STRLEN": (2,), "GETCHAR": (2, 3), "SETCHAR": (1, 2, 3),
+             "JUMPIFEQ": (2, 3), "JUMPIFNEQ": (2, 3)}
+    # Numbers of operands popped from data stack by stack instructions that can be traced
+    STACK_READS = {"CLEARS": 0, "ADDS": 2, "SUBS": 2, "MULS": 2, "IDIVS": 2, "LTS": 2, "GTS": 2, "EQS": 2,
+                   "ANDS": 2, "ORS": 2, "NOTS": 1, "INT2CHARS": 1, "STRI2INTS": 2, "JUMPIFEQS": 2, "JUMPIFNEQS": 2}
+    # Python expressions of types checked by guards
+    TYPE_NAMES = {int: "int", bool: "bool", str: "str", Nil.nil: "NIL_TYPE", sb.StringBuffer: "StringBuffer"}
+    # Local names of frames in generated function
+    FRAME_NAMES = {"GF": "gf", "LF": "lf", "TF": "tf"}
+    # Python operators of arithmetic, relational and logical instructions
+    OPERATORS = {"ADD": "+", "SUB": "-", "MUL": "*", "IDIV": "//", "LT": "<", "GT": ">", "EQ": "==",
+                 "AND": "and", "OR": "or"}
+
+    def __init__(self, code: list, steps: list):
+        self.code = code
+        self.steps = steps
+        self._lines = []
+        # Known types of variables in current point of iteration (key of variable -> type or INITIALIZED)
+        self._known = {}
+        # Types of variables read before they are written in iteration (candidates for checks before loop)
+        self._required = {}
+        # Known types of values pushed to data stack in current iteration (top is the last one)
+        self._stack = []
+        # Program counter and position in iteration of current step (returned by failed guard)
+        self._exit = (0, 0)
+        # Names of objects used by generated code ("stack", "write")
+        self._uses = set()
+
+    # Method that returns python source of function trace or None if trace cannot be compiled
+    def translate(self):
+        try:
+            self._body({})
+            entry = dict(self._required)
+            # Checks before loop are valid only if the iteration keeps them true
+            while True:
+                end = self._body(entry)
+                kept = {key: kind for key, kind in entry.items()
+                        if end.get(key) is kind or (kind is INITIALIZED and key in end)}
+                if kept == entry:
+                    break
+                entry = kept
+        except UntraceableInstruction:
+            return None
+
+        source = ["def trace(this):", "    frames = this.FRAMES"]
+        keys = self._variables()
+        frames = {key[0] for key in keys}
+        if "GF" in frames:
+            source.append("    gf = frames['GF']")
+        if "LF" in frames:
+            source.extend(("    lf = frames['LF']", "    if not lf:", "        return None", "    lf = lf[-1]"))
+        if "TF" in frames:
+            source.extend(("    tf = frames['TF']", "    if tf is None:", "        return None"))
+        checks = [f"{TraceCompiler._slot(key)} is UNDEFINED" for key in keys]
+        for key, kind in entry.items():
+            if kind is INITIALIZED:
+                checks.append(f"{TraceCompiler._slot(key)} is None")
+            else:
+                checks.append(f"type({TraceCompiler._slot(key)}) is not {self.TYPE_NAMES[kind]}")
+        if checks:
+            source.extend(("    if " + " or ".join(checks) + ":", "        return None"))
+        if "stack" in self._uses:
+            source.append("    stack = this._data_stack")
+        if "write" in self._uses:
+            source.append("    write = this.output.write")
+        source.extend(("    count = 0", "    while True:"))
+        source.extend("        " + line for line in self._lines)
+        source.append(f"        count += {len(self.steps)}")
+        return "\n".join(source) + "\n"
+
+    # Method that generates body of loop with known types on start of iteration
+    # Returns known types on end of iteration
+    def _body(self, entry):
+        self._lines = []
+        self._known = dict(entry)
+        self._required = {}
+        self._stack = []
+        for offset, (pc, types, taken) in enumerate(self.steps):
+            instruction = self.code[pc]
+            self._lines.append(f"# {pc}: {instruction[0]}")
+            self._exit = (pc, offset)
+            self.TRANSLATORS[instruction[0]](self, instruction, types, taken)
+        return self._known
+
+    # Method that returns sorted keys of all variables used by trace
+    def _variables(self):
+        keys = set()
+        for pc, _, _ in self.steps:
+            for operand in self.code[pc][1:]:
+                if isinstance(operand, Variable):
+                    keys.add((operand.frame, operand.slot))
+        return sorted(keys)
+
+    # Helper methods for generating code
+
+    @staticmethod
+    def _key(variable):
+        return variable.frame, variable.slot
+
+    @staticmethod
+    def _slot(key):
+        return f"{TraceCompiler.FRAME_NAMES[key[0]]}[{key[1]}]"
+
+    # Method that returns python expression of value of operand
+    @staticmethod
+    def _value(operand):
+        if operand.frame is None:
+            return "NIL" if operand.type == "nil" else repr(operand.value)
+        return TraceCompiler._slot(TraceCompiler._key(operand))
+
+    # Method that emits guard, failed guard leaves trace before the current instruction
+    # expected is False for guards of types and data stack that hold in recorded iteration
+    def _guard(self, condition, expected=True):
+        pc, offset = self._exit
+        self._lines.append(f"if {condition}:")
+        self._lines.append(f"    return {pc}, count + {offset}, {expected}")
+
+    # Method that emits check of initialization of variable (constant is always initialized)
+    def _initialized(self, operand):
+        if operand.frame is None:
+            return
+        key = TraceCompiler._key(operand)
+        if key in self._known:
+            return
+        self._required.setdefault(key, INITIALIZED)
+        self._guard(f"{self._value(operand)} is None", False)
+        self._known[key] = INITIALIZED
+
+    # Method that emits check of type of operand (it also checks initialization)
+    def _check_type(self, operand, type_):
+        if operand.frame is None:
+            if type(operand.value) is not type_:
+                raise UntraceableInstruction(operand.raw)
+            return
+        key = TraceCompiler._key(operand)
+        if self._known.get(key) is type_:
+            return
+        if key not in self._known:
+            self._required.setdefault(key, type_)
+        self._guard(f"type({self._value(operand)}) is not {self.TYPE_NAMES[type_]}", False)
+        self._known[key] = type_
+
+    # Method that returns known type of initialized operand
+    def _type_of(self, operand):
+        if operand.frame is None:
+            return type(operand.value)
+        return self._known.get(TraceCompiler._key(operand), INITIALIZED)
+
+    # Method that emits store of python expression to variable with result of given type
+    def _assign(self, variable, expression, type_):
+        key = TraceCompiler._key(variable)
+        self._lines.append(f"{TraceCompiler._slot(key)} = {expression}")
+        self._known[key] = type_
+
+    # Method that checks that recorded types pass type check of instruction
+    # String buffer is accepted only by string instructions
+    @staticmethod
+    def _valid(opcode, types, buffers=False):
+        if buffers:
+            types = tuple(str if type_ is sb.StringBuffer else type_ for type_ in types)
+        if types not in TYPE_RULES[opcode][1]:
+            raise UntraceableInstruction(opcode)
+
+    # Methods that generate code of instructions
+    # Arguments are instruction, recorded types of read operands and True if jump was taken
+
+    def _move(self, instruction, types, taken):
+        self._initialized(instruction[2])
+        self._assign(instruction[1], self._value(instruction[2]), self._type_of(instruction[2]))
+
+    def _pushs(self, instruction, types, taken):
+        self._initialized(instruction[1])
+        self._uses.add("stack")
+        self._lines.append(f"stack.append({self._value(instruction[1])})")
+        self._stack.append(self._type_of(instruction[1]))
+
+    def _pops(self, instruction, types, taken):
+        self._uses.add("stack")
+        if self._stack:
+            type_ = self._stack.pop()
+        else:
+            self._guard("not stack", False)
+            type_ = INITIALIZED
+        self._assign(instruction[1], "stack.pop()", type_)
+
+    def _write(self, instruction, types, taken):
+        operand = instruction[1]
+        type_ = types[0]
+        if type_ not in self.TYPE_NAMES:
+            raise UntraceableInstruction("WRITE")
+        self._check_type(operand, type_)
+        self._uses.add("write")
+        value = self._value(operand)
+        if type_ is bool:
+            self._lines.append(f"write('true' if {value} else 'false')")
+        elif type_ is sb.StringBuffer:
+            self._lines.append(f"write({value}.text())")
+        elif type_ is str:
+            self._lines.append(f"write({value})")
+        else:
+            self._lines.append(f"write(str({value}))")
+
+    def _label(self, instruction, types, taken):
+        pass
+
+    def _calculation(self, instruction, types, taken):
+        opcode = instruction[0]
+        TraceCompiler._valid(opcode, types)
+        first, second = instruction[2], instruction[3]
+        self._check_type(first, types[0])
+        self._check_type(second, types[1])
+        if opcode == "IDIV":
+            if second.frame is None:
+                if second.value == 0:
+                    raise UntraceableInstruction(opcode)
+            else:
+                self._guard(f"{self._value(second)} == 0")
+        result = int if opcode in ("ADD", "SUB", "MUL", "IDIV") else bool
+        self._assign(instruction[1], f"{self._value(first)} {self.OPERATORS[opcode]} {self._value(second)}", result)
+
+    def _not(self, instruction, types, taken):
+        TraceCompiler._valid("NOT", types)
+        self._check_type(instruction[2], bool)
+        self._assign(instruction[1], f"not {self._value(instruction[2])}", bool)
+
+    def _int2char(self, instruction, types, taken):
+        TraceCompiler._valid("INT2CHAR", types)
+        self._check_type(instruction[2], int)
+        value = self._value(instruction[2])
+        self._guard(f"not 0 <= {value} <= 0x10FFFF")
+        self._assign(instruction[1], f"chr({value})", str)
+
+    # Method that emits checks of string and index and returns python expression of char on index
+    def _char(self, instruction, types):
+        TraceCompiler._valid(instruction[0], types, True)
+        self._check_type(instruction[2], types[0])
+        self._check_type(instruction[3], int)
+        string, index = self._value(instruction[2]), self._value(instruction[3])
+        self._guard(f"not 0 <= {index} < len({string})")
+        if types[0] is sb.StringBuffer:
+            return f"{string}.char({index})"
+        return f"{string}[{index}]"
+
+    def _stri2int(self, instruction, types, taken):
+        self._assign(instruction[1], f"ord({self._char(instruction, types)})", int)
+
+    def _get_char(self, instruction, types, taken):
+        self._assign(instruction[1], self._char(instruction, types), str)
+
+    def _set_char(self, instruction, types, taken):
+        TraceCompiler._valid("SETCHAR", types, True)
+        if types[2] is not str:
+            raise UntraceableInstruction("SETCHAR")
+        variable, index, char = instruction[1], instruction[2], instruction[3]
+        self._check_type(variable, types[0])
+        self._check_type(index, int)
+        self._check_type(char, str)
+        string = self._value(variable)
+        self._guard(f"not 0 <= {self._value(index)} < len({string})")
+        if char.frame is None:
+            if char.value == "":
+                raise UntraceableInstruction("SETCHAR")
+            char = repr(char.value[0])
+        else:
+            self._guard(f"{self._value(char)} == ''")
+            char = f"{self._value(char)}[0]"
+        self._assign(variable, f"set_char({string}, {self._value(index)}, {char})", INITIALIZED)
+
+    def _concat(self, instruction, types, taken):
+        TraceCompiler._valid("CONCAT", types, True)
+        self._check_type(instruction[2], types[0])
+        self._check_type(instruction[3], types[1])
+        # Long result is string buffer, so its type is not known
+        self._assign(instruction[1], f"concat({self._value(instruction[2])}, {self._value(instruction[3])})",
+                     INITIALIZED)
+
+    def _strlen(self, instruction, types, taken):
+        TraceCompiler._valid("STRLEN", types, True)
+        self._check_type(instruction[2], types[0])
+        self._assign(instruction[1], f"len({self._value(instruction[2])})", int)
+
+    # Conditional jump continues in trace only in recorded direction
+    # Failed guard returns before the jump, so the interpreter executes it again
+    def _conditional_jump(self, instruction, types, taken):
+        opcode = instruction[0]
+        TraceCompiler._valid(opcode, types)
+        self._check_type(instruction[2], types[0])
+        self._check_type(instruction[3], types[1])
+        operator = "==" if opcode == "JUMPIFEQ" else "!="
+        condition = f"{self._value(instruction[2])} {operator} {self._value(instruction[3])}"
+        self._guard(f"not ({condition})" if taken else condition)
+
+    # Method that emits checks of count and types of values on top of data stack
+    # Checks of values pushed in the same iteration with known types are not emitted
+    # Returns python expressions of values (the last one is on top)
+    def _stack_operands(self, opcode, types):
+        TraceCompiler._valid(opcode[:-1], types)
+        self._uses.add("stack")
+        count = len(types)
+        if len(self._stack) < count:
+            self._guard(f"len(stack) < {count}", False)
+        values = []
+        for position, type_ in enumerate(types):
+            depth = count - position
+            value = f"stack[-{depth}]"
+            if depth > len(self._stack) or self._stack[-depth] is not type_:
+                self._guard(f"type({value}) is not {self.TYPE_NAMES[type_]}", False)
+            values.append(value)
+        del self._stack[max(0, len(self._stack) - count):]
+        return values
+
+    def _clears(self, instruction, types, taken):
+        self._uses.add("stack")
+        self._lines.append("stack.clear()")
+        self._stack = []
+
+    def _stack_calculation(self, instruction, types, taken):
+        opcode = instruction[0]
+        first, second = self._stack_operands(opcode, types)
+        if opcode == "IDIVS":
+            self._guard(f"{second} == 0")
+        self._lines.append("_second = stack.pop()")
+        self._lines.append(f"stack[-1] = stack[-1] {self.OPERATORS[opcode[:-1]]} _second")
+        self._stack.append(int if opcode in ("ADDS", "SUBS", "MULS", "IDIVS") else bool)
+
+    def _nots(self, instruction, types, taken):
+        self._stack_operands("NOTS", types)
+        self._lines.append("stack[-1] = not stack[-1]")
+        self._stack.append(bool)
+
+    def _int2chars(self, instruction, types, taken):
+        value, = self._stack_operands("INT2CHARS", types)
+        self._guard(f"not 0 <= {value} <= 0x10FFFF")
+        self._lines.append("stack[-1] = chr(stack[-1])")
+        self._stack.append(str)
+
+    def _stri2ints(self, instruction, types, taken):
+        string, index = self._stack_operands("STRI2INTS", types)
+        self._guard(f"not 0 <= {index} < len({string})")
+        self._lines.append("_second = stack.pop()")
+        self._lines.append("stack[-1] = ord(stack[-1][_second])")
+        self._stack.append(int)
+
+    def _stack_conditional_jump(self, instruction, types, taken):
+        opcode = instruction[0]
+        first, second = self._stack_operands(opcode, types)
+        operator = "==" if opcode == "JUMPIFEQS" else "!="
+        condition = f"{first} {operator} {second}"
+        self._guard(f"not ({condition})" if taken else condition)
+        self._lines.append("del stack[-2:]")
+
+    TRANSLATORS = {"MOVE": _move, "PUSHS": _pushs, "POPS": _pops, "WRITE": _write, "LABEL": _label,
+                   "JUMP": _label, "ADD": _calculation, "SUB": _calculation, "MUL": _calculation,
+                   "IDIV": _calculation, "LT": _calculation, "GT": _calculation, "EQ": _calculation,
+                   "AND": _calculation, "OR": _calculation, "NOT": _not, "INT2CHAR": _int2char,
+                   "STRI2INT": _stri2int, "GETCHAR": _get_char, "CONCAT": _concat, "STRLEN": _strlen,
+                   "SETCHAR": _set_char, "JUMPIFEQ": _conditional_jump, "JUMPIFNEQ": _conditional_jump,
+                   "CLEARS": _clears, "ADDS": _stack_calculation, "SUBS": _stack_calculation,
+                   "MULS": _stack_calculation, "IDIVS": _stack_calculation, "LTS": _stack_calculation,
+                   "GTS": _stack_calculation, "EQS": _stack_calculation, "ANDS": _stack_calculation,
+                   "ORS": _stack_calculation, "NOTS": _nots, "INT2CHARS": _int2chars, "STRI2INTS": _stri2ints,
+                   "JUMPIFEQS": _stack_conditional_jump, "JUMPIFNEQS": _stack_conditional_jump}
+
+
+# Class that interprets the code same as TACInterpret with tracing of hot loops (engine jit)
+# Main loop counts backward jumps by program counter they continue on (header of loop)
+# When header is reached HOT_LOOP times, one iteration is executed by recording loop that saves
+# types of operands and directions of jumps, the trace is compiled by TraceCompiler and the next
+# backward jumps to header run the compiled function instead of instructions
+# Recording is stopped by instruction that cannot be traced (CALL, READ, EXIT, BREAK, ...), header
+# of other compiled loop or too long trace, such loop is never recorded again
+# Compiled function returns to the interpreter before the instruction that failed its guard with
+# frames, stacks and instruction count same as after executing the previous instruction
+# Profiled program is not traced (same loop as in TACInterpret)
+class TracingInterpret(TACInterpret):
+
+    __slots__ = ("_traces", "_counters", "_failures", "_recordings")
+
+    # Number of backward jumps to header before its loop is recorded
+    HOT_LOOP = 50
+    # Maximal number of instructions in trace
+    MAX_TRACE_LENGTH = 200
+    # Number of calls of trace that leave it on unexpected guard before trace is dropped and loop is recorded again
+    MAX_FAILURES = 16
+    # Maximal number of recordings of one loop
+    MAX_RECORDINGS = 4
+
+    def __init__(self, code: list = None, labels: dict = None, input_stream=sys.stdin, force_exit=False):
+        TACInterpret.__init__(self, code, labels, input_stream, force_exit)
+        # Compiled traces by program counter of header
+        self._traces = {}
+        # Numbers of backward jumps, failed calls of traces and recordings by program counter of header
+        self._counters = {}
+        self._failures = {}
+        self._recordings = {}
+
+    def _reset(self, force_exit=False):
+        self._traces = {}
+        self._counters = {}
+        self._failures = {}
+        self._recordings = {}
+        super()._reset(force_exit)
+
+    # Main loop of interpret
+    def _run(self, lenght):
+        self._resolve_jumps()
+        if self.profiler is not None:
+            return self._run_profiled(lenght)
+        dispatch = self._dispatch_table()
+        following = self._following
+        code = self.code
+        while self._pc < lenght:
+            pc = self._pc
+            method = dispatch[pc]
+            if method is None:
+                method = self.INSTRUCTIONS[code[pc][0]]
+            err_code = method(self)
+            if err_code != 0 or code[self._pc][0] == "EXIT":
+                return err_code
+            self._instruction_count += 1
+            self._pc = following[self._pc]
+            # Backward jump (or RETURN) continues on header of loop
+            if self._pc <= pc:
+                err_code = self._enter_loop(lenght)
+                if err_code is not None:
+                    return err_code
+        return 0
+
+    # Method that runs compiled trace of loop on program counter or counts the loop and records it when it is hot
+    # Returns error code of instruction that failed while recording, otherwise None
+    def _enter_loop(self, lenght):
+        header = self._pc
+        trace = self._traces.get(header)
+        if trace is None:
+            count = self._counters[header] = self._counters.get(header, 0) + 1
+            if count == self.HOT_LOOP:
+                return self._record(header, lenght)
+            return None
+        result = trace(self)
+        if result is not None:
+            self._pc, executed, expected = result
+            self._instruction_count += executed
+            if expected:
+                return None
+        # Frames, types or data stack differ from the recorded ones
+        failures = self._failures[header] = self._failures.get(header, 0) + 1
+        if failures >= self.MAX_FAILURES:
+            del self._traces[header]
+            self._failures[header] = 0
+            self._counters[header] = 0 if self._recordings.get(header, 0) < self.MAX_RECORDINGS else self.HOT_LOOP
+        return None
+
+    # Method that executes one iteration of loop from header and compiles its trace
+    # Instructions are executed by their (possibly quickened) methods, the recording stops before
+    # instruction that cannot be traced and the main loop continues on it
+    # Returns error code of failed instruction, otherwise None
+    def _record(self, header, lenght):
+        self._recordings[header] = self._recordings.get(header, 0) + 1
+        following = self._following
+        steps = []
+        while len(steps) < self.MAX_TRACE_LENGTH:
+            pc = self._pc
+            instruction = self.code[pc]
+            if pc in self._traces:
+                break
+            reads = TraceCompiler.READS.get(instruction[0])
+            if reads is not None:
+                types = tuple(type(Instruction._quick_value(self, instruction[index])) for index in reads)
+                if Undefined in types or type(None) in types:
+                    break
+            else:
+                # Stack instruction with missing operands fails, so it is executed by the main loop
+                count = TraceCompiler.STACK_READS.get(instruction[0])
+                if count is None or len(self._data_stack) < count:
+                    break
+                types = tuple(type(value) for value in self._data_stack[len(self._data_stack) - count:])
+            err_code = self._handlers[pc](self)
+            if err_code != 0:
+                return err_code
+            self._instruction_count += 1
+            steps.append((pc, types, self._pc != pc))
+            self._pc = following[self._pc]
+            if self._pc == header:
+                trace = self._compile_trace(steps)
+                if trace is not None:
+                    self._traces[header] = trace
+                return None
+            if self._pc >= lenght:
+                break
+        return None
+
+    # Method that compiles trace into python function, returns None if trace cannot be compiled
+    def _compile_trace(self, steps):
+        source = TraceCompiler(self.code, steps).translate()
+        if source is None:
+            return None
+        namespace = {"UNDEFINED": UNDEFINED, "NIL": Nil.nil(None), "NIL_TYPE": Nil.nil,
+                     "StringBuffer": sb.StringBuffer, "concat": sb.concat, "set_char": sb.set_char}
+        exec(compile(source, f"<trace {steps[0][0]}>", "exec"), namespace)
+        return namespace["trace"]
@@ -0,0 +1,217 @@
+from itertools import product
+from . import Nil
+from .Decoder import Variable
+from .ControlFlow import ControlFlowGraph
+from .Optimizer import DataflowOptimizer
+
+# Variable operand that is proven to exist (its frame exists and variable is defined) when instruction
+# is executed. types is set of python types its value can have, None in it means it can be uninitialized
+# Engines skip checks of existence and initialization of such operand and can use its type
+class TypedVariable(Variable):
+
+    __slots__ = ("types",)
+
+    def __init__(self, variable, types):
+        super().__init__(variable.frame, variable.name, variable.raw, variable.slot)
+        self.types = types
+
+
+# Python types of initialized values
+VALUE_TYPES = frozenset((int, bool, str, Nil.nil))
+
+# Combinations of types of operands that pass type check of instruction
+# Instruction -> (indexes of operands, set of tuples of their types)
+_SAME = {(int, int), (bool, bool), (str, str)}
+_WITH_NIL = {(Nil.nil, type_) for type_ in VALUE_TYPES} | {(type_, Nil.nil) for type_ in VALUE_TYPES}
+TYPE_RULES = {"ADD": ((2, 3), {(int, int)}), "SUB": ((2, 3), {(int, int)}),
+              "MUL": ((2, 3), {(int, int)}), "IDIV": ((2, 3), {(int, int)}),
+              "LT": ((2, 3), _SAME), "GT": ((2, 3), _SAME), "EQ": ((2, 3), _SAME | _WITH_NIL),
+              "JUMPIFEQ": ((2, 3), _SAME | _WITH_NIL), "JUMPIFNEQ": ((2, 3), _SAME | _WITH_NIL),
+              "AND": ((2, 3), {(bool, bool)}), "OR": ((2, 3), {(bool, bool)}), "NOT": ((2,), {(bool,)}),
+              "INT2CHAR": ((2,), {(int,)}), "STRI2INT": ((2, 3), {(str, int)}), "GETCHAR": ((2, 3), {(str, int)}),
+              "CONCAT": ((2, 3), {(str, str)}), "STRLEN": ((2,), {(str,)}),
+              "SETCHAR": ((1, 2, 3), {(str, int, str)}), "EXIT": ((1,), {(int,)})}
+del _SAME, _WITH_NIL
+
+# Types of results of instructions (MOVE, READ and POPS are handled separately)
+RESULT_TYPES = {"ADD": {int}, "SUB": {int}, "MUL": {int}, "IDIV": {int}, "STRI2INT": {int}, "STRLEN": {int},
+                "LT": {bool}, "GT": {bool}, "EQ": {bool}, "AND": {bool}, "OR": {bool}, "NOT": {bool},
+                "INT2CHAR": {str}, "CONCAT": {str}, "GETCHAR": {str}, "SETCHAR": {str}, "TYPE": {str},
+                "DEFVAR": {None}}
+# Types of values read by READ (invalid or missing input is nil)
+READ_TYPES = {"int": {int, Nil.nil}, "bool": {bool, Nil.nil}, "string": {str, Nil.nil}}
+
+
+# Class that infers types, existence and initialization of variables by dataflow analysis
+# on control flow graph, it is flow sensitive (facts are computed for every instruction)
+# State maps key of variable to set of its possible types, variable that is in state surely exists
+# (its frame exists and it is defined), None in types means it can be uninitialized
+# Facts after successful instruction are refined by its checks (operands of ADD are int after it)
+# Operands that are proven to exist are replaced by TypedVariable, code keeps length and labels
+# Checks are counted for every operand and instruction:
+#   existence of variable (errors 54 and 55) for read and written variables
+#   initialization (error 56) for read variables (not for TYPE)
+#   types of operands (error 53) for instructions in TYPE_RULES
+# checks is number of all checks and proven is number of checks that cannot fail
+class TypeInference:
+
+    __slots__ = ("code", "labels", "checks", "proven")
+
+    def __init__(self, code: list, labels: dict):
+        self.code = code
+        self.labels = labels
+        self.checks = 0
+        self.proven = 0
+
+    # Method that returns set of types of operand or None if variable may not exist
+    @staticmethod
+    def _types(state, operand):
+        if not isinstance(operand, Variable):
+            return {type(operand.value)}
+        return state.get(DataflowOptimizer._key(operand))
+
+    # Method that returns tuples of types of operands of instruction that pass its type check
+    # Returns None if instruction does not check types or some operand may not exist
+    @staticmethod
+    def _valid_types(state, instruction):
+        rule = TYPE_RULES.get(instruction[0])
+        if rule is None:
+            return None
+        indexes, valid = rule
+        operand_types = []
+        for index in indexes:
+            types = TypeInference._types(state, instruction[index])
+            if types is None:
+                return None
+            # Uninitialized value fails earlier, so it is not checked type
+            operand_types.append(types - {None})
+        combinations = set(product(*operand_types))
+        return combinations, combinations & valid
+
+    # Method that changes state by effect of successful instruction
+    @staticmethod
+    def _transfer(state, instruction):
+        opcode = instruction[0]
+        read_indexes = DataflowOptimizer._read_indexes(instruction)
+        source_types = TypeInference._types(state, instruction[2]) if opcode == "MOVE" else None
+        valid = TypeInference._valid_types(state, instruction)
+        for index in read_indexes:
+            variable = instruction[index]
+            key = DataflowOptimizer._key(variable)
+            types = state.get(key)
+            if types is None:
+                types = VALUE_TYPES | {None}
+            if opcode != "TYPE":
+                types = types - {None}
+            state[key] = frozenset(types)
+        # Operands passed type check, so they have types of valid combinations
+        if valid is not None:
+            indexes = TYPE_RULES[opcode][0]
+            for position, index in enumerate(indexes):
+                if isinstance(instruction[index], Variable):
+                    state[DataflowOptimizer._key(instruction[index])] = frozenset(
+                        combination[position] for combination in valid[1])
+
+        if opcode == "CREATEFRAME":
+            TypeInference._kill_frames(state, ("TF",))
+        elif opcode in ("PUSHFRAME", "POPFRAME"):
+            # Frame is moved, the other local frames are unknown
+            source, destination = ("TF", "LF") if opcode == "PUSHFRAME" else ("LF", "TF")
+            moved = {(destination, key[1]): types for key, types in state.items() if key[0] == source}
+            TypeInference._kill_frames(state, ("LF", "TF"))
+            state.update(moved)
+        elif opcode in DataflowOptimizer.DESTINATIONS:
+            destination = instruction[1]
+            if opcode == "MOVE":
+                types = VALUE_TYPES if source_types is None else source_types - {None}
+            elif opcode == "READ":
+                types = READ_TYPES.get(instruction[2], VALUE_TYPES)
+            elif opcode == "POPS":
+                types = VALUE_TYPES
+            else:
+                types = RESULT_TYPES[opcode]
+            state[DataflowOptimizer._key(destination)] = frozenset(types)
+
+    # Method that removes facts about variables in given frames
+    @staticmethod
+    def _kill_frames(state, frames):
+        for key in [key for key in state if key[0] in frames]:
+            del state[key]
+
+    # Method that returns facts that are true after both of states (None is state of unreached block)
+    @staticmethod
+    def _meet(first, second):
+        if first is None:
+            return dict(second)
+        return {key: types | second[key] for key, types in first.items() if key in second}
+
+    # Method that returns states on starts of blocks (None for unreachable block)
+    @staticmethod
+    def _analyze(code, graph):
+        states = [None] * len(graph.blocks)
+        if not graph.blocks:
+            return states
+        states[0] = {}
+        work = [0]
+        while work:
+            block = graph.blocks[work.pop()]
+            state = dict(states[block.index])
+            for pc in range(block.start, block.end):
+                TypeInference._transfer(state, code[pc])
+            for successor in block.successors:
+                old = states[successor]
+                new = TypeInference._meet(old, state)
+                if new != old:
+                    states[successor] = new
+                    if successor not in work:
+                        work.append(successor)
+        return states
+
+    # Method that returns instruction with proven operands replaced by TypedVariable and counts its checks
+    def _annotate(self, state, instruction):
+        opcode = instruction[0]
+        annotated = None
+        indexes = list(DataflowOptimizer._read_indexes(instruction))
+        if opcode in DataflowOptimizer.DESTINATIONS and opcode != "DEFVAR" and 1 not in indexes:
+            indexes.append(1)
+        for index in indexes:
+            variable = instruction[index]
+            reads = index != 1 or opcode not in DataflowOptimizer.DESTINATIONS or opcode == "SETCHAR"
+            types = state.get(DataflowOptimizer._key(variable))
+            # Existence, initialization of read variable and existence of written variable of SETCHAR
+            checks = (2 if opcode != "TYPE" else 1) if reads else 1
+            checks += 1 if opcode == "SETCHAR" and index == 1 else 0
+            self.checks += checks
+            if types is None:
+                continue
+            self.proven += checks - (1 if reads and opcode != "TYPE" and None in types else 0)
+            if annotated is None:
+                annotated = list(instruction)
+            annotated[index] = TypedVariable(variable, types)
+        valid = TypeInference._valid_types(state, instruction)
+        if opcode in TYPE_RULES:
+            self.checks += 1
+            if valid is not None and valid[0] and valid[0] == valid[1]:
+                self.proven += 1
+        return instruction if annotated is None else annotated
+
+    # Method that returns code with annotated operands, code given to constructor is not changed
+    def infer(self):
+        self.checks = 0
+        self.proven = 0
+        graph = ControlFlowGraph(self.code, self.labels)
+        states = TypeInference._analyze(self.code, graph)
+        code = list(self.code)
+        for block in graph.blocks:
+            state = states[block.index]
+            if state is None:
+                continue
+            for pc in range(block.start, block.end):
+                code[pc] = self._annotate(state, self.code[pc])
+                TypeInference._transfer(state, self.code[pc])
+        return code
+
+    # Method that returns report of inference
+    def report(self):
+        return {"checks": self.checks, "proven": self.proven,
+                "percentage": 100 * self.proven / self.checks if self.checks else 0.0}
@@ -1,13 +1,21 @@
-import re
-import xml
-import xml.dom.minidom as mdom
+import os
 import sys
+import xml.parsers.expat
+from operator import itemgetter
 from . import ErrorHandler as e
 
 # Class for parsing xml file to list of instructions
+# XML is read in chunks and parsed by expat events, DOM of the whole document is never built
+# Instructions are emitted as soon as their element ends and sorted by order at the end
 class XmlParser(e.ErrorHandable):
 
-    __slots__ = ("code", "TYPES", "error_message", "force_exit")
+    __slots__ = ("code", "TYPES", "error_message", "force_exit",
+                 "_depth", "_orders", "_pending", "_structure_error",
+                 "_instruction", "_arguments", "_argument_name", "_argument_type",
+                 "_nodes", "_in_cdata")
+
+    # Size of chunk of XML file that is parsed at once
+    CHUNK_SIZE = 1 << 16
 
     def __init__(self, force_exit=False):
         self.code = []
@@ -16,108 +24,266 @@ class XmlParser(e.ErrorHandable):
 
     def _reset(self, force_exit=False):
         self.code = []
+        # Depth of current element (root element has depth 1)
+        self._depth = 0
+        # Set of order numbers (to check if order is unique)
+        self._orders = set()
+        # Instructions parsed from last chunk that were not emitted yet
+        self._pending = []
+        # True if XML file have wrong structure, error_message then contains the first error
+        self._structure_error = False
+        # Currently parsed instruction [order, opcode] and its arguments {number: (type, value)}
+        self._instruction = None
+        self._arguments = {}
+        # Currently parsed argument element, its type attribute and its child nodes [kind, data]
+        self._argument_name = None
+        self._argument_type = None
+        self._nodes = []
+        self._in_cdata = False
         super().__init__(force_exit)
 
 
     # Convert escape sequences to characters
     @staticmethod
     def _escape_seq_to_char(string):
-        return re.sub(r'\\(\d{3})', lambda match: chr(int(match.group(1))), string)
-    
+        if "\\" not in string:
+            return string
+        # Every part after backslash that starts with three digits is escape sequence
+        parts = string.split("\\")
+        for index in range(1, len(parts)):
+            part = parts[index]
+            if part[:3].isdecimal() and len(part) >= 3:
+                parts[index] = chr(int(part[:3])) + part[3:]
+            else:
+                parts[index] = "\\" + part
+        return "".join(parts)
+
+    # Method that stores the first error of XML structure
+    # Parsing continues to find out if XML file is well-formed
+    def _structure_fail(self, message):
+        if not self._structure_error:
+            self._structure_error = True
+            self.error_message = message + "\nXML file have wrong structure"
+
     # Check if program element is valid
-    def _check_program_element(self, root):
-        root_att = list(root.attributes.keys())
+    def _check_program_element(self, name, attributes):
         valid_attr = ["language", "name", "description"]
 
-        if root.tagName != "program":
-            self.error_message = f"Root element must have name 'program' not {root.tagName}.\nXML file have wrong structure"
-            return 32  
-        
-        for attribute_name in root_att:
+        if name != "program":
+            self._structure_fail(f"Root element must have name 'program' not {name}.")
+            return 32
+
+        for attribute_name in attributes:
             if attribute_name not in valid_attr:
-                self.error_message = f"Root element has invalid attribute {attribute_name}.\nXML file have wrong structure"
+                self._structure_fail(f"Root element has invalid attribute {attribute_name}.")
                 return 32
             else:
                 valid_attr.remove(attribute_name)
-        
+
         if "language" in valid_attr:
-            self.error_message = f"Root element has no attribute language.\nXML file have wrong structure"
+            self._structure_fail(f"Root element has no attribute language.")
             return 32
-        
-        if root.getAttribute("language").lower() != "ippcode23":
-            self.error_message = f"Root attribute language must have value IPPcode23 not {root.getAttribute('language')}.\nXML file have wrong structure"
+
+        if attributes["language"].lower() != "ippcode23":
+            self._structure_fail(f"Root attribute language must have value IPPcode23 not {attributes['language']}.")
             return 32
-        
-        return 0
-    
-    # Check if there are only instruction elements in program element
-    def _check_instructions_level_structure(self, program):
-        for elem in program.childNodes:
-            if elem.nodeType == elem.ELEMENT_NODE:
-                if elem.tagName != "instruction":
-                    self.error_message = f"Element {elem.tagName} cannot be in a place where only element instruction can be.\nXML file have wrong structure"
-                    return 32
+
         return 0
 
-    # Check if instruction element is valid and there are only argument elements in instruction element
-    # And if order is unique
-    # Returning order of instruction
-    def _check_instruction_element(self, instruction, order_list):
-        instruction_att = list(instruction.attributes.keys())
-        valid_attr = ["order", "opcode"]
-        valid_elem = ["arg1", "arg2", "arg3"]
+    # Check if instruction element is valid and if order is unique
+    # Store order and opcode of instruction that starts
+    def _check_instruction_element(self, name, attributes):
+        if name != "instruction":
+            self._structure_fail(f"Element {name} cannot be in a place where only element instruction can be.")
+            return 32
 
-        for attribute_name in instruction_att:
+        valid_attr = ["order", "opcode"]
+        for attribute_name in attributes:
             if attribute_name in valid_attr:
                 valid_attr.remove(attribute_name)
             else:
-                self.error_message = f"Instruction element has invalid attribute {attribute_name}.\nXML file have wrong structure"
+                self._structure_fail(f"Instruction element has invalid attribute {attribute_name}.")
                 return 32
-            
+
         if len(valid_attr) != 0:
-            self.error_message = f"Instruction element has no attributes {valid_attr}.\nXML file have wrong structure"
+            self._structure_fail(f"Instruction element has no attributes {valid_attr}.")
             return 32
-        
-        order = instruction.getAttribute("order")
+
+        order = attributes["order"]
 
         if not order.isdigit():
-            self.error_message = f"Instruction attribute order must be a number not {instruction.getAttribute('order')}.\nXML file have wrong structure"
+            self._structure_fail(f"Instruction attribute order must be a number not {order}.")
             return 32
 
         order = int(order)
-        
+
         if order < 1:
-            self.error_message = f"Instruction attribute order must be a positive integer not {order}.\nXML file have wrong structure"
+            self._structure_fail(f"Instruction attribute order must be a positive integer not {order}.")
             return 32
 
-        if order in order_list:
-            self.error_message = f"Instruction attribute order must be unique number. Conflict number {order}\nXML file have wrong structure"
+        if order in self._orders:
+            self._structure_fail(f"Instruction attribute order must be unique number. Conflict number {order}")
             return 32
 
-        for argument in instruction.childNodes:
-            if argument.nodeType == argument.ELEMENT_NODE:
-                if argument.tagName not in valid_elem:
-                    self.error_message = f"Invalid or duplicite element {argument.tagName}.\nXML file have wrong structure"
-                    return 32
-                else:
-                    valid_elem.remove(argument.tagName)
-
-        return order
+        self._orders.add(order)
+        self._instruction = [order, attributes["opcode"].upper().strip()]
+        self._arguments = {}
+        return 0
 
     # Check if argument element is valid
-    def _check_argument_element(self, argument):
-        arg_att = list(argument.attributes.keys())
-        if len(arg_att) != 1:
-            self.error_message = f"Argument element has invalid number of attributes.\nXML file have wrong structure"
+    def _check_argument_element(self, name, attributes):
+        if name not in ("arg1", "arg2", "arg3") or int(name[3]) in self._arguments:
+            self._structure_fail(f"Invalid or duplicite element {name}.")
             return 32
-        if arg_att[0] != "type":
-            self.error_message = f"Argument element has invalid attribute {arg_att[0]}. Only attribute \"type\" is allowed.\nXML file have wrong structure"
+        if len(attributes) != 1:
+            self._structure_fail(f"Argument element has invalid number of attributes.")
             return 32
-        if len(argument.childNodes) > 1:
-            self.error_message = f"Argument element has invalid number of child elements.\nXML file have wrong structure"
+        if "type" not in attributes:
+            self._structure_fail(f"Argument element has invalid attribute {next(iter(attributes))}. Only attribute \"type\" is allowed.")
             return 32
+
+        # Argument is stored with value when it ends
+        self._arguments[int(name[3])] = None
+        self._argument_name = name
+        self._argument_type = attributes["type"]
+        self._nodes = []
         return 0
 
+    # Method that returns argument in format for interpreter
+    # type/frame@value/name for variables and constants, only value for others
+    def _argument(self, type_, data):
+        type_ = type_.lower().strip()
+        # If there must be type@value for interpeter
+        if type_ in self.TYPES:
+            value = data.strip() if data is not None else ""
+            # If type is string, it convert escape sequences to characters
+            if type_ == "string":
+                value = XmlParser._escape_seq_to_char(value)
+            # format for variables and constants
+            # type/frame@value/name
+            return type_ + "@" + value
+        # If not varible or constant
+        return data.strip() if data is not None else ""
+
+    # Expat handlers
+
+    def _start_element(self, name, attributes):
+        self._depth += 1
+        if self._structure_error:
+            return
+        if self._depth == 1:
+            self._check_program_element(name, attributes)
+        elif self._depth == 2:
+            self._check_instruction_element(name, attributes)
+        elif self._depth == 3:
+            self._check_argument_element(name, attributes)
+        elif self._depth == 4:
+            # Element inside of argument is its child node
+            self._nodes.append(["element", None])
+
+    def _end_element(self, name):
+        self._depth -= 1
+        if self._structure_error:
+            return
+        if self._depth == 2:
+            self._end_argument()
+        elif self._depth == 1:
+            self._end_instruction()
+
+    def _character_data(self, data):
+        if self._depth != 3 or self._structure_error:
+            return
+        # Text is one node until other node starts, CDATA section is one node
+        if self._nodes and self._nodes[-1][0] == ("cdata" if self._in_cdata else "text"):
+            self._nodes[-1][1] += data
+        else:
+            self._nodes.append(["cdata" if self._in_cdata else "text", data])
+
+    def _start_cdata(self):
+        self._in_cdata = True
+        if self._depth == 3 and not self._structure_error:
+            self._nodes.append(["cdata", ""])
+
+    def _end_cdata(self):
+        self._in_cdata = False
+
+    def _comment(self, data):
+        if self._depth == 3 and not self._structure_error:
+            self._nodes.append(["comment", data])
+
+    def _processing_instruction(self, target, data):
+        if self._depth == 3 and not self._structure_error:
+            self._nodes.append(["pi", data])
+
+    # Method that checks child nodes of argument that ends and stores the argument
+    def _end_argument(self):
+        if len(self._nodes) > 1 or (self._nodes and self._nodes[0][0] == "element"):
+            self._structure_fail(f"Argument element has invalid number of child elements.")
+            return
+        data = self._nodes[0][1] if self._nodes else None
+        self._arguments[int(self._argument_name[3])] = self._argument(self._argument_type, data)
+        self._nodes = []
+
+    # Method that checks sequence of arguments of instruction that ends
+    # and adds instruction to pending instructions
+    def _end_instruction(self):
+        instruction_node = self._instruction
+        # Boolean for checking if there is an error with sequence of arguments
+        # for example: <arg3> <arg2>
+        # or: <arg1> <arg3>
+        arguments_sequence_err = False
+        for i in range(1, 4):
+            argument = self._arguments.get(i)
+            if argument is not None:
+                # Error if wrong sequence of arguments
+                if arguments_sequence_err:
+                    self._structure_fail("Instruction element has invalid sequence of arguments.")
+                    return
+                instruction_node.append(argument)
+            else:
+                arguments_sequence_err = True
+        self._pending.append(instruction_node)
+        self._instruction = None
+
+    def _create_parser(self):
+        parser = xml.parsers.expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self._start_element
+        parser.EndElementHandler = self._end_element
+        parser.CharacterDataHandler = self._character_data
+        parser.StartCdataSectionHandler = self._start_cdata
+        parser.EndCdataSectionHandler = self._end_cdata
+        parser.CommentHandler = self._comment
+        parser.ProcessingInstructionHandler = self._processing_instruction
+        return parser
+
+    # Generator that parses XML file (or stdin if file is None) by chunks
+    # xml_file can also be binary stream, it is read but not closed
+    # It yields instructions in format [order, instruction, arg1, arg2, arg3] as they are parsed
+    # Raises ExpatError if XML file is not well-formed
+    # After the XML file have wrong structure, nothing is yielded and error_message is set
+    def stream_instructions(self, xml_file=None):
+        parser = self._create_parser()
+        opened = isinstance(xml_file, (str, bytes, os.PathLike))
+        if opened:
+            source = open(xml_file, "rb")
+        elif xml_file is not None:
+            source = xml_file
+        else:
+            source = sys.stdin.buffer
+        try:
+            while True:
+                chunk = source.read(self.CHUNK_SIZE)
+                parser.Parse(chunk, not chunk)
+                if not self._structure_error:
+                    yield from self._pending
+                self._pending = []
+                if not chunk:
+                    break
+        finally:
+            if opened:
+                source.close()
+
     # Errors are by decorator
     # This function create list of instructions for interpreter an store it in self.code
     @e.ErrorHandable.handle_error
@@ -125,104 +291,20 @@ class XmlParser(e.ErrorHandable):
         self._reset(force_exit)
         # Parse XML file
         try:
-            if xml_file is not None:
-                dom = mdom.parse(xml_file)
-            else:
-                dom = mdom.parseString(sys.stdin.read())
-
+            instructions = list(self.stream_instructions(xml_file))
         except xml.parsers.expat.ExpatError:
-            self.error_message = f"XML file {xml_file} is not well-formed"
+            name = getattr(xml_file, "name", "<stream>") if hasattr(xml_file, "read") else xml_file
+            self.error_message = f"XML file {name} is not well-formed"
             return 31
 
-        # Creating list of instructions for interpreter
-        self.code = []
-
-        # Root "program" element
-        program = dom.documentElement
-
-        # Checking root and instruction elements structure
-        if self._check_program_element(program) != 0:
-            return 32
-        if self._check_instructions_level_structure(program) != 0:
+        if self._structure_error:
             return 32
 
-        # List of instructions
-        instructions = program.getElementsByTagName("instruction")
-        
-        # List of order numbers
-        order_list = []
-        for instruction in instructions:
-            
-            # Creating instruction node
-            instruction_node = []
-
-            # Checking instruction and argument elements structure
-            order = self._check_instruction_element(instruction, order_list)
-
-            # Check if there is an error from previous function
-            if self.error_message != "":
-                return 32
-
-            # Adding order number to list
-            order_list.append(order)
-            # Adding order number to instruction node
-            instruction_node.append(order)
-
-            
-            # Adding opcode to instruction node
-            opcode = instruction.getAttribute("opcode")
-            instruction_node.append(opcode.upper().strip())
-
-            # Boolean for checking if there is an error with sequence of arguments
-            # for example: <arg3> <arg2>
-            # or: <arg1> <arg3>
-            arguments_sequence_err = False
-
-            # Checking arguments 
-            for i in range(1, 4):
-                argument = instruction.getElementsByTagName(f"arg{i}")
-                if argument:
-                    # Error if wrong sequence of arguments
-                    if arguments_sequence_err:
-                        self.error_message = "Instruction element has invalid sequence of arguments.\nXML file have wrong structure"
-                        return 32
-                    
-                    # Checking argument element structure
-                    if self._check_argument_element(argument[0]) != 0:
-                        return 32
-
-                    type_ = argument[0].getAttribute("type").lower().strip()
-                    # If there must be type@value for interpeter
-                    if type_ in self.TYPES:
-
-                        value= argument[0].firstChild.data if argument[0].firstChild is not None else ""
-                        # If type is string, it convert escape sequences to characters
-                        value = value.strip()
-                        if type_ == "string":
-                            value = XmlParser._escape_seq_to_char(value)
-                            
-                        # format for variables and constants
-                        # type/frame@value/name    
-                        arg = type_ + "@" + value
-
-                    else:
-                        # If not varible or constant
-                        arg = argument[0].firstChild.data.strip() if argument[0].firstChild is not None else ""
-
-                    # Adding argument to instruction node
-                    instruction_node.append(arg)
-                # If there shouldnt be next argument
-                else:
-                    arguments_sequence_err = True
-
-            # Adding instruction node to list of instructions for interpreter
-            self.code.append(instruction_node)
-
         # Sorting instructions by order number
-        self.code = sorted(self.code, key=lambda x: int(x[0]))
+        instructions.sort(key=itemgetter(0))
 
         # Removing order numbers from instructions
-        self.code = [instruction[1:] for instruction in self.code]
+        self.code = [instruction[1:] for instruction in instructions]
         #                                0        1      2     3
         # instruction is in format [instruction, arg1, arg2, arg3]
         return 0
@@ -0,0 +1,60 @@
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+from IPPcode23Interpret.XmlParser import XmlParser
+from IPPcode23Interpret.SemanticAnalyzer import SemanticAnalyzer
+from IPPcode23Interpret.Decoder import Decoder
+from IPPcode23Interpret.Interpret import Interpret
+from IPPcode23Interpret.Output import OutputBuffer
+from .workloads import fib_program
+
+# Benchmark of pool of local frames on naive recursive fib(n)
+# Every call creates temporary frame, so without pool one list is allocated for every call
+# Program is executed by every engine with pool and without it (FRAME_POOL_SIZE = 0),
+# execute time (minimum of repeated runs) and number of allocated local frames are printed
+# Run: python3 -m benchmarks.frame_pool [--n N] [--engine ENGINE ...] [--repeat N]
+
+# Method that returns execute time and number of allocated frames of decoded program
+def measure(code, labels, engine, pool_size, repeat):
+    best = None
+    for _ in range(repeat):
+        interpret = Interpret.engine_class(engine)()
+        interpret.FRAME_POOL_SIZE = pool_size
+        interpret.output = OutputBuffer(io.StringIO())
+        start = time.perf_counter()
+        interpret.interpret(False, code, labels, io.StringIO())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, interpret.frames_allocated
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Pool of local frames on recursive fib(n)")
+    parser.add_argument("--n", type=int, default=25, help="argument of fib (default: 25)")
+    parser.add_argument("--engine", action="append", choices=list(Interpret.ENGINES),
+                        help="engines to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs, minimum is reported")
+    args = parser.parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory() as directory:
+        xml_file = os.path.join(directory, "fib.xml")
+        with open(xml_file, "w") as f:
+            f.write(fib_program(args.n))
+        xml_parser = XmlParser()
+        xml_parser.parse_to_interpret(xml_file)
+    analyzer = SemanticAnalyzer()
+    analyzer.check_semantic(xml_parser.code)
+    decoder = Decoder()
+    decoder.decode(xml_parser.code)
+
+    print(f"{'engine':<10}{'pool':>6}{'seconds':>10}{'frames':>10}")
+    for engine in args.engine or list(Interpret.ENGINES):
+        for pool_size in (0, Interpret.engine_class(engine).FRAME_POOL_SIZE):
+            elapsed, frames = measure(decoder.code, analyzer.labels, engine, pool_size, max(1, args.repeat))
+            print(f"{engine:<10}{'on' if pool_size else 'off':>6}{elapsed:>10.4f}{frames:>10}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
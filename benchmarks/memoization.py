@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+from IPPcode23Interpret.XmlParser import XmlParser
+from IPPcode23Interpret.SemanticAnalyzer import SemanticAnalyzer
+from IPPcode23Interpret.Decoder import Decoder
+from IPPcode23Interpret.Interpret import Interpret
+from IPPcode23Interpret.Output import OutputBuffer
+from IPPcode23Interpret.Memoization import PurityAnalyzer, CallCache
+from .workloads import fib_program, ackermann_program
+
+# Benchmark of memoization of pure functions on naive recursive fib(n) (argument in temporary frame)
+# and Ackermann function ack(2, n) (arguments on data stack)
+# Programs are executed by engines tac and jit without cache and with cache of given size,
+# execute time (minimum of repeated runs), output and hit rate of cache are printed
+# Run: python3 -m benchmarks.memoization [--n N] [--ack N] [--size SIZE] [--engine ENGINE ...] [--repeat N]
+
+# Engines that support memoization
+ENGINES = ("tac", "jit")
+
+# Method that returns decoded code and labels of program
+def load(source):
+    with tempfile.TemporaryDirectory() as directory:
+        xml_file = os.path.join(directory, "program.xml")
+        with open(xml_file, "w") as f:
+            f.write(source)
+        xml_parser = XmlParser()
+        xml_parser.parse_to_interpret(xml_file)
+    analyzer = SemanticAnalyzer()
+    analyzer.check_semantic(xml_parser.code)
+    decoder = Decoder()
+    decoder.decode(xml_parser.code)
+    return decoder.code, analyzer.labels
+
+# Method that returns execute time, output and report of cache (None without cache) of decoded program
+def measure(code, labels, engine, size, repeat):
+    best = None
+    for _ in range(repeat):
+        interpret = Interpret.engine_class(engine)()
+        if size is not None:
+            interpret.call_cache = CallCache(PurityAnalyzer(code, labels).analyze(), code, size)
+        stream = io.StringIO()
+        interpret.output = OutputBuffer(stream)
+        start = time.perf_counter()
+        interpret.interpret(False, code, labels, io.StringIO())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    report = None if interpret.call_cache is None else interpret.call_cache.report()
+    return best, stream.getvalue(), report
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Memoization of pure functions on recursive fib and Ackermann")
+    parser.add_argument("--n", type=int, default=20, help="argument of fib (default: 20)")
+    parser.add_argument("--ack", type=int, default=40, help="second argument of ack(2, n) (default: 40)")
+    parser.add_argument("--size", type=int, default=4096, help="number of results in cache (default: 4096)")
+    parser.add_argument("--engine", action="append", choices=ENGINES, help="engines to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs, minimum is reported")
+    args = parser.parse_args(argv[1:])
+
+    programs = {f"fib({args.n})": load(fib_program(args.n)),
+                f"ack(2,{args.ack})": load(ackermann_program(2, args.ack))}
+    print(f"{'program':<12}{'engine':<8}{'cache':>8}{'seconds':>10}{'output':>10}{'calls':>10}{'hit %':>8}")
+    for name, (code, labels) in programs.items():
+        for engine in args.engine or list(ENGINES):
+            for size in (None, args.size):
+                elapsed, output, report = measure(code, labels, engine, size, max(1, args.repeat))
+                calls, rate = ("", "") if report is None else (report["calls"], f"{report['hit_rate']:.1f}")
+                print(f"{name:<12}{engine:<8}{'off' if size is None else size:>8}{elapsed:>10.4f}{output:>10}"
+                      f"{calls:>10}{rate:>8}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
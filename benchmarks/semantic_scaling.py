@@ -0,0 +1,48 @@
+import sys
+import time
+import argparse
+from IPPcode23Interpret.SemanticAnalyzer import SemanticAnalyzer
+
+# Benchmark of SemanticAnalyzer on generated programs of growing size
+# Every block of program uses label before its definition (forward jump), defines it
+# and jumps back to it, so checking of labels is on every 4th instruction
+# Run: python3 -m benchmarks.semantic_scaling [--max SIZE]
+
+# Method that generates code in format of XmlParser with given number of instructions
+def generate_code(size):
+    code = [["DEFVAR", "GF@x"], ["MOVE", "GF@x", "int@0"]]
+    block = 0
+    while len(code) < size:
+        label = f"label{block}"
+        code.append(["JUMPIFEQ", label, "GF@x", "int@1"])
+        code.append(["LABEL", label])
+        code.append(["ADD", "GF@x", "GF@x", "int@1"])
+        code.append(["JUMPIFNEQ", label, "GF@x", "int@0"])
+        block += 1
+    return code[:size]
+
+# Method that returns time of semantic analysis of given code in seconds
+def measure(code):
+    analyzer = SemanticAnalyzer()
+    start = time.perf_counter()
+    analyzer.check_semantic(code)
+    return time.perf_counter() - start
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Scaling of semantic analysis")
+    parser.add_argument("--max", type=int, default=1 << 20, help="maximal number of instructions")
+    args = parser.parse_args(argv[1:])
+    size = 1 << 10
+    previous = None
+    print(f"{'instructions':>12} {'seconds':>10} {'us/instr':>10} {'ratio':>6}")
+    while size <= args.max:
+        elapsed = measure(generate_code(size))
+        # Ratio close to 2 means linear scaling (size is doubled every step)
+        ratio = f"{elapsed / previous:6.2f}" if previous else f"{'-':>6}"
+        print(f"{size:>12} {elapsed:>10.4f} {elapsed / size * 1e6:>10.3f} {ratio}")
+        previous = elapsed
+        size *= 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
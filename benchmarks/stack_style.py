@@ -0,0 +1,86 @@
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+from IPPcode23Interpret.XmlParser import XmlParser
+from IPPcode23Interpret.SemanticAnalyzer import SemanticAnalyzer
+from IPPcode23Interpret.Decoder import Decoder
+from IPPcode23Interpret.Interpret import Interpret
+from IPPcode23Interpret.Output import OutputBuffer
+from .workloads import int_loop, stack_int_loop
+
+# Benchmark of stack instructions against three-address code
+# The same loop is written in three-address style (int_loop) and stack style (stack_int_loop)
+# Both programs are executed by every engine, execute time (minimum of repeated runs), number of
+# executed instructions and time per instruction are printed, outputs of both styles must be the same
+# Number of instructions is counted by tac engine (other engines count only until EXIT or error)
+# Run: python3 -m benchmarks.stack_style [--size N] [--engine ENGINE ...] [--repeat N]
+
+# Styles of program and their generators
+STYLES = {"three-address": int_loop, "stack": stack_int_loop}
+
+# Method that returns decoded code and labels of generated XML source
+def load(source, directory):
+    xml_file = os.path.join(directory, "program.xml")
+    with open(xml_file, "w") as f:
+        f.write(source)
+    xml_parser = XmlParser()
+    xml_parser.parse_to_interpret(xml_file)
+    analyzer = SemanticAnalyzer()
+    analyzer.check_semantic(xml_parser.code)
+    decoder = Decoder()
+    decoder.decode(xml_parser.code)
+    return decoder.code, analyzer.labels
+
+# Method that returns execute time and output of decoded program
+def measure(code, labels, engine, repeat):
+    best = None
+    for _ in range(repeat):
+        interpret = Interpret.engine_class(engine)()
+        output = io.StringIO()
+        interpret.output = OutputBuffer(output)
+        start = time.perf_counter()
+        interpret.interpret(False, code, labels, io.StringIO())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output.getvalue()
+
+# Method that returns number of instructions executed by decoded program
+def count_instructions(code, labels):
+    interpret = Interpret.engine_class("tac")()
+    interpret.output = OutputBuffer(io.StringIO())
+    interpret.interpret(False, code, labels, io.StringIO())
+    return interpret._instruction_count
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Stack instructions against three-address code")
+    parser.add_argument("--size", type=int, default=20000, help="number of iterations of loop (default: 20000)")
+    parser.add_argument("--engine", action="append", choices=list(Interpret.ENGINES),
+                        help="engines to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs, minimum is reported")
+    args = parser.parse_args(argv[1:])
+
+    programs = {}
+    counts = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for style, generator in STYLES.items():
+            programs[style] = load(generator(args.size)[0], directory)
+            counts[style] = count_instructions(*programs[style])
+
+    print(f"{'engine':<10}{'style':>15}{'seconds':>10}{'instructions':>14}{'ns/instr':>10}")
+    for engine in args.engine or list(Interpret.ENGINES):
+        outputs = set()
+        for style, (code, labels) in programs.items():
+            elapsed, output = measure(code, labels, engine, max(1, args.repeat))
+            outputs.add(output)
+            print(f"{engine:<10}{style:>15}{elapsed:>10.4f}{counts[style]:>14}"
+                  f"{1e9 * elapsed / max(1, counts[style]):>10.1f}")
+        if len(outputs) != 1:
+            print(f"Outputs of styles differ with engine {engine}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
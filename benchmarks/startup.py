@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from .workloads import to_xml
+from .suite import compare, THRESHOLD
+
+# Startup benchmark of interpret.py
+# Tiny program is run as separate process in several scenarios (arguments of interpret.py), so measured time
+# is mostly startup: python, imports, parsing of arguments and of program until the first instruction
+#   wall      wall time of the whole process
+#   imports   sum of import times of all modules (from python -X importtime)
+#   package   sum of import times of modules of IPPcode23Interpret
+# Time is minimum of repeated runs, program cache is warmed up by one run before measuring
+# Results can be saved as JSON baseline and compared with it same as results of suite.py
+# Run: python3 -m benchmarks.startup [SCENARIO ...] [--save FILE] [--compare FILE] [--top N] ...
+
+# Measured values of scenario in order of columns
+METRICS = ("wall", "imports", "package")
+# Prefix of names of modules of interpret
+PACKAGE = "IPPcode23Interpret"
+# Path of interpret.py
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "interpret.py")
+
+# Scenarios and their arguments (source and input are added)
+SCENARIOS = {"tac": [],
+             "no_cache": ["--no-cache"],
+             "optimize": ["-O"],
+             "closure": ["--engine", "closure"],
+             "aot": ["--engine", "aot"],
+             "jit": ["--engine", "jit"]}
+
+# Method that returns import times of modules from output of python -X importtime
+# Returns dictionary name of module -> self time in seconds
+def parse_importtime(stderr):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, _, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_time) / 1e6
+    return modules
+
+# Method that runs interpret.py once and returns wall time and import times of modules
+def run_once(arguments, environment, importtime):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [SCRIPT] + arguments
+    start = time.perf_counter()
+    process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=environment,
+                             universal_newlines=True)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} ended with {process.returncode}: {process.stderr}")
+    return wall, parse_importtime(process.stderr) if importtime else {}
+
+# Method that measures scenario and returns minimal times and import times of modules of the fastest run
+def measure(arguments, environment, repeat):
+    # Warm up program cache and cache of translated code
+    run_once(arguments, environment, False)
+    best = None
+    modules = None
+    for _ in range(repeat):
+        wall, _ = run_once(arguments, environment, False)
+        _, imported = run_once(arguments, environment, True)
+        times = {"wall": wall, "imports": sum(imported.values()),
+                 "package": sum(value for name, value in imported.items() if name.startswith(PACKAGE))}
+        if best is None or times["imports"] < best["imports"]:
+            modules = imported
+        best = times if best is None else {metric: min(best[metric], times[metric]) for metric in METRICS}
+    best["modules"] = len(modules)
+    return best, modules
+
+# Method that runs selected scenarios and returns results
+def run(names, repeat, top, stream):
+    results = {"python": platform.python_version(), "bytecode_cache": not sys.flags.dont_write_bytecode,
+               "workloads": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        source_file = os.path.join(directory, "tiny.xml")
+        input_file = os.path.join(directory, "tiny.in")
+        with open(source_file, "w") as f:
+            f.write(to_xml(["DEFVAR GF@n", "READ GF@n int", "WRITE GF@n"]))
+        with open(input_file, "w") as f:
+            f.write("1\n")
+        environment = dict(os.environ, IPPCODE23_CACHE_DIR=os.path.join(directory, "cache"))
+        for name in names:
+            times, modules = measure(["--source", source_file, "--input", input_file] + SCENARIOS[name],
+                                     environment, repeat)
+            results["workloads"][name] = times
+            print(f"{name:<12}" + "".join(f"{1000 * times[metric]:>12.2f}" for metric in METRICS)
+                  + f"{times['modules']:>10}", file=stream)
+            for module, value in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]:
+                print(f"{'':<12}{1000 * value:>12.2f}  {module}", file=stream)
+    return results
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Startup benchmark of IPPcode23 interpreter")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--repeat", type=int, default=10, help="number of runs, minimum is reported")
+    parser.add_argument("--top", type=int, default=0, help="print N slowest imported modules of every scenario")
+    parser.add_argument("--save", metavar="FILE", help="save results as JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare results with JSON baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"relative slowdown that is regression (default: {THRESHOLD})")
+    args = parser.parse_args(argv[1:])
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name}")
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("bytecode_cache") != (not sys.flags.dont_write_bytecode):
+            print(f"Baseline {args.compare} was measured with bytecode cache "
+                  f"{'on' if baseline.get('bytecode_cache') else 'off'}", file=sys.stderr)
+            return 2
+
+    print(f"{'[ms]':<12}" + "".join(f"{metric:>12}" for metric in METRICS) + f"{'modules':>10}", file=sys.stdout)
+    results = run(args.scenarios or list(SCENARIOS), max(1, args.repeat), max(0, args.top), sys.stdout)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, METRICS)
+        for name, metric, base, current in regressions:
+            print(f"REGRESSION {name} {metric}: {1000 * base:.2f} ms -> {1000 * current:.2f} ms "
+                  f"(+{100 * (current / base - 1):.1f} %)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare} (threshold {100 * args.threshold:.0f} %)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,30 @@
+import sys
+import argparse
+from IPPcode23Interpret.Interpret import Interpret
+from .suite import measure
+
+# Benchmark of long strings built by CONCAT and changed by SETCHAR (workload long_string)
+# Program builds string of given number of characters char by char and then changes every char,
+# so its time grows linearly only if CONCAT and SETCHAR do not copy the whole string
+# Run: python3 -m benchmarks.string_scaling [--engine ENGINE] [--max SIZE]
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Scaling of long string building and changing")
+    parser.add_argument("--engine", choices=list(Interpret.ENGINES), default="tac")
+    parser.add_argument("--max", type=int, default=1 << 20, help="maximal number of characters")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs, minimum is reported")
+    args = parser.parse_args(argv[1:])
+    size = 1 << 14
+    previous = None
+    print(f"{'characters':>12} {'seconds':>10} {'us/char':>10} {'ratio':>6}")
+    while size <= args.max:
+        elapsed = measure("long_string", size, args.engine, max(1, args.repeat))["execute"]
+        # Ratio close to 2 means linear scaling (size is doubled every step)
+        ratio = f"{elapsed / previous:6.2f}" if previous else f"{'-':>6}"
+        print(f"{size:>12} {elapsed:>10.4f} {elapsed / size * 1e6:>10.3f} {ratio}")
+        previous = elapsed
+        size *= 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,144 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from IPPcode23Interpret.XmlParser import XmlParser
+from IPPcode23Interpret.SemanticAnalyzer import SemanticAnalyzer
+from IPPcode23Interpret.Decoder import Decoder
+from IPPcode23Interpret.Interpret import Interpret
+from IPPcode23Interpret.Output import OutputBuffer
+from IPPcode23Interpret.Input import MappedInput
+from .workloads import WORKLOADS
+
+# Benchmark suite of generated workloads (see workloads.py)
+# Every workload is measured in three phases:
+#   load      XML parsing by XmlParser and decoding of operands by Decoder
+#   semantic  semantic analysis by SemanticAnalyzer
+#   execute   interpretation by selected engine (output is written to memory)
+# Time of phase is minimum of repeated runs
+# Results can be saved as JSON baseline and compared with it, phase that is slower than
+# baseline by more than threshold is regression and suite exits with 1
+# Run: python3 -m benchmarks.suite [--engine ENGINE] [--save FILE] [--compare FILE] ...
+
+# Phases of workload in order of measurement
+PHASES = ("load", "semantic", "execute")
+# Default relative slowdown of phase that is regression
+THRESHOLD = 0.25
+# Differences shorter than this (in seconds) are noise and are never regressions
+MIN_DIFFERENCE = 0.005
+
+# Method that returns times of phases of program in XML file in seconds
+def measure_once(xml_file, input_file, engine):
+    times = {}
+    start = time.perf_counter()
+    xml_parser = XmlParser()
+    xml_parser.parse_to_interpret(xml_file)
+    decoder = Decoder()
+    decoder.decode(xml_parser.code)
+    times["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analyzer = SemanticAnalyzer()
+    analyzer.check_semantic(xml_parser.code)
+    times["semantic"] = time.perf_counter() - start
+
+    interpret = Interpret.engine_class(engine)()
+    interpret.output = OutputBuffer(io.StringIO())
+    input_reader = MappedInput(input_file)
+    try:
+        start = time.perf_counter()
+        interpret.interpret(False, decoder.code, analyzer.labels, input_reader)
+        times["execute"] = time.perf_counter() - start
+    finally:
+        input_reader.close()
+    return times
+
+# Method that generates workload and returns minimal times of its phases from repeated runs
+def measure(name, size, engine, repeat):
+    generator, _ = WORKLOADS[name]
+    source, input_text = generator(size)
+    with tempfile.TemporaryDirectory() as directory:
+        xml_file = os.path.join(directory, f"{name}.xml")
+        input_file = os.path.join(directory, f"{name}.in")
+        with open(xml_file, "w") as f:
+            f.write(source)
+        with open(input_file, "w") as f:
+            f.write(input_text)
+        best = None
+        for _ in range(repeat):
+            times = measure_once(xml_file, input_file, engine)
+            best = times if best is None else {phase: min(best[phase], times[phase]) for phase in PHASES}
+    return best
+
+# Method that runs selected workloads and returns results
+def run(names, engine, scale, repeat, stream):
+    results = {"engine": engine, "scale": scale, "python": platform.python_version(), "workloads": {}}
+    for name in names:
+        size = max(1, int(WORKLOADS[name][1] * scale))
+        times = measure(name, size, engine, repeat)
+        results["workloads"][name] = times
+        print(f"{name:<12}" + "".join(f"{times[phase]:>12.4f}" for phase in PHASES), file=stream)
+    return results
+
+# Method that compares results with baseline and returns list of regressions (workload, phase, baseline, current)
+def compare(results, baseline, threshold, phases=PHASES):
+    regressions = []
+    for name, times in results["workloads"].items():
+        base = baseline["workloads"].get(name)
+        if base is None:
+            continue
+        for phase in phases:
+            if phase in base and times[phase] > base[phase] * (1 + threshold) \
+                    and times[phase] - base[phase] > MIN_DIFFERENCE:
+                regressions.append((name, phase, base[phase], times[phase]))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark suite of IPPcode23 interpreter")
+    parser.add_argument("workloads", nargs="*", metavar="WORKLOAD",
+                        help=f"workloads to run (default: all of {', '.join(WORKLOADS)})")
+    parser.add_argument("--engine", choices=list(Interpret.ENGINES), default="tac")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of default sizes of workloads")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs, minimum is reported")
+    parser.add_argument("--save", metavar="FILE", help="save results as JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare results with JSON baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"relative slowdown that is regression (default: {THRESHOLD})")
+    args = parser.parse_args(argv[1:])
+    for name in args.workloads:
+        if name not in WORKLOADS:
+            parser.error(f"unknown workload {name}")
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("engine") != args.engine or baseline.get("scale") != args.scale:
+            print(f"Baseline {args.compare} was measured with engine {baseline.get('engine')} and scale "
+                  f"{baseline.get('scale')}", file=sys.stderr)
+            return 2
+
+    print(f"{'workload':<12}" + "".join(f"{phase:>12}" for phase in PHASES), file=sys.stdout)
+    results = run(args.workloads or list(WORKLOADS), args.engine, args.scale, max(1, args.repeat), sys.stdout)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, phase, base, current in regressions:
+            print(f"REGRESSION {name} {phase}: {base:.4f} s -> {current:.4f} s "
+                  f"(+{100 * (current / base - 1):.1f} %)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare} (threshold {100 * args.threshold:.0f} %)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
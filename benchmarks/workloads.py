@@ -0,0 +1,295 @@
+from xml.sax.saxutils import escape
+
+# Generators of representative IPPcode23 workloads
+# Every generator takes size (roughly number of executed instructions / 10) and returns
+# (XML source of program, text of input for READ)
+# Programs are written as lines of IPPcode23 source and converted to XML by to_xml()
+
+# Instructions that have label in first argument
+LABEL_INSTRUCTIONS = ("LABEL", "JUMP", "CALL", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS")
+
+# Method that converts one argument of source line to XML element
+def _argument_xml(opcode, index, argument):
+    if index == 1 and opcode in LABEL_INSTRUCTIONS:
+        type_, value = "label", argument
+    elif index == 2 and opcode == "READ":
+        type_, value = "type", argument
+    else:
+        type_, _, value = argument.partition("@")
+        if type_ in ("GF", "LF", "TF"):
+            type_, value = "var", argument
+    return f'<arg{index} type="{type_}">{escape(value)}</arg{index}>'
+
+# Method that converts lines of IPPcode23 source (without header) to XML
+# Arguments are separated by spaces, so string constants must use escape sequences for whitespace
+def to_xml(lines):
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<program language="IPPcode23">\n']
+    for order, line in enumerate(lines, 1):
+        opcode, *arguments = line.split()
+        parts.append(f'<instruction order="{order}" opcode="{opcode}">')
+        parts.extend(_argument_xml(opcode, index, argument) for index, argument in enumerate(arguments, 1))
+        parts.append("</instruction>\n")
+    parts.append("</program>\n")
+    return "".join(parts)
+
+
+# Tight integer loop with arithmetic, comparison and conditional jump
+def int_loop(size):
+    return to_xml([
+        "DEFVAR GF@i", "DEFVAR GF@sum", "DEFVAR GF@tmp", "DEFVAR GF@cond",
+        "MOVE GF@i int@0", "MOVE GF@sum int@0",
+        "LABEL loop",
+        "MUL GF@tmp GF@i int@3",
+        "IDIV GF@tmp GF@tmp int@2",
+        "ADD GF@sum GF@sum GF@tmp",
+        "SUB GF@sum GF@sum int@1",
+        "ADD GF@i GF@i int@1",
+        "LT GF@cond GF@i int@" + str(size),
+        "JUMPIFEQ loop GF@cond bool@true",
+        "WRITE GF@sum",
+    ]), ""
+
+
+# Same computation as int_loop written with stack instructions, as emitted by compiler for stack machine
+# Expressions are evaluated on data stack, so only loop counter and sum are variables
+def stack_int_loop(size):
+    return to_xml([
+        "DEFVAR GF@i", "DEFVAR GF@sum",
+        "MOVE GF@i int@0", "MOVE GF@sum int@0",
+        "LABEL loop",
+        "PUSHS GF@sum",
+        "PUSHS GF@i", "PUSHS int@3", "MULS",
+        "PUSHS int@2", "IDIVS",
+        "ADDS",
+        "PUSHS int@1", "SUBS",
+        "POPS GF@sum",
+        "PUSHS GF@i", "PUSHS int@1", "ADDS", "POPS GF@i",
+        "PUSHS GF@i", "PUSHS int@" + str(size), "LTS",
+        "PUSHS bool@true",
+        "JUMPIFEQS loop",
+        "WRITE GF@sum",
+    ]), ""
+
+
+# Recursive function with local frames (CREATEFRAME, PUSHFRAME, CALL, RETURN, POPFRAME)
+# sum(n) = n + sum(n - 1) with depth 100 is called repeatedly
+def recursion(size):
+    depth = 100
+    return to_xml([
+        "DEFVAR GF@k", "DEFVAR GF@result",
+        "MOVE GF@k int@0",
+        "LABEL outer",
+        "CREATEFRAME", "DEFVAR TF@n", f"MOVE TF@n int@{depth}",
+        "CALL sum",
+        "POPS GF@result",
+        "ADD GF@k GF@k int@1",
+        f"JUMPIFNEQ outer GF@k int@{max(1, size // depth)}",
+        "WRITE GF@result",
+        "EXIT int@0",
+        "LABEL sum",
+        "PUSHFRAME",
+        "DEFVAR LF@r",
+        "JUMPIFNEQ recurse LF@n int@0",
+        "PUSHS int@0",
+        "POPFRAME",
+        "RETURN",
+        "LABEL recurse",
+        "CREATEFRAME", "DEFVAR TF@n",
+        "SUB TF@n LF@n int@1",
+        "CALL sum",
+        "POPS LF@r",
+        "ADD LF@r LF@r LF@n",
+        "PUSHS LF@r",
+        "POPFRAME",
+        "RETURN",
+    ]), ""
+
+
+# Naive recursive fib(n) with new local frame for every call (CREATEFRAME, DEFVAR, PUSHFRAME, POPFRAME)
+# n is the biggest number for which fib makes at most size calls
+def fib(size):
+    n = 1
+    while 2 * _fib(n + 2) - 1 <= size:
+        n += 1
+    return fib_program(n), ""
+
+def _fib(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+# Method that returns program that computes fib(n) by naive recursion
+def fib_program(n):
+    return to_xml([
+        "DEFVAR GF@result",
+        "CREATEFRAME", "DEFVAR TF@n", f"MOVE TF@n int@{n}",
+        "CALL fib",
+        "POPS GF@result",
+        "WRITE GF@result",
+        "EXIT int@0",
+        "LABEL fib",
+        "PUSHFRAME",
+        "DEFVAR LF@a", "DEFVAR LF@cond",
+        "LT LF@cond LF@n int@2",
+        "JUMPIFEQ recurse LF@cond bool@false",
+        "PUSHS LF@n",
+        "POPFRAME",
+        "RETURN",
+        "LABEL recurse",
+        "CREATEFRAME", "DEFVAR TF@n",
+        "SUB TF@n LF@n int@1",
+        "CALL fib",
+        "POPS LF@a",
+        "CREATEFRAME", "DEFVAR TF@n",
+        "SUB TF@n LF@n int@2",
+        "CALL fib",
+        "POPS LF@cond",
+        "ADD LF@a LF@a LF@cond",
+        "PUSHS LF@a",
+        "POPFRAME",
+        "RETURN",
+    ])
+
+
+# Naive recursive Ackermann function ack(m, n), arguments and result are passed on data stack
+# Function has its own local frame for arguments (CREATEFRAME, PUSHFRAME, POPFRAME)
+def ackermann_program(m, n):
+    return to_xml([
+        "DEFVAR GF@result",
+        f"PUSHS int@{m}", f"PUSHS int@{n}",
+        "CALL ack",
+        "POPS GF@result",
+        "WRITE GF@result",
+        "EXIT int@0",
+        "LABEL ack",
+        "CREATEFRAME", "PUSHFRAME",
+        "DEFVAR LF@m", "DEFVAR LF@n",
+        "POPS LF@n", "POPS LF@m",
+        "JUMPIFNEQ m_positive LF@m int@0",
+        "ADD LF@n LF@n int@1",
+        "PUSHS LF@n",
+        "POPFRAME",
+        "RETURN",
+        "LABEL m_positive",
+        "SUB LF@m LF@m int@1",
+        "PUSHS LF@m",
+        "JUMPIFNEQ n_positive LF@n int@0",
+        "PUSHS int@1",
+        "CALL ack",
+        "POPFRAME",
+        "RETURN",
+        "LABEL n_positive",
+        "ADD LF@m LF@m int@1",
+        "PUSHS LF@m",
+        "SUB LF@n LF@n int@1",
+        "PUSHS LF@n",
+        "CALL ack",
+        "CALL ack",
+        "POPFRAME",
+        "RETURN",
+    ])
+
+
+# String building with CONCAT, STRLEN, GETCHAR and SETCHAR
+# String is rebuilt every 64 characters so its length stays small
+def strings(size):
+    return to_xml([
+        "DEFVAR GF@i", "DEFVAR GF@s", "DEFVAR GF@len", "DEFVAR GF@c", "DEFVAR GF@index",
+        "MOVE GF@i int@0", "MOVE GF@s string@",
+        "LABEL loop",
+        "CONCAT GF@s GF@s string@ab",
+        "STRLEN GF@len GF@s",
+        "SUB GF@index GF@len int@1",
+        "GETCHAR GF@c GF@s GF@index",
+        "SETCHAR GF@s int@0 GF@c",
+        "JUMPIFNEQ next GF@len int@64",
+        "MOVE GF@s string@",
+        "LABEL next",
+        "ADD GF@i GF@i int@1",
+        f"JUMPIFNEQ loop GF@i int@{size}",
+        "WRITE GF@s",
+    ]), ""
+
+
+# Long string built char by char with CONCAT and then changed char by char with GETCHAR and SETCHAR
+# String has size characters, so without in place string buffer the program is quadratic
+def long_string(size):
+    return to_xml([
+        "DEFVAR GF@i", "DEFVAR GF@s", "DEFVAR GF@c", "DEFVAR GF@len",
+        "MOVE GF@i int@0", "MOVE GF@s string@",
+        "LABEL build",
+        "CONCAT GF@s GF@s string@a",
+        "ADD GF@i GF@i int@1",
+        f"JUMPIFNEQ build GF@i int@{size}",
+        "STRLEN GF@len GF@s",
+        "LABEL edit",
+        "SUB GF@i GF@i int@1",
+        "GETCHAR GF@c GF@s GF@i",
+        "SETCHAR GF@s GF@i string@b",
+        "JUMPIFNEQ edit GF@i int@0",
+        "WRITE GF@len",
+    ]), ""
+
+
+# Data stack heavy loop with PUSHS and POPS
+def stack(size):
+    return to_xml([
+        "DEFVAR GF@i", "DEFVAR GF@a", "DEFVAR GF@b",
+        "MOVE GF@i int@0", "MOVE GF@b int@0",
+        "LABEL loop",
+        "PUSHS GF@i", "PUSHS GF@b", "PUSHS int@1",
+        "POPS GF@a", "POPS GF@b", "ADD GF@b GF@b GF@a",
+        "POPS GF@a",
+        "ADD GF@i GF@i int@1",
+        f"JUMPIFNEQ loop GF@i int@{size}",
+        "WRITE GF@b",
+    ]), ""
+
+
+# READ heavy program, every iteration reads int and string line
+def read(size):
+    lines = []
+    for index in range(size):
+        lines.append(str(index))
+        lines.append(f"line{index}")
+    return to_xml([
+        "DEFVAR GF@n", "DEFVAR GF@s", "DEFVAR GF@sum", "DEFVAR GF@type",
+        "MOVE GF@sum int@0",
+        "LABEL loop",
+        "READ GF@n int",
+        "READ GF@s string",
+        "TYPE GF@type GF@n",
+        "JUMPIFEQ end GF@type string@nil",
+        "ADD GF@sum GF@sum GF@n",
+        "JUMP loop",
+        "LABEL end",
+        "WRITE GF@sum",
+    ]), "\n".join(lines) + "\n"
+
+
+# Huge straight-line program, it measures mostly loading and semantic analysis
+def load(size):
+    lines = ["DEFVAR GF@x", "DEFVAR GF@s", "MOVE GF@x int@0", "MOVE GF@s string@"]
+    for index in range(size * 2):
+        if index % 4 == 0:
+            lines.append(f"LABEL l{index}")
+        elif index % 4 == 1:
+            lines.append(f"JUMPIFEQ l{index - 1} GF@x int@-1")
+        elif index % 4 == 2:
+            lines.append("ADD GF@x GF@x int@1")
+        else:
+            lines.append(f"CONCAT GF@s string@a{index} string@b")
+    return to_xml(lines), ""
+
+
+# Workloads of benchmark suite and their default sizes
+WORKLOADS = {"int_loop": (int_loop, 20000),
+             "stack_int_loop": (stack_int_loop, 20000),
+             "recursion": (recursion, 20000),
+             "fib": (fib, 20000),
+             "strings": (strings, 20000),
+             "long_string": (long_string, 20000),
+             "stack": (stack, 20000),
+             "read": (read, 20000),
+             "load": (load, 20000)}
@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from benchmarks.workloads import to_xml
+from IPPcode23Interpret.XmlParser import XmlParser
+from IPPcode23Interpret.SemanticAnalyzer import SemanticAnalyzer
+from IPPcode23Interpret.Decoder import Decoder
+
+# Helpers of tests, programs are written as lines of IPPcode23 source (see benchmarks.workloads.to_xml)
+
+# Path of interpret.py
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "interpret.py")
+# Names of all engines
+ENGINES = ("tac", "closure", "aot", "jit")
+
+# Result of interpret.py: exit code, stdout, stderr and JSON profile (None without --profile)
+class Run:
+
+    __slots__ = ("exit_code", "stdout", "stderr", "profile")
+
+    def __init__(self, exit_code, stdout, stderr, profile=None):
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.profile = profile
+
+    def __repr__(self):
+        return f"Run({self.exit_code!r}, {self.stdout!r}, {self.stderr!r})"
+
+
+# Method that runs program as separate interpret.py process with arguments and returns its result
+# Caches of programs and translated code are in temporary directory, so every run checks the program again
+# Input is read from file with input_text, or from input_file if it is given (input_text is then stdin of process)
+def run(lines, *arguments, input_text="", input_file=None, profile=False):
+    with tempfile.TemporaryDirectory() as directory:
+        source_file = os.path.join(directory, "program.xml")
+        profile_file = os.path.join(directory, "profile.json")
+        with open(source_file, "w") as f:
+            f.write(to_xml(lines))
+        stdin_text = input_text
+        if input_file is None:
+            input_file = os.path.join(directory, "program.in")
+            with open(input_file, "w") as f:
+                f.write(input_text)
+            stdin_text = ""
+        command = [sys.executable, SCRIPT, "--source", source_file, "--input", input_file] + list(arguments)
+        if profile:
+            command += ["--profile", profile_file]
+        environment = dict(os.environ, IPPCODE23_CACHE_DIR=os.path.join(directory, "cache"))
+        process = subprocess.run(command, input=stdin_text, capture_output=True, universal_newlines=True,
+                                 env=environment, timeout=60)
+        report = None
+        if profile and os.path.exists(profile_file):
+            with open(profile_file) as f:
+                report = json.load(f)
+    return Run(process.returncode, process.stdout, process.stderr, report)
+
+# Method that returns decoded code and labels of program (same as Interpret.prepare_program without -O)
+def load(lines):
+    with tempfile.TemporaryDirectory() as directory:
+        source_file = os.path.join(directory, "program.xml")
+        with open(source_file, "w") as f:
+            f.write(to_xml(lines))
+        xml_parser = XmlParser()
+        xml_parser.parse_to_interpret(source_file)
+    analyzer = SemanticAnalyzer()
+    analyzer.check_semantic(xml_parser.code)
+    decoder = Decoder()
+    decoder.decode(xml_parser.code)
+    return decoder.code, analyzer.labels
@@ -0,0 +1,27 @@
+import unittest
+from .support import run
+
+# Tests of translation of constants by the aot engine
+# Every run() translates the program again (cache is empty), so compile() of generated source is in every run
+
+
+class AotTest(unittest.TestCase):
+
+    def test_type_of_constant(self):
+        lines = ["DEFVAR GF@t", "TYPE GF@t int@5", "WRITE GF@t", "TYPE GF@t nil@nil", "WRITE GF@t"]
+        result = run(lines, "--engine", "aot")
+        self.assertEqual((result.exit_code, result.stdout, result.stderr), (0, "intnil", ""))
+
+    def test_subscripted_constants(self):
+        # Copy propagation of -O puts int constant into operands that are subscripted
+        programs = {"STRI2INT": ["DEFVAR GF@v", "DEFVAR GF@r", "MOVE GF@v int@5", "STRI2INT GF@r GF@v int@0"],
+                    "GETCHAR": ["DEFVAR GF@v", "DEFVAR GF@r", "MOVE GF@v bool@true", "GETCHAR GF@r GF@v int@0"],
+                    "SETCHAR": ["DEFVAR GF@v", "DEFVAR GF@r", "MOVE GF@r string@ab", "MOVE GF@v int@5",
+                                "SETCHAR GF@r int@0 GF@v"]}
+        for opcode, lines in programs.items():
+            with self.subTest(opcode=opcode):
+                expected = run(lines, "-O")
+                result = run(lines, "--engine", "aot", "-O")
+                self.assertEqual(result.exit_code, 53)
+                self.assertEqual((result.exit_code, result.stderr), (expected.exit_code, expected.stderr))
+                self.assertNotIn("SyntaxWarning", result.stderr)
@@ -0,0 +1,31 @@
+import unittest
+from .support import run, ENGINES
+
+# Tests of division by zero: types of operands are checked first, so wrong types divided by zero are error 53
+# Divisor is a variable, constant divisor 0 is found by semantic analysis
+
+PROGRAMS = {
+    "bool false divisor": (53, ["DEFVAR GF@b", "DEFVAR GF@x", "MOVE GF@b bool@false", "IDIV GF@x int@1 GF@b"]),
+    "string dividend": (53, ["DEFVAR GF@a", "DEFVAR GF@b", "DEFVAR GF@x", "MOVE GF@a string@a", "MOVE GF@b int@0",
+                             "IDIV GF@x GF@a GF@b"]),
+    "int divisor": (57, ["DEFVAR GF@b", "DEFVAR GF@x", "MOVE GF@b int@0", "IDIV GF@x int@1 GF@b"]),
+    "stack bool false divisor": (53, ["PUSHS int@1", "PUSHS bool@false", "IDIVS"]),
+    "stack string dividend": (53, ["PUSHS string@a", "PUSHS int@0", "IDIVS"]),
+    "stack int divisor": (57, ["PUSHS int@1", "PUSHS int@0", "IDIVS"]),
+    # Loop is traced by jit with int divisor before divisor becomes false
+    "loop": (53, ["DEFVAR GF@i", "DEFVAR GF@b", "DEFVAR GF@x", "MOVE GF@i int@0", "MOVE GF@b int@3",
+                  "LABEL loop", "IDIV GF@x GF@i GF@b", "PUSHS GF@i", "PUSHS GF@b", "IDIVS", "POPS GF@x",
+                  "ADD GF@i GF@i int@1", "JUMPIFNEQ next GF@i int@500", "MOVE GF@b bool@false",
+                  "LABEL next", "JUMP loop"]),
+}
+
+
+class DivisionTest(unittest.TestCase):
+
+    def test_types_are_checked_before_divisor(self):
+        for name, (exit_code, lines) in PROGRAMS.items():
+            for engine in ENGINES:
+                for arguments in ((), ("-O",)):
+                    with self.subTest(program=name, engine=engine, arguments=arguments):
+                        result = run(lines, "--engine", engine, *arguments)
+                        self.assertEqual(result.exit_code, exit_code, result.stderr)
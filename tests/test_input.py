@@ -0,0 +1,37 @@
+import os
+import unittest
+from .support import run
+from IPPcode23Interpret.Input import MappedInput
+
+# Tests of --input files that cannot be mapped to memory (they are read in chunks like stdin)
+
+READ_INT = ["DEFVAR GF@x", "READ GF@x int", "WRITE GF@x", "TYPE GF@x GF@x", "WRITE GF@x"]
+
+
+class InputTest(unittest.TestCase):
+
+    def test_pipe(self):
+        result = run(READ_INT, input_text="42\n", input_file="/dev/stdin")
+        self.assertEqual((result.exit_code, result.stdout, result.stderr), (0, "42int", ""))
+
+    def test_dev_null(self):
+        result = run(READ_INT, input_file="/dev/null")
+        self.assertEqual((result.exit_code, result.stdout, result.stderr), (0, "nil", ""))
+
+    def test_multiple_inputs(self):
+        # Input file of run() and /dev/null
+        result = run(READ_INT, "-i", "/dev/null")
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.stdout.count("nil"), 2)
+        self.assertIn("/dev/null: exit code 0", result.stderr)
+
+    def test_reader_of_pipe(self):
+        read_end, write_end = os.pipe()
+        os.write(write_end, b"1\r\ntwo\n3")
+        os.close(write_end)
+        reader = MappedInput(f"/dev/fd/{read_end}")
+        try:
+            self.assertEqual([reader.read_line() for _ in range(4)], [b"1", b"two", b"3", None])
+        finally:
+            reader.close()
+            os.close(read_end)
@@ -0,0 +1,266 @@
+import unittest
+from IPPcode23Interpret import Nil
+from IPPcode23Interpret.StringBuffer import StringBuffer
+from IPPcode23Interpret.Memoization import PurityAnalyzer, CallCache
+from .support import run, load
+
+# Tests of --memoize (Memoization.PurityAnalyzer and CallCache)
+# Memoized run must end the same way as run without cache, summary of cache is added to stderr
+
+# Engines that support memoization
+ENGINES = ("tac", "jit")
+
+
+class MemoizationTest(unittest.TestCase):
+
+    # Method that checks that program ends the same way with --memoize as without it
+    # Returns result of the last memoized run
+    def assertSameAsUnmemoized(self, lines, *arguments, input_text=""):
+        for engine in ENGINES:
+            expected = run(lines, "--engine", engine, input_text=input_text)
+            with self.subTest(engine=engine):
+                result = run(lines, "--engine", engine, "--memoize", *arguments, input_text=input_text)
+                self.assertEqual((result.exit_code, result.stdout), (expected.exit_code, expected.stdout))
+                messages, separator, _ = result.stderr.partition("memoization: ")
+                self.assertEqual((messages, separator), (expected.stderr, "memoization: "))
+        return result
+
+    # Function creates its own temporary frame, CREATEFRAME drops frame of caller to pool of frames and
+    # the next CREATEFRAME reuses the same list, so the caller's frame is replaced even though it is the same list
+    FRAME_POOL = ["CREATEFRAME", "DEFVAR TF@x", "MOVE TF@x int@5", "WRITE TF@x", "WRITE string@,",
+                  "PUSHS int@5", "CALL f", "WRITE TF@x", "WRITE string@,",
+                  "CREATEFRAME", "DEFVAR TF@x", "DEFVAR TF@y", "MOVE TF@x int@5",
+                  "PUSHS int@5", "CALL f", "WRITE TF@x", "WRITE string@,", "WRITE TF@y",
+                  "EXIT int@0",
+                  "LABEL f",
+                  "CREATEFRAME", "PUSHFRAME", "DEFVAR LF@x", "POPS LF@x", "MUL LF@x LF@x int@11",
+                  "POPFRAME",
+                  "RETURN"]
+
+    def test_function_that_replaces_frame_with_frame_pool(self):
+        result = self.assertSameAsUnmemoized(self.FRAME_POOL)
+        self.assertEqual((result.exit_code, result.stdout), (54, "5,55,55,"))
+        self.assertIn("f: pure, pops 1, pushes 0, 1 of 2 calls hit", result.stderr)
+
+    def test_frame_replaced_by_called_function(self):
+        # g replaces frame, so f that calls it replaces frame of its caller too
+        program = self.FRAME_POOL[:self.FRAME_POOL.index("LABEL f")] + [
+            "LABEL f", "CALL g", "RETURN",
+            "LABEL g"] + self.FRAME_POOL[self.FRAME_POOL.index("LABEL f") + 1:]
+        result = self.assertSameAsUnmemoized(program)
+        self.assertEqual((result.exit_code, result.stdout), (54, "5,55,55,"))
+        self.assertIn("f: pure, pops 1, pushes 0, 1 of 2 calls hit", result.stderr)
+
+
+# Recursive fib(n) with argument and result on data stack and local frame of its own
+FIB_STACK = ["DEFVAR GF@r", "PUSHS int@15", "CALL fib", "POPS GF@r", "WRITE GF@r", "BREAK", "EXIT int@0",
+             "LABEL fib",
+             "CREATEFRAME", "PUSHFRAME", "DEFVAR LF@n", "POPS LF@n",
+             "JUMPIFEQ base LF@n int@0", "JUMPIFEQ base LF@n int@1",
+             "SUB LF@n LF@n int@1", "PUSHS LF@n", "CALL fib",
+             "SUB LF@n LF@n int@1", "PUSHS LF@n", "CALL fib",
+             "ADDS", "POPFRAME", "RETURN",
+             "LABEL base", "PUSHS LF@n", "POPFRAME", "RETURN"]
+
+# Recursive fib(n) with argument in temporary frame of caller and result on data stack
+FIB_FRAME = ["DEFVAR GF@r", "CREATEFRAME", "DEFVAR TF@n", "MOVE TF@n int@15", "CALL fib", "POPS GF@r",
+             "WRITE GF@r", "BREAK", "EXIT int@0",
+             "LABEL fib",
+             "PUSHFRAME", "DEFVAR LF@a",
+             "JUMPIFEQ base LF@n int@0", "JUMPIFEQ base LF@n int@1",
+             "CREATEFRAME", "DEFVAR TF@n", "SUB TF@n LF@n int@1", "CALL fib", "POPS LF@a",
+             "CREATEFRAME", "DEFVAR TF@n", "SUB TF@n LF@n int@2", "CALL fib",
+             "PUSHS LF@a", "ADDS",
+             "POPFRAME", "RETURN",
+             "LABEL base", "PUSHS LF@n", "POPFRAME", "RETURN"]
+
+# Ackermann function ack(m, n) with arguments and result on data stack
+ACKERMANN = ["DEFVAR GF@r", "PUSHS int@2", "PUSHS int@3", "CALL ack", "POPS GF@r", "WRITE GF@r", "EXIT int@0",
+             "LABEL ack",
+             "CREATEFRAME", "PUSHFRAME", "DEFVAR LF@m", "DEFVAR LF@n", "POPS LF@n", "POPS LF@m",
+             "JUMPIFNEQ positive LF@m int@0",
+             "ADD LF@n LF@n int@1", "PUSHS LF@n", "POPFRAME", "RETURN",
+             "LABEL positive",
+             "SUB LF@m LF@m int@1", "PUSHS LF@m",
+             "JUMPIFNEQ recurse LF@n int@0",
+             "PUSHS int@1", "CALL ack", "POPFRAME", "RETURN",
+             "LABEL recurse",
+             "ADD LF@m LF@m int@1", "PUSHS LF@m", "SUB LF@n LF@n int@1", "PUSHS LF@n",
+             "CALL ack", "CALL ack", "POPFRAME", "RETURN"]
+
+# Functions that are not pure and substrings of reasons why
+IMPURE = {"global": (["DEFVAR GF@g", "MOVE GF@g int@0", "CALL f", "EXIT int@0",
+                      "LABEL f", "ADD GF@g GF@g int@1", "RETURN"], "accesses global frame"),
+          "local": (["CREATEFRAME", "PUSHFRAME", "DEFVAR LF@x", "MOVE LF@x int@0", "CALL f", "EXIT int@0",
+                     "LABEL f", "ADD LF@x LF@x int@1", "RETURN"], "accesses local frame of caller"),
+          "read": (["CALL f", "EXIT int@0",
+                    "LABEL f", "CREATEFRAME", "DEFVAR TF@x", "READ TF@x int", "PUSHS TF@x", "RETURN"],
+                   "executes READ"),
+          "write": (["PUSHS int@1", "CALL f", "EXIT int@0",
+                     "LABEL f", "CREATEFRAME", "DEFVAR TF@x", "POPS TF@x", "WRITE TF@x", "RETURN"],
+                    "executes WRITE"),
+          "popframe": (["CREATEFRAME", "PUSHFRAME", "CALL f", "EXIT int@0",
+                        "LABEL f", "POPFRAME", "RETURN"], "pops local frame of caller"),
+          "unbalanced": (["PUSHS int@1", "CALL f", "EXIT int@0",
+                          "LABEL f", "PUSHS int@1", "JUMPIFEQS one", "PUSHS int@1", "LABEL one", "RETURN"],
+                         "differ between paths"),
+          "returns": (["PUSHS int@1", "CALL f", "EXIT int@0",
+                       "LABEL f", "PUSHS int@1", "JUMPIFEQS one", "RETURN", "LABEL one", "PUSHS int@2", "RETURN"],
+                      "changes data stack differently"),
+          "frames": (["PUSHS int@1", "CALL f", "EXIT int@0",
+                      "LABEL f", "PUSHS int@1", "JUMPIFEQS one", "CREATEFRAME", "RETURN", "LABEL one", "RETURN"],
+                     "leaves different temporary frame"),
+          "callee": (["CALL f", "EXIT int@0",
+                      "LABEL f", "CALL g", "RETURN", "LABEL g", "DPRINT int@1", "RETURN"],
+                     "calls impure function g")}
+
+
+class PurityAnalyzerTest(unittest.TestCase):
+
+    @staticmethod
+    def analyze(lines):
+        return PurityAnalyzer(*load(lines)).analyze()
+
+    def test_recursive_function_with_stack_interface(self):
+        summary = self.analyze(FIB_STACK)["fib"]
+        self.assertTrue(summary.memoizable)
+        self.assertEqual((summary.consumed, summary.produced, summary.uses_frame, summary.replaces_frame),
+                         (1, 1, False, True))
+
+    def test_recursive_function_with_frame_interface(self):
+        summary = self.analyze(FIB_FRAME)["fib"]
+        self.assertTrue(summary.memoizable)
+        self.assertEqual((summary.consumed, summary.produced, summary.uses_frame, summary.replaces_frame),
+                         (0, 1, True, False))
+
+    def test_function_calling_itself_twice(self):
+        summary = self.analyze(ACKERMANN)["ack"]
+        self.assertTrue(summary.memoizable)
+        self.assertEqual((summary.consumed, summary.produced), (2, 1))
+
+    def test_mutually_recursive_functions(self):
+        summaries = self.analyze(["CREATEFRAME", "DEFVAR TF@n", "MOVE TF@n int@7", "CALL even", "EXIT int@0",
+                                  "LABEL even", "JUMPIFEQ even_zero TF@n int@0",
+                                  "SUB TF@n TF@n int@1", "CALL odd", "RETURN",
+                                  "LABEL even_zero", "PUSHS bool@true", "RETURN",
+                                  "LABEL odd", "JUMPIFEQ odd_zero TF@n int@0",
+                                  "SUB TF@n TF@n int@1", "CALL even", "RETURN",
+                                  "LABEL odd_zero", "PUSHS bool@false", "RETURN"])
+        self.assertEqual([(summary.label, summary.memoizable) for summary in summaries.values()],
+                         [("even", True), ("odd", True)])
+
+    def test_impure_functions(self):
+        for name, (lines, reason) in IMPURE.items():
+            with self.subTest(name):
+                summary = self.analyze(lines)["f"]
+                self.assertFalse(summary.memoizable)
+                self.assertIn(reason, summary.reason)
+
+    def test_function_that_never_returns(self):
+        summaries = self.analyze(["CALL loop", "EXIT int@0", "LABEL loop", "CALL loop", "RETURN"])
+        self.assertFalse(summaries["loop"].memoizable)
+        self.assertIsNone(summaries["loop"].net)
+        cache = CallCache(summaries, [], 1)
+        self.assertEqual(cache.report()["functions"], [{"label": "loop", "pure": False, "reason": "it never returns"}])
+
+
+class CallCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        code, labels = load(FIB_FRAME)
+        self.summaries = PurityAnalyzer(code, labels).analyze()
+        self.cache = CallCache(self.summaries, code, 2)
+        stack = load(FIB_STACK)
+        self.stack_summary = PurityAnalyzer(*stack).analyze()["fib"]
+
+    def test_key_distinguishes_types(self):
+        summary = self.stack_summary
+        self.assertNotEqual(self.cache.key(summary, [1], None), self.cache.key(summary, [True], None))
+        self.assertNotEqual(self.cache.key(summary, [0], None), self.cache.key(summary, [False], None))
+        self.assertNotEqual(self.cache.key(summary, [""], None), self.cache.key(summary, [Nil.nil(None)], None))
+        self.assertEqual(self.cache.key(summary, [Nil.nil(None)], None), self.cache.key(summary, [Nil.nil(None)], None))
+
+    def test_key_of_string_buffer_is_key_of_its_text(self):
+        text = "x" * 300
+        buffer = StringBuffer.from_str(text)
+        self.assertEqual(self.cache.key(self.stack_summary, [buffer], None),
+                         self.cache.key(self.stack_summary, [text], None))
+        changed = buffer.set_char(0, "y")
+        self.assertNotEqual(self.cache.key(self.stack_summary, [changed], None),
+                            self.cache.key(self.stack_summary, [text], None))
+
+    def test_key_uses_only_consumed_values_and_used_frame(self):
+        summary = self.stack_summary
+        self.assertEqual(self.cache.key(summary, [7, 1], None), self.cache.key(summary, [8, 1], [2]))
+        # Data stack has less values than function pops
+        self.assertIsNone(self.cache.key(summary, [], None))
+        frame_summary = self.summaries["fib"]
+        self.assertIsNone(self.cache.key(frame_summary, [], None))
+        self.assertNotEqual(self.cache.key(frame_summary, [], [1]), self.cache.key(frame_summary, [], [True]))
+
+    def test_least_recently_used_result_is_evicted(self):
+        summary = self.summaries["fib"]
+        keys = [self.cache.key(summary, [], [n]) for n in range(3)]
+        self.cache.put(keys[0], "zero")
+        self.cache.put(keys[1], "one")
+        self.assertEqual(self.cache.get(summary, keys[0]), "zero")
+        self.cache.put(keys[2], "two")
+        self.assertIsNone(self.cache.get(summary, keys[1]))
+        self.assertEqual(self.cache.get(summary, keys[2]), "two")
+        report = self.cache.report()
+        self.assertEqual((report["calls"], report["hits"], report["evictions"], report["results"]), (3, 2, 1, 2))
+        self.assertEqual(report["functions"][0]["hit_rate"], 100 * 2 / 3)
+
+
+class MemoizedRunTest(MemoizationTest):
+
+    def test_recursive_functions(self):
+        for name, lines, output in (("stack", FIB_STACK, "610"), ("frame", FIB_FRAME, "610"),
+                                    ("ackermann", ACKERMANN, "9")):
+            with self.subTest(name):
+                result = self.assertSameAsUnmemoized(lines)
+                self.assertEqual((result.exit_code, result.stdout), (0, output))
+                self.assertNotIn("0 of", result.stderr.partition("memoization: ")[2].splitlines()[0])
+
+    def test_small_cache(self):
+        for size in ("1", "2", "5"):
+            with self.subTest(size=size):
+                result = self.assertSameAsUnmemoized(FIB_STACK, size)
+                self.assertIn(f"(size {size})", result.stderr)
+
+    def test_values_of_different_types(self):
+        # TYPE of argument, true and 1 (or long string and string buffer with the same text) are different keys
+        program = ["DEFVAR GF@r", "DEFVAR GF@s", "MOVE GF@s string@",
+                   "LABEL build", "CONCAT GF@s GF@s string@abcdefgh", "STRLEN GF@r GF@s",
+                   "JUMPIFNEQ build GF@r int@400"]
+        for value in ("bool@true", "int@1", "nil@nil", "bool@true", "GF@s", "string@x"):
+            program += [f"PUSHS {value}", "CALL type", "POPS GF@r", "WRITE GF@r", "WRITE string@,"]
+        program += ["PUSHS GF@s", "CALL first", "POPS GF@r", "WRITE GF@r",
+                    "SETCHAR GF@s int@0 string@z",
+                    "PUSHS GF@s", "CALL first", "POPS GF@r", "WRITE GF@r",
+                    "EXIT int@0",
+                    "LABEL type", "CREATEFRAME", "PUSHFRAME", "DEFVAR LF@x", "POPS LF@x", "TYPE LF@x LF@x",
+                    "PUSHS LF@x", "POPFRAME", "RETURN",
+                    "LABEL first", "CREATEFRAME", "PUSHFRAME", "DEFVAR LF@x", "POPS LF@x",
+                    "GETCHAR LF@x LF@x int@0", "PUSHS LF@x", "POPFRAME", "RETURN"]
+        result = self.assertSameAsUnmemoized(program)
+        self.assertEqual(result.stdout, "bool,int,nil,bool,string,string,az")
+        self.assertIn("type: pure, pops 1, pushes 1, 1 of 6 calls hit", result.stderr)
+
+    def test_impure_functions_are_not_memoized(self):
+        for name, (lines, reason) in IMPURE.items():
+            with self.subTest(name):
+                result = self.assertSameAsUnmemoized(lines, input_text="5\n")
+                line = next(line for line in result.stderr.splitlines() if line.startswith("  f: "))
+                self.assertTrue(line.startswith("  f: not memoized, "))
+                self.assertIn(reason, line)
+
+    def test_invalid_arguments(self):
+        for arguments in (["--memoize", "0"], ["--memoize", "--engine", "closure"],
+                          ["--memoize", "--engine", "aot"], ["--memoize", "--profile", "profile.json"]):
+            with self.subTest(arguments=arguments):
+                self.assertEqual(run(FIB_STACK, *arguments).exit_code, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
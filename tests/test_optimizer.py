@@ -0,0 +1,121 @@
+import unittest
+from .support import run, ENGINES
+
+# Tests of -O (DataflowOptimizer, TypeInference and PeepholeOptimizer) by comparing runs with and without it
+# Error messages report program counters of source code, so they are the same with -O
+
+
+class OptimizerTest(unittest.TestCase):
+
+    # Method that checks that program ends the same way with -O as without it on every engine
+    def assertSameAsUnoptimized(self, lines, input_text=""):
+        expected = run(lines, input_text=input_text)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                result = run(lines, "--engine", engine, "-O", input_text=input_text)
+                self.assertEqual((result.exit_code, result.stdout, result.stderr),
+                                 (expected.exit_code, expected.stdout, expected.stderr))
+        return expected
+
+    # Method that returns report of dataflow pass and numbers of executed instructions without and with -O
+    def optimization(self, lines, input_text=""):
+        plain = run(lines, profile=True, input_text=input_text)
+        optimized = run(lines, "-O", profile=True, input_text=input_text)
+        return (optimized.profile["dataflow"], plain.profile["instructions_executed"],
+                optimized.profile["instructions_executed"])
+
+    # Dead code is the only user of TF@y, so optimized code has no variable on the first local slot
+    SLOT_GAP = ["JUMP main",
+                "LABEL dead", "CREATEFRAME", "DEFVAR TF@y",
+                "LABEL main", "CREATEFRAME", "DEFVAR TF@z", "MOVE TF@z int@1", "WRITE TF@z"]
+
+    def test_removed_variable_leaves_gap_in_slots(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                result = run(self.SLOT_GAP, "--engine", engine, "-O")
+                self.assertEqual((result.exit_code, result.stdout, result.stderr), (0, "1", ""))
+
+    def test_profile_reports_removed_instructions(self):
+        # Unreachable CREATEFRAME and DEFVAR and dead MOVE are removed
+        result = run(self.SLOT_GAP, "-O", profile=True)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.profile["dataflow"], {"instructions": 9, "removed": 3})
+        self.assertIn("dataflow optimizer: 3 of 9 instructions removed", result.stderr)
+        result = run(self.SLOT_GAP, profile=True)
+        self.assertNotIn("dataflow", result.profile)
+
+    def test_constant_folding_and_copy_propagation(self):
+        program = ["DEFVAR GF@a", "DEFVAR GF@b", "DEFVAR GF@c", "DEFVAR GF@s", "DEFVAR GF@n",
+                   "MOVE GF@a int@6", "MOVE GF@b GF@a", "MUL GF@c GF@a GF@b", "SUB GF@c GF@c int@2",
+                   "CONCAT GF@s string@ab string@cd", "STRLEN GF@n GF@s", "GETCHAR GF@s GF@s int@1",
+                   "EQ GF@b GF@n int@4", "JUMPIFEQ skip GF@b bool@true",
+                   "WRITE string@not_folded",
+                   "LABEL skip", "WRITE GF@c", "WRITE GF@s", "WRITE GF@n", "WRITE GF@b"]
+        result = self.assertSameAsUnoptimized(program)
+        self.assertEqual(result.stdout, "34b4true")
+        report, plain, optimized = self.optimization(program)
+        self.assertGreater(report["removed"], 0)
+        self.assertLess(optimized, plain)
+
+    def test_unreachable_blocks_are_removed(self):
+        program = ["DEFVAR GF@x", "MOVE GF@x int@1",
+                   "JUMP main",
+                   "LABEL dead", "WRITE string@dead", "JUMP dead",
+                   "LABEL main",
+                   "JUMPIFEQ end GF@x int@1",
+                   "WRITE string@never", "CALL dead",
+                   "LABEL end", "WRITE GF@x"]
+        result = self.assertSameAsUnoptimized(program)
+        self.assertEqual(result.stdout, "1")
+        report, _, _ = self.optimization(program)
+        # Everything except LABEL instructions of unreachable blocks is removed
+        self.assertGreaterEqual(report["removed"], 5)
+
+    def test_division_by_zero_is_not_folded(self):
+        program = ["DEFVAR GF@a", "DEFVAR GF@b", "MOVE GF@a int@0", "WRITE string@before",
+                   "IDIV GF@b int@1 GF@a", "WRITE string@after", "WRITE GF@b"]
+        result = self.assertSameAsUnoptimized(program)
+        self.assertEqual((result.exit_code, result.stdout), (57, "before"))
+
+    def test_getchar_out_of_string_is_not_folded(self):
+        program = ["DEFVAR GF@a", "DEFVAR GF@b", "MOVE GF@a string@abc", "WRITE string@before",
+                   "GETCHAR GF@b GF@a int@3", "WRITE GF@b"]
+        result = self.assertSameAsUnoptimized(program)
+        self.assertEqual((result.exit_code, result.stdout), (58, "before"))
+        program[4] = "STRI2INT GF@b GF@a int@-1"
+        result = self.assertSameAsUnoptimized(program)
+        self.assertEqual((result.exit_code, result.stdout), (58, "before"))
+
+    def test_error_reports_program_counter_of_source(self):
+        program = ["DEFVAR GF@a", "DEFVAR GF@s", "MOVE GF@a int@2", "MOVE GF@s string@ab",
+                   "JUMP main", "LABEL dead", "WRITE string@x", "WRITE string@y",
+                   "LABEL main", "STRI2INT GF@a GF@s GF@a"]
+        result = self.assertSameAsUnoptimized(program)
+        self.assertEqual(result.exit_code, 58)
+        self.assertIn("Invalid index for str2int: 2 on program counter 9.", result.stderr)
+        report, _, _ = self.optimization(program)
+        self.assertGreater(report["removed"], 0)
+
+    def test_moves_into_variables_never_read_are_removed(self):
+        program = ["DEFVAR GF@unused", "DEFVAR GF@n", "DEFVAR GF@i", "READ GF@n int", "MOVE GF@i int@0",
+                   "LABEL loop", "MOVE GF@unused GF@i", "MOVE GF@unused string@x",
+                   "ADD GF@i GF@i int@1", "JUMPIFNEQ loop GF@i GF@n",
+                   "WRITE GF@i"]
+        result = self.assertSameAsUnoptimized(program, "5\n")
+        self.assertEqual(result.stdout, "5")
+        report, plain, optimized = self.optimization(program, "5\n")
+        self.assertEqual(report["removed"], 2)
+        self.assertEqual(plain - optimized, 10)
+
+    def test_failing_moves_are_kept(self):
+        # Undefined variable (54), missing frame (55) and uninitialized value (56) still end the program
+        for program, exit_code in ((["WRITE string@x", "MOVE GF@never int@1", "DEFVAR GF@never"], 54),
+                                   (["WRITE string@x", "MOVE TF@a int@1"], 55),
+                                   (["DEFVAR GF@a", "DEFVAR GF@b", "WRITE string@x", "MOVE GF@a GF@b"], 56)):
+            with self.subTest(exit_code=exit_code):
+                result = self.assertSameAsUnoptimized(program)
+                self.assertEqual((result.exit_code, result.stdout), (exit_code, "x"))
+
+
+if __name__ == "__main__":
+    unittest.main()
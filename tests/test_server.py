@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import unittest
+from benchmarks.workloads import to_xml
+from .support import SCRIPT
+
+# Tests of time limit of jobs of server and of cases of batch (batch runs cases as jobs of server)
+
+LOOP = to_xml(["LABEL l", "JUMP l"])
+HELLO = to_xml(["WRITE string@hello"])
+
+
+# Method that sends jobs to server started with arguments and returns responses
+def serve(jobs, *arguments):
+    lines = "".join(json.dumps(job) + "\n" for job in jobs)
+    process = subprocess.run([sys.executable, SCRIPT, "--server", "--no-cache"] + list(arguments), input=lines,
+                             capture_output=True, universal_newlines=True, env=dict(os.environ), timeout=60)
+    return [json.loads(line) for line in process.stdout.splitlines()]
+
+
+class ServerTimeoutTest(unittest.TestCase):
+
+    def test_timeout_of_server(self):
+        responses = serve([{"id": 1, "source": LOOP}, {"id": 2, "source": HELLO}], "--timeout", "0.5")
+        self.assertEqual(responses, [
+            {"id": 1, "exit_code": None, "stdout": "", "stderr": "Job timed out after 0.5 seconds"},
+            {"id": 2, "exit_code": 0, "stdout": "hello", "stderr": ""}])
+
+    def test_timeout_of_job(self):
+        for engine in ("tac", "closure", "aot", "jit"):
+            with self.subTest(engine=engine):
+                responses = serve([{"id": 1, "source": LOOP, "engine": engine, "timeout": 0.2},
+                                   {"id": 2, "source": HELLO, "engine": engine}])
+                self.assertEqual([(response["id"], response["exit_code"], response["stdout"])
+                                  for response in responses], [(1, None, ""), (2, 0, "hello")])
+
+    def test_invalid_timeout(self):
+        responses = serve([{"id": 1, "source": HELLO, "timeout": 0}, {"id": 2, "source": HELLO, "timeout": "1"}])
+        self.assertEqual([response["exit_code"] for response in responses], [10, 10])
+
+    def test_timeout_of_batch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "loop.src"), "w") as f:
+                f.write(LOOP)
+            with open(os.path.join(directory, "hello.src"), "w") as f:
+                f.write(HELLO)
+            with open(os.path.join(directory, "hello.out"), "w") as f:
+                f.write("hello")
+            process = subprocess.run([sys.executable, SCRIPT, "--batch", directory, "--timeout", "0.5", "--jobs", "1"],
+                                     capture_output=True, universal_newlines=True, timeout=60)
+        self.assertEqual(process.returncode, 1)
+        self.assertIn("1 passed, 0 failed, 1 timed out, 0 errors", process.stdout)